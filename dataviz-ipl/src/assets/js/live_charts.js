@@ -0,0 +1,70 @@
+// Swaps regenerated plots into an open page without reloading it. Off unless
+// the page names the Flask app's event stream, either on the script tag
+//   <script src="../assets/js/live_charts.js" data-events="http://127.0.0.1:5000/events"></script>
+// or, for the published pages (which leave data-events out, so visitors'
+// browsers don't go looking for a local server), in the page URL:
+//   player_stats.html?events=http://127.0.0.1:5000/events
+// A URL parameter may only name this site or a server on the viewer's own
+// machine. When a chart's HTML is rebuilt (build.py) or re-rendered during
+// a match (live.py), the iframes showing that output (matched on its full
+// path, see outputPath) are pointed at the new version served by the app;
+// every other plot on the page stays as it is.
+(function () {
+  const LOCAL_HOSTS = ['localhost', '127.0.0.1', '[::1]'];
+
+  function eventsUrlOf(script) {
+    if (script.dataset.events) {
+      return script.dataset.events;
+    }
+    const requested = new URLSearchParams(window.location.search).get('events');
+    if (!requested) {
+      return null;
+    }
+    const url = new URL(requested, window.location.href);
+    const allowed = url.origin === window.location.origin || LOCAL_HOSTS.includes(url.hostname);
+    return allowed ? url.href : null;
+  }
+
+  const eventsUrl = eventsUrlOf(document.currentScript);
+  if (!eventsUrl || !window.EventSource) {
+    return;
+  }
+  const server = new URL(eventsUrl, window.location.href).origin;
+
+  // Build output (e.g. static/auction_plots/x.html, as the events name it)
+  // an iframe shows. The page's copies under assets/plots/<dir>/ mirror
+  // static/<dir>/; an iframe whose copy lives elsewhere or was renamed
+  // names its output with data-output, as swapped iframes do.
+  function outputPath(frame) {
+    if (frame.dataset.output) {
+      return frame.dataset.output;
+    }
+    const src = decodeURIComponent(frame.getAttribute('src').split('?')[0]);
+    const copy = src.match(/(?:^|\/)assets\/plots\/(.+)$/);
+    return copy ? `static/${copy[1]}` : null;
+  }
+
+  function framesShowing(output) {
+    return Array.from(document.querySelectorAll('iframe[src]'))
+      .filter((frame) => outputPath(frame) === output);
+  }
+
+  const events = new EventSource(eventsUrl);
+  events.addEventListener('chart', (event) => {
+    const change = JSON.parse(event.data);
+    if (change.kind !== 'html') {
+      return;
+    }
+    const output = decodeURIComponent(change.src).replace(/^\//, '');
+    framesShowing(output).forEach((frame) => {
+      frame.dataset.output = output;
+      frame.src = `${server}${encodeURI(change.src)}?v=${change.version}`;
+    });
+  });
+  events.addEventListener('resync', () => {
+    // Missed updates while disconnected: reload the plots already swapped to the app
+    document.querySelectorAll(`iframe[src^="${server}"]`).forEach((frame) => {
+      frame.src = `${frame.src.split('?')[0]}?v=${Date.now()}`;
+    });
+  });
+})();
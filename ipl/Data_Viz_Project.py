@@ -1,305 +1,282 @@
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import altair as alt
-import bar_chart_race as bcr
 import os
+from functools import lru_cache
+from data_loader import load_auction
+from player_profiles import bowling_figure
+from chart_registry import chart, render_module
 
 # Create directory for saving plots
 PLOT_DIR = "static/auction_plots/"
 if not os.path.exists(PLOT_DIR):
     os.makedirs(PLOT_DIR)
 
-auction_df = pd.read_csv('../datasets/IPLPlayerAuctionData.csv')
-matches_df = pd.read_csv('../datasets/matches.csv')
-deliveries_df = pd.read_csv('../datasets/deliveries.csv')
 
 #team spending over the years
-auction_df['Year'] = pd.to_datetime(auction_df['Year'], format='%Y').dt.year
-team_spending = auction_df.groupby(['Year', 'Team'])['Amount'].sum().reset_index()
+@chart("static/auction_plots/team_spending_over_years.html", inputs=['auction'])
+def team_spending_over_years():
+    import plotly.express as px
 
-fig = px.line(team_spending, x='Year', y='Amount', color='Team',
-                 title='Team Spending Over the Years')
-fig.write_html("static/auction_plots/team_spending_over_years.html") 
+    auction_df = load_auction()
+    team_spending = auction_df.groupby(['Year', 'Team'], observed=True)['Amount'].sum().reset_index()
+
+    return px.line(team_spending, x='Year', y='Amount', color='Team',
+                   title='Team Spending Over the Years')
 
 
 # Spending on bowlers vs batsmen over the years
-bowlers_df = auction_df[auction_df['Role'] == 'Bowler']
-batsmen_df = auction_df[auction_df['Role'] == 'Batsman']
-bowlers_spending = bowlers_df.groupby('Year')['Amount'].sum().reset_index()
-batsmen_spending = batsmen_df.groupby('Year')['Amount'].sum().reset_index()
+@chart("static/auction_plots/spending_on_bowlers_vs_batsmen.html", inputs=['auction'])
+def spending_on_bowlers_vs_batsmen():
+    import plotly.graph_objects as go
+
+    auction_df = load_auction()
+    bowlers_df = auction_df[auction_df['Role'] == 'Bowler']
+    batsmen_df = auction_df[auction_df['Role'] == 'Batsman']
+    bowlers_spending = bowlers_df.groupby('Year')['Amount'].sum().reset_index()
+    batsmen_spending = batsmen_df.groupby('Year')['Amount'].sum().reset_index()
 
-fig = go.Figure()
+    fig = go.Figure()
 
-fig.add_trace(go.Scatter(x=bowlers_spending['Year'], y=bowlers_spending['Amount'],
-                         mode='lines', name='Bowlers'))
-fig.add_trace(go.Scatter(x=batsmen_spending['Year'], y=batsmen_spending['Amount'],
-                         mode='lines', name='Batsmen'))
+    fig.add_trace(go.Scatter(x=bowlers_spending['Year'], y=bowlers_spending['Amount'],
+                             mode='lines', name='Bowlers'))
+    fig.add_trace(go.Scatter(x=batsmen_spending['Year'], y=batsmen_spending['Amount'],
+                             mode='lines', name='Batsmen'))
 
-fig.update_layout(title='Spending on Bowlers vs. Batsmen Over the Years',
-                  xaxis_title='Year',
-                  yaxis_title='Total Spending')
-fig.write_html("static/auction_plots/spending_on_bowlers_vs_batsmen.html")
+    fig.update_layout(title='Spending on Bowlers vs. Batsmen Over the Years',
+                      xaxis_title='Year',
+                      yaxis_title='Total Spending')
+    return fig
 
 
 # Streamgraph of Amount by Role over Years
-grouped = auction_df.groupby(['Year', 'Role'])['Amount'].sum().reset_index()
+@chart("static/auction_plots/streamgraph_amount_by_role_over_years.html", inputs=['auction'])
+def streamgraph_amount_by_role():
+    import altair as alt
+
+    grouped = load_auction().groupby(['Year', 'Role'])['Amount'].sum().reset_index()
+
+    return alt.Chart(grouped).mark_area(
+        interpolate='basis' 
+    ).encode(
+        x='Year:O',
+        y='Amount:Q',
+        color='Role:N'
+    ).properties(
+        width=700,
+        height=400,
+        title='Streamgraph of Amount by Role over Years'
+    )
 
-chart = alt.Chart(grouped).mark_area(
-    interpolate='basis' 
-).encode(
-    x='Year:O',
-    y='Amount:Q',
-    color='Role:N'
-).properties(
-    width=700,
-    height=400,
-    title='Streamgraph of Amount by Role over Years'
-)
 
-chart.save("static/auction_plots/streamgraph_amount_by_role_over_years.html") 
+# Player the dashboard's bowling performance chart shows
+PROFILE_PLAYER = 'PJ Cummins'
 
 
 # Value of players over the years
-player_year = (
-    auction_df
-    .groupby(['Player', 'Year'])['Amount']
-    .sum()
-    .reset_index()
-)
-player_year = player_year.sort_values(by=['Player', 'Year'])
+@lru_cache(maxsize=None)
+def player_valuations():
+    player_year = (
+        load_auction()
+        .groupby(['Player', 'Year'])['Amount']
+        .sum()
+        .reset_index()
+    )
+    player_year = player_year.sort_values(by=['Player', 'Year'])
 
-player_year['Amount_Diff'] = player_year.groupby('Player')['Amount'].diff()
-player_year['Amount_Pct_Change'] = player_year.groupby('Player')['Amount'].pct_change()
+    player_year['Amount_Diff'] = player_year.groupby('Player')['Amount'].diff()
+    player_year['Amount_Pct_Change'] = player_year.groupby('Player')['Amount'].pct_change()
+    return player_year
 
 
-wildest_rise = player_year.sort_values('Amount_Pct_Change', ascending=False).head(10)
-wildest_crash = player_year.sort_values('Amount_Pct_Change').head(10)
+def target_player():
+    player_year = player_valuations()
+    wildest_rise = player_year.sort_values('Amount_Pct_Change', ascending=False).head(10)
+    wildest_crash = player_year.sort_values('Amount_Pct_Change').head(10)
 
-target_player = wildest_rise.iloc[3]['Player']
+    return wildest_rise.iloc[3]['Player']
 
-player_data = player_year[player_year['Player'] == target_player]
 
-fig = px.line(
-    player_data,
-    x='Year',
-    y='Amount',
-    markers=True,
-    title=f'Valuation Over Years: {target_player}',
-    labels={'Amount': 'Auction Amount'}
-)
-fig.write_html(f"static/auction_plots/{target_player}_valuation_over_years.html") 
+def valuation_figure(player):
+    import plotly.express as px
+
+    player_year = player_valuations()
+    player_data = player_year[player_year['Player'] == player]
+
+    return px.line(
+        player_data,
+        x='Year',
+        y='Amount',
+        markers=True,
+        title=f'Valuation Over Years: {player}',
+        labels={'Amount': 'Auction Amount'}
+    )
+
+
+@chart(lambda: f"static/auction_plots/{target_player()}_valuation_over_years.html", inputs=['auction'])
+def valuation_over_years():
+    return valuation_figure(target_player())
 
 
 #Rocket chart for multiple players
-player_with_diff = player_year.dropna(subset=['Amount_Diff'])
-
-rockets = player_with_diff.sort_values('Amount_Diff', ascending=False).head(5)
-crashes = player_with_diff.sort_values('Amount_Diff', ascending=True).head(5)
-
-player_list_rocket = rockets['Player'].tolist()
-player_list_crashes = rockets['Player'].tolist()
-
-fig = px.line(
-    player_year[player_year['Player'].isin(player_list_rocket)],
-    x='Year',
-    y='Amount',
-    color='Player',
-    markers=True,
-    line_shape='spline',
-    title= "Top 5 Player Valuation Rockets",
-    labels={'Amount': 'Auction Amount (₹)'}
-)
-fig.update_traces(mode="lines+markers+text", textposition="top right")
-fig.update_layout(
-    title_font_size=24,
-    font=dict(size=14),
-    legend_title_text='Player',
-    hovermode='x unified',
-    height=600,
-    width=900
-)
-fig.write_html("static/auction_plots/top_5_player_rockets.html")    
+def rockets_and_crashes():
+    player_with_diff = player_valuations().dropna(subset=['Amount_Diff'])
+
+    rockets = player_with_diff.sort_values('Amount_Diff', ascending=False).head(5)
+    crashes = player_with_diff.sort_values('Amount_Diff', ascending=True).head(5)
+
+    player_list_rocket = rockets['Player'].tolist()
+    player_list_crashes = rockets['Player'].tolist()
+    return player_list_rocket, player_list_crashes
+
+
+def valuation_lines(players, title):
+    import plotly.express as px
+
+    player_year = player_valuations()
+    fig = px.line(
+        player_year[player_year['Player'].isin(players)],
+        x='Year',
+        y='Amount',
+        color='Player',
+        markers=True,
+        line_shape='spline',
+        title=title,
+        labels={'Amount': 'Auction Amount (₹)'}
+    )
+    fig.update_traces(mode="lines+markers+text", textposition="top right")
+    fig.update_layout(
+        title_font_size=24,
+        font=dict(size=14),
+        legend_title_text='Player',
+        hovermode='x unified',
+        height=600,
+        width=900
+    )
+    return fig
+
+
+@chart("static/auction_plots/top_5_player_rockets.html", inputs=['auction'])
+def top_5_player_rockets():
+    player_list_rocket, _ = rockets_and_crashes()
+    return valuation_lines(player_list_rocket, "Top 5 Player Valuation Rockets")
+
 
 # Player crashes for multiple players
-fig = px.line(
-    player_year[player_year['Player'].isin(player_list_crashes)],
-    x='Year',
-    y='Amount',
-    color='Player',
-    markers=True,
-    line_shape='spline',
-    title= "Top 5 Player Valuation Crashes",
-    labels={'Amount': 'Auction Amount (₹)'}
-)
-fig.update_traces(mode="lines+markers+text", textposition="top right")
-fig.update_layout(
-    title_font_size=24,
-    font=dict(size=14),
-    legend_title_text='Player',
-    hovermode='x unified',
-    height=600,
-    width=900
-)
-fig.write_html("static/auction_plots/top_5_player_crashes.html")    
+@chart("static/auction_plots/top_5_player_crashes.html", inputs=['auction'])
+def top_5_player_crashes():
+    _, player_list_crashes = rockets_and_crashes()
+    return valuation_lines(player_list_crashes, "Top 5 Player Valuation Crashes")
+
 
 #smootherd ricket
+@lru_cache(maxsize=None)
+def player_year_team():
+    # Player, Year, Amount, Team of each player's biggest buy per year
+    return (
+        load_auction()
+        .sort_values('Amount', ascending=False)
+        .groupby(['Player', 'Year'])
+        .first()
+        .reset_index()
+        .sort_values(by=['Player', 'Year'])
+    )
+
+
+def smoothed_valuation_lines(players, title):
+    import plotly.graph_objects as go
+
+    df_players = player_year_team()[player_year_team()['Player'].isin(players)]
+
+    fig = go.Figure()
+
+    for player in players:
+        player_df = df_players[df_players['Player'] == player]
+        fig.add_trace(go.Scatter(
+            x=player_df['Year'],
+            y=player_df['Amount'],
+            mode='lines+markers',
+            name=player,
+            hovertemplate=(
+                'Player: %{text}<br>'
+                'Year: %{x}<br>'
+                'Amount: ₹%{y}<br>'
+                'Team: %{customdata}'
+            ),
+            text=[player]*len(player_df),
+            customdata=player_df['Team'],
+            line=dict(width=3, shape='spline'),  
+            marker=dict(size=8)
+        ))
+
+    fig.update_layout(
+        title=title,
+        height=600,
+        width=950,
+        font=dict(size=14),
+        hovermode='closest',  
+        legend_title_text='Player'
+    )
+    return fig
 
-player_year_team = (
-    auction_df
-    .sort_values('Amount', ascending=False)
-    .groupby(['Player', 'Year'])
-    .first()
-    .reset_index()
-)
-
-# Now player_year_team has Player, Year, Amount, Team
-
-# Sort properly
-player_year_team = player_year_team.sort_values(by=['Player', 'Year'])
-
-df_rocket = player_year_team[player_year_team['Player'].isin(player_list_rocket)]
-df_crashes = player_year_team[player_year_team['Player'].isin(player_list_crashes)]
-
-fig = go.Figure()
-
-for player in player_list_rocket:
-    player_df = df_rocket[df_rocket['Player'] == player]
-    fig.add_trace(go.Scatter(
-        x=player_df['Year'],
-        y=player_df['Amount'],
-        mode='lines+markers',
-        name=player,
-        hovertemplate=(
-            'Player: %{text}<br>'
-            'Year: %{x}<br>'
-            'Amount: ₹%{y}<br>'
-            'Team: %{customdata}'
-        ),
-        text=[player]*len(player_df),
-        customdata=player_df['Team'],
-        line=dict(width=3, shape='spline'),  
-        marker=dict(size=8)
-    ))
-
-fig.update_layout(
-    title='Top 5 Rockets (Smoothed)',
-    height=600,
-    width=950,
-    font=dict(size=14),
-    hovermode='closest',  
-    legend_title_text='Player'
-)
-fig.write_html("static/auction_plots/top_5_player_rockets_smoothed.html")
+
+@chart("static/auction_plots/top_5_player_rockets_smoothed.html", inputs=['auction'])
+def top_5_player_rockets_smoothed():
+    player_list_rocket, _ = rockets_and_crashes()
+    return smoothed_valuation_lines(player_list_rocket, 'Top 5 Rockets (Smoothed)')
 
 
 #crashes smoothed
-fig = go.Figure()
-
-for player in player_list_crashes:
-    player_df = df_crashes[df_crashes['Player'] == player]
-    fig.add_trace(go.Scatter(
-        x=player_df['Year'],
-        y=player_df['Amount'],
-        mode='lines+markers',
-        name=player,
-        hovertemplate=(
-            'Player: %{text}<br>'
-            'Year: %{x}<br>'
-            'Amount: ₹%{y}<br>'
-            'Team: %{customdata}'
-        ),
-        text=[player]*len(player_df),
-        customdata=player_df['Team'],
-        line=dict(width=3, shape='spline'),  
-        marker=dict(size=8)
-    ))
-
-fig.update_layout(
-    title='Top 5 Crashes (Smoothed)',
-    height=600,
-    width=950,
-    font=dict(size=14),
-    hovermode='closest',  
-    legend_title_text='Player'
-)
-fig.write_html("static/auction_plots/top_5_player_crashes_smoothed.html")
-
-
-
-#Pat Cummings chart
-
-def clean_season(season):
-    if isinstance(season, str) and '/' in season:
-        return int(season.split('/')[0])
-    return int(season)
-
-matches_df['season'] = matches_df['season'].apply(clean_season)
-
-# Merge to get season info
-deliveries = deliveries_df.merge(matches_df[['id', 'season']], left_on='match_id', right_on='id', how='left')
-
-# Batting stats
-cummins_batting = deliveries[deliveries['batter'] == 'PJ Cummins']
-batting_stats = cummins_batting.groupby('season').agg(
-    runs_scored=('batsman_runs', 'sum'),
-    balls_faced=('ball', 'count')
-).reset_index()
-batting_stats['strike_rate'] = (batting_stats['runs_scored'] / batting_stats['balls_faced']) * 100
-
-# Bowling stats
-cummins_bowling = deliveries[deliveries['bowler'] == 'PJ Cummins']
-bowling_stats = cummins_bowling.groupby('season').agg(
-    balls_bowled=('ball', 'count'),
-    runs_conceded=('total_runs', 'sum'),
-    wickets=('is_wicket', 'sum')
-).reset_index()
-bowling_stats['overs'] = bowling_stats['balls_bowled'] // 6 + (bowling_stats['balls_bowled'] % 6) / 10
-bowling_stats['economy_rate'] = bowling_stats['runs_conceded'] / (bowling_stats['balls_bowled'] / 6)
-
-import plotly.graph_objects as go
-
-# Create a single-row subplot figure for bowling only
-fig = go.Figure()
-
-# Add Wickets (Bar)
-fig.add_trace(go.Bar(
-    x=bowling_stats['season'],
-    y=bowling_stats['wickets'],
-    name="Wickets",
-    marker_color='blue'
-))
-
-# Add Economy Rate (Line)
-fig.add_trace(go.Scatter(
-    x=bowling_stats['season'],
-    y=bowling_stats['economy_rate'],
-    name="Economy Rate",
-    yaxis="y2",
-    marker_color='red',
-    mode='lines+markers'
-))
-
-# Layout adjustments
-fig.update_layout(
-    height=500,
-    title_text="PJ Cummins' Bowling Performance Over the Years",
-    yaxis=dict(title='Wickets'),
-    yaxis2=dict(
-        overlaying='y',
-        side='right',
-        title='Economy Rate'
-    ),
-    hovermode='x unified',
-    legend=dict(
-        orientation="h",
-        yanchor="bottom",
-        y=1.02,
-        xanchor="center",
-        x=0.5
+@chart("static/auction_plots/top_5_player_crashes_smoothed.html", inputs=['auction'])
+def top_5_player_crashes_smoothed():
+    _, player_list_crashes = rockets_and_crashes()
+    return smoothed_valuation_lines(player_list_crashes, 'Top 5 Crashes (Smoothed)')
+
+
+#Spend vs performance: auction price against the player's runs and wickets that season (archive scorecards).
+#The crosswalk matches auction names against players_info and is built from the deliveries names too.
+@chart("static/auction_plots/spend_vs_performance.html",
+       inputs=['auction', 'deliveries', 'players_info', 'batting_card', 'bowling_card'])
+def spend_vs_performance():
+    import plotly.express as px
+    # Loads DuckDB, which no other chart here needs
+    from archive_db import query
+
+    auction = load_auction(player_ids=True).dropna(subset=['player_id'])
+    performance = query("""
+        SELECT player_id, season, sum(runs) AS runs, sum(wickets) AS wickets
+        FROM (
+            SELECT batsman_id AS player_id, season, runs, 0 AS wickets FROM batting_card
+            UNION ALL
+            SELECT bowler_id AS player_id, season, 0 AS runs, wickets FROM bowling_card
+        )
+        WHERE player_id IS NOT NULL
+        GROUP BY ALL
+    """)
+    performance['player_id'] = performance['player_id'].astype('Int64')
+    spend = auction.merge(performance, left_on=['player_id', 'Year'], right_on=['player_id', 'season'])
+
+    return px.scatter(
+        spend,
+        x='Amount',
+        y='runs',
+        size=spend['wickets'] + 1,
+        color='Role',
+        hover_name='Player',
+        hover_data=['Year', 'Team', 'wickets'],
+        log_x=True,
+        title='Auction Price vs Runs in that Season',
+        labels={'Amount': 'Auction Amount (₹)', 'runs': 'Runs', 'size': 'Wickets + 1'}
     )
-)
-fig.write_html("static/auction_plots/pj_cummins_bowling_performance.html")
+
+
+#Pat Cummings chart (any player's profile: player_profiles.py / the /player/<name> route)
+@chart("static/auction_plots/pj_cummins_bowling_performance.html", inputs=['matches', 'deliveries'])
+def pj_cummins_bowling_performance():
+    return bowling_figure(PROFILE_PLAYER)
+
+
+if __name__ == '__main__':
+    render_module(__name__)
+
 
 
 #########################################################################################################################################
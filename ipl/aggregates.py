@@ -0,0 +1,93 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from cube import rollup
+from data_loader import load_matches
+
+# Aggregate tables app.py serves from /api/<name>, one feather file each
+AGGREGATE_DIR = "static/aggregates"
+
+AGGREGATES = {}
+
+
+def aggregate(func):
+    AGGREGATES[func.__name__] = func
+    return func
+
+
+@aggregate
+def win_ratio():
+    matches = load_matches()
+
+    # Matches played and won per team per season
+    played = pd.melt(matches, id_vars=['season'], value_vars=['team1', 'team2'], value_name='team')
+    played = played.groupby(['season', 'team'], observed=True).size().reset_index(name='matches_played')
+    won = matches.groupby(['season', 'winner'], observed=True).size().reset_index(name='matches_won')
+    won = won.rename(columns={'winner': 'team'})
+
+    table = played.merge(won, on=['season', 'team'], how='left')
+    table['matches_won'] = table['matches_won'].fillna(0).astype(int)
+    table['win_ratio'] = (table['matches_won'] / table['matches_played']).round(2)
+    return table
+
+
+@aggregate
+def toss_conversion():
+    matches = load_matches()
+
+    # Tosses won per team per season, and how many of those matches were won too
+    toss = matches.assign(toss_and_match_win=matches['toss_winner'] == matches['winner'])
+    table = toss.groupby(['season', 'toss_winner'], observed=True).agg(
+        toss_wins=('id', 'count'),
+        toss_and_match_wins=('toss_and_match_win', 'sum'),
+    ).reset_index().rename(columns={'toss_winner': 'team'})
+    table['toss_and_match_losses'] = table['toss_wins'] - table['toss_and_match_wins']
+    return table
+
+
+@aggregate
+def venue_stats():
+    matches = load_matches()
+
+    # Runs and matches per venue per season
+    runs = rollup(['season', 'venue'], ['bowl_runs']).rename(columns={'bowl_runs': 'total_runs'})
+    runs['venue'] = runs['venue'].astype(str)
+    played = matches.groupby(['season', 'venue']).size().reset_index(name='matches_played')
+    table = played.merge(runs, on=['season', 'venue'], how='left')
+    table['total_runs'] = table['total_runs'].fillna(0).astype(int)
+    table = table[['season', 'venue', 'total_runs', 'matches_played']]
+    table['avg_runs_per_match'] = (table['total_runs'] / table['matches_played']).round(2)
+    return table
+
+
+@aggregate
+def bowler_economy():
+    # Balls, runs and wickets per bowler per season and team
+    table = rollup(['season', 'player', 'team'], ['bowl_balls', 'bowl_runs', 'bowl_wickets'])
+    table = table[table['bowl_balls'] > 0].rename(columns={
+        'player': 'bowler', 'bowl_balls': 'balls_bowled', 'bowl_runs': 'runs_conceded', 'bowl_wickets': 'wickets'})
+    table['economy'] = (table['runs_conceded'] / (table['balls_bowled'] / 6)).round(2)
+    return table
+
+
+def aggregate_path(name):
+    return f"{AGGREGATE_DIR}/{name}.feather"
+
+
+def write_aggregates(names=None):
+    # Materialise the tables; uncompressed so the server can memory-map them
+    os.makedirs(AGGREGATE_DIR, exist_ok=True)
+    written = []
+    for name in names or AGGREGATES:
+        table = pa.Table.from_pandas(AGGREGATES[name](), preserve_index=False)
+        feather.write_feather(table, aggregate_path(name), compression='uncompressed')
+        written.append(aggregate_path(name))
+    return written
+
+
+if __name__ == '__main__':
+    for path in write_aggregates():
+        print(f"wrote {path}")
@@ -1,26 +1,429 @@
-from flask import Flask, render_template, send_from_directory
+from flask import Flask, Response, abort, jsonify, make_response, render_template, request, send_file, send_from_directory
+from collections import deque
+from functools import lru_cache
+import hashlib
+import json
 import os
+import threading
+import time
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+from werkzeug.utils import safe_join
 
 app = Flask(__name__)
 
 # Path to the folder where HTML plot files are saved
 PLOT_DIR = "static/plots"
 
+# Charts per dashboard page, written by `python build.py --pages`
+PAGE_INDEX_PATH = "static/specs/pages.json"
+
+# Vega runtimes for page indexes written before they recorded their own
+DEFAULT_VEGA_VERSIONS = {'vega': '5', 'vega_lite': '5', 'vega_embed': '6'}
+
+# Browsers may reuse a plot for this long, then revalidate with its ETag
+PLOT_CACHE_CONTROL = "public, max-age=300"
+
+# Precompressed copies written by precompress.py, best first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+# Aggregate tables written by `python aggregates.py`, served from /api/<name>
+AGGREGATE_DIR = "static/aggregates"
+
+# Shared JS runtimes (build.py --external-plotlyjs writes plotly.js here).
+# Slim plots reference ../../libs/..., which from /plots/<file> and
+# /static/<section>_plots/<file> resolves to /libs/...
+LIBS_DIR = "../dataviz-ipl/src/assets/libs"
+
+# JS libraries vendored with the app (vis-network for the partnerships
+# page, as PyVis copies it), also served under /libs/
+VENDORED_LIBS_DIR = "lib"
+
+ARROW_STREAM_MIMETYPE = "application/vnd.apache.arrow.stream"
+
+# Chart outputs written by build.py and re-rendered by live.py, watched for /events
+MANIFEST_PATH = "static/build_manifest.json"
+LIVE_FLAGS_PATH = "static/live_flags.json"
+
+# How often the watcher stats chart outputs, how often an idle stream sends a
+# keep-alive comment (proxies drop silent connections), how long browsers wait
+# before reconnecting, and how many events are kept for reconnecting clients
+EVENT_POLL_INTERVAL = 1
+EVENT_HEARTBEAT = 15
+EVENT_RETRY_MS = 3000
+EVENT_LOG_SIZE = 256
+
+# Listing of PLOT_DIR, refreshed only when the directory's mtime changes
+_plot_index = {'mtime': None, 'files': []}
+
+# ETag per file path, keyed on the (mtime, size) it was computed for
+_etags = {}
+
+# JSON files read by the chart watcher, keyed on the mtime they were read at
+_json_files = {}
+
+# Chart change events: one watcher thread compares output ETags and appends
+# to the log, every open stream waits on the condition and sends what's new.
+# An event's id (seq) is the changed output's mtime in microseconds, so every
+# worker process gives a change the same id and a client reconnecting to
+# another worker resumes where it was. `floor` is the newest id this process
+# can't replay: the newest output when it started watching, or the last
+# event dropped from the log.
+_chart_events = {'seq': 0, 'floor': 0, 'log': deque(maxlen=EVENT_LOG_SIZE), 'versions': {}, 'watcher': None}
+_events_changed = threading.Condition()
+
+
+def plot_files():
+    mtime = os.stat(PLOT_DIR).st_mtime_ns
+    if mtime != _plot_index['mtime']:
+        # PyVis pages being written are named <plot>.<pid>.tmp.html
+        _plot_index['files'] = sorted(f for f in os.listdir(PLOT_DIR)
+                                      if f.endswith('.html') and not f.endswith('.tmp.html'))
+        _plot_index['mtime'] = mtime
+    return _plot_index['files']
+
+
+def file_etag(path):
+    # Strong ETag from the file's content, rehashed only when the file changes
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _etags.get(path)
+    if cached is None or cached[0] != key:
+        with open(path, 'rb') as f:
+            cached = (key, hashlib.sha256(f.read()).hexdigest()[:32])
+        _etags[path] = cached
+    return cached[1]
+
+
+def pick_encoding(path, accepted):
+    # Best precompressed copy the client accepts (q > 0) that isn't older
+    # than the plot; `accepted` is a werkzeug Accept-Encoding header
+    for encoding, suffix in ENCODINGS:
+        if accepted.quality(encoding) > 0 and os.path.exists(path + suffix) \
+                and os.path.getmtime(path + suffix) >= os.path.getmtime(path):
+            return encoding, path + suffix
+    return None, path
+
+
 @app.route('/')
 def index():
     # List all HTML files in the plot directory
-    plot_files = [f for f in os.listdir(PLOT_DIR) if f.endswith('.html')]
+    plot_files_found = plot_files()
 
     # If no plot files are available
-    if not plot_files:
+    if not plot_files_found:
         return "No plots found. Please generate them first."
 
-    return render_template('index.html', plot_files=plot_files)
+    return render_template('index.html', plot_files=plot_files_found)
+
+@app.route('/libs/<path:filename>')
+def libs(filename):
+    path = safe_join(LIBS_DIR, filename)
+    if path is not None and os.path.isfile(path):
+        return send_from_directory(LIBS_DIR, filename)
+    return send_from_directory(VENDORED_LIBS_DIR, filename)
+
 
 @app.route('/plots/<filename>')
 def plot(filename):
-    # Serve plot HTML files
-    return send_from_directory(PLOT_DIR, filename)
+    # Serve plot HTML files, precompressed and revalidated with ETags
+    if filename not in plot_files():
+        # Images and other assets are served as before
+        return send_from_directory(PLOT_DIR, filename)
+
+    path = safe_join(PLOT_DIR, filename)
+    encoding, body_path = pick_encoding(path, request.accept_encodings)
+    # Each encoding is a different byte stream, so it gets its own strong ETag
+    etag = file_etag(path) + (f"-{encoding}" if encoding else "")
+
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        # Named after the plot, not the .br/.gz copy the body comes from
+        response = send_file(body_path, mimetype='text/html', conditional=False, etag=False,
+                             download_name=filename)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = PLOT_CACHE_CONTROL
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+@lru_cache(maxsize=16)
+def aggregate_table(name, mtime):
+    # Memory-mapped once per version of the file (mtime is part of the cache key)
+    return feather.read_table(f"{AGGREGATE_DIR}/{name}.feather", memory_map=True)
+
+
+@lru_cache(maxsize=256)
+def aggregate_payload(name, mtime, filters, fmt):
+    # Encoded response body for one slice of an aggregate table
+    table = aggregate_table(name, mtime)
+    for column, value in filters:
+        table = table.filter(pc.equal(table[column], pa.scalar(value).cast(table[column].type)))
+
+    if fmt == 'arrow':
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes(), ARROW_STREAM_MIMETYPE
+
+    # Column-oriented JSON: one list per column instead of one object per row
+    body = json.dumps({'rows': table.num_rows, 'columns': table.to_pydict()}, separators=(',', ':'))
+    return body.encode(), 'application/json'
+
+
+def franchise_name(team):
+    # Any name or abbreviation in franchises.FRANCHISES (MI, Delhi
+    # Daredevils, ...) -> the franchise name the tables store, None if
+    # unknown. franchises brings in pandas, so it's imported by the first
+    # request that filters on a team.
+    from franchises import ALIASES, TEAM_DTYPE
+
+    code = ALIASES.get(team)
+    return None if code is None else TEAM_DTYPE.categories[code]
+
+
+def api_response(name, args):
+    # (status, body, mimetype) for /api/<name> with the query args as a dict,
+    # None for unknown tables; shared by this app and the ASGI server (asgi.py)
+    path = safe_join(AGGREGATE_DIR, f"{name}.feather")
+    if path is None or not os.path.exists(path):
+        return None
+
+    mtime = os.stat(path).st_mtime_ns
+    columns = aggregate_table(name, mtime).column_names
+    args = dict(args)
+    fmt = args.pop('format', 'json')
+
+    def error(message, **extra):
+        return 400, json.dumps(dict(error=message, **extra)).encode(), 'application/json'
+
+    unknown = [column for column in args if column not in columns]
+    if unknown:
+        return error(f"unknown filter(s): {', '.join(unknown)}", columns=columns)
+    if fmt not in ('json', 'arrow'):
+        return error(f"unknown format {fmt!r}, expected json or arrow")
+    if 'team' in args:
+        team = franchise_name(args['team'])
+        if team is None:
+            return error(f"unknown team {args['team']!r}")
+        args['team'] = team
+
+    try:
+        body, mimetype = aggregate_payload(name, mtime, tuple(sorted(args.items())), fmt)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return error("filter value doesn't match the column type", columns=columns)
+    return 200, body, mimetype
+
+
+@app.route('/api/<name>')
+def api(name):
+    # /api/win_ratio?team=Mumbai Indians&season=2019[&format=arrow]; team may be any franchise alias (MI)
+    result = api_response(name, request.args.to_dict())
+    if result is None:
+        abort(404)
+    status, body, mimetype = result
+    return Response(body, status=status, mimetype=mimetype)
+
+def read_json(path, default):
+    # Parsed JSON file, reread only when its mtime changes
+    if not os.path.exists(path):
+        return default
+    mtime = os.stat(path).st_mtime_ns
+    cached = _json_files.get(path)
+    if cached is None or cached[0] != mtime:
+        try:
+            with open(path) as f:
+                cached = (mtime, json.load(f))
+        except ValueError:
+            # Caught mid-write; the next poll reads it again
+            return cached[1] if cached else default
+        _json_files[path] = cached
+    return cached[1]
+
+
+def chart_outputs():
+    # {output path: (chart name, kind)} for every built or live-rendered chart
+    outputs = {}
+    for key, recorded in read_json(MANIFEST_PATH, {}).items():
+        outputs[recorded['output']] = (key.split('#')[0], recorded['kind'])
+    for name, flagged in read_json(LIVE_FLAGS_PATH, {}).get('charts', {}).items():
+        output = flagged.get('output')
+        if output:
+            outputs[output] = (name, output.rsplit('.', 2)[-2] if output.endswith('.json') else 'html')
+    return outputs
+
+
+def check_charts():
+    # Append an event for every output whose content changed since the last check
+    versions = _chart_events['versions']
+    first = not versions
+    changed = []
+    newest = 0
+    for output, (name, kind) in chart_outputs().items():
+        if not os.path.exists(output):
+            continue
+        version = file_etag(output)
+        mtime = os.stat(output).st_mtime_ns // 1000
+        newest = max(newest, mtime)
+        if versions.get(output, version) != version:
+            changed.append((mtime, {'chart': name, 'kind': kind, 'src': f"/{output}", 'version': version}))
+        versions[output] = version
+    if first:
+        _chart_events['seq'] = _chart_events['floor'] = newest
+    if changed:
+        with _events_changed:
+            for mtime, data in sorted(changed, key=lambda change: change[0]):
+                # Ids must grow; an output swapped in with an older mtime than
+                # one already logged takes the next id instead
+                seq = max(mtime, _chart_events['seq'] + 1)
+                if len(_chart_events['log']) == EVENT_LOG_SIZE:
+                    _chart_events['floor'] = _chart_events['log'][0][0]
+                _chart_events['log'].append((seq, data))
+                _chart_events['seq'] = seq
+            _events_changed.notify_all()
+
+
+def watch_charts():
+    while True:
+        try:
+            check_charts()
+        except OSError:
+            # An output replaced between listing and hashing; seen next time
+            pass
+        time.sleep(EVENT_POLL_INTERVAL)
+
+
+def start_chart_watcher():
+    # One watcher per process however many streams are open, started by the first
+    with _events_changed:
+        if _chart_events['watcher'] is None:
+            check_charts()
+            _chart_events['watcher'] = threading.Thread(target=watch_charts, daemon=True)
+            _chart_events['watcher'].start()
+
+
+def event_resume(last_seq):
+    # (id to stream after, whether the client must resync): a client resyncs
+    # when it missed changes this process can't replay. A client ahead of
+    # this process saw a change on another worker that this one hasn't
+    # polled yet; it gets the same id here, so it isn't sent twice.
+    seq = _chart_events['seq']
+    if last_seq is None:
+        return seq, False
+    if last_seq < _chart_events['floor']:
+        return seq, True
+    return last_seq, False
+
+
+def events_after(seq):
+    return [(event_seq, data) for event_seq, data in _chart_events['log'] if event_seq > seq]
+
+
+def sse_message(seq, event, data):
+    return f"id: {seq}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def chart_event_stream(last_seq):
+    # SSE for one client, from after the last event it saw (Last-Event-ID)
+    yield f"retry: {EVENT_RETRY_MS}\n\n"
+    seq, resync = event_resume(last_seq)
+    if resync:
+        yield sse_message(seq, 'resync', {})
+    else:
+        # No event, just the id: a client that reconnects before the next
+        # change resumes from here, on whichever worker it lands
+        yield f"id: {seq}\n\n"
+
+    while True:
+        with _events_changed:
+            _events_changed.wait_for(lambda: _chart_events['seq'] > seq, timeout=EVENT_HEARTBEAT)
+            pending = events_after(seq)
+        if not pending:
+            yield ": keep-alive\n\n"
+        for seq, data in pending:
+            yield sse_message(seq, 'chart', data)
+
+
+@app.route('/events')
+def events():
+    # "chart X changed, new version Y" as server-sent events. Each open stream
+    # is one long request: serve with an async worker (`cli.py serve --async`)
+    # so idle viewers cost a greenlet each instead of a thread.
+    start_chart_watcher()
+    last_seq = request.headers.get('Last-Event-ID', type=int)
+    response = Response(chart_event_stream(last_seq), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Don't let a proxy sit on the stream, and let the static dashboard site subscribe
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    return response
+
+@app.route('/partnerships')
+def partnerships_page():
+    # Partnership network with threshold / season / team controls. The data
+    # modules (pandas and the caches) load on the first request that needs
+    # them, so the server starts with only Flask and pyarrow imported.
+    import partnerships
+
+    return render_template('partnerships.html', threshold=partnerships.DEFAULT_THRESHOLD,
+                           **partnerships.edge_index_options())
+
+
+@app.route('/api/partnerships')
+def partnerships_api():
+    # /api/partnerships?threshold=200&season=2019&team=Mumbai Indians
+    import partnerships
+
+    try:
+        threshold = int(request.args.get('threshold', partnerships.DEFAULT_THRESHOLD))
+        season = int(request.args.get('season', partnerships.ALL_SEASONS))
+    except ValueError:
+        return jsonify(error="threshold and season must be integers"), 400
+    team = request.args.get('team', partnerships.ALL_TEAMS)
+    if team != partnerships.ALL_TEAMS:
+        team = franchise_name(team) or team
+    return jsonify(partnerships.network_view(threshold, season, team))
+
+
+@app.route('/player/<name>')
+def player(name):
+    # Season-by-season batting and bowling for any player, e.g. /player/V Kohli
+    import player_profiles
+
+    if not player_profiles.known_player(name):
+        abort(404)
+    profile = player_profiles.player_profile(name)
+    return jsonify({role: {'rows': len(stats), 'columns': stats.to_dict(orient='list')}
+                    for role, stats in profile.items()})
+
+
+@app.route('/player/<name>/chart')
+def player_chart(name):
+    import player_profiles
+
+    if not player_profiles.known_player(name):
+        abort(404)
+    return player_profiles.profile_figure(name).to_html(include_plotlyjs='cdn')
+
+@app.route('/page/<section>')
+def page(section):
+    # Single-page dashboard: every chart of a section in one document,
+    # hydrated from its JSON spec as it scrolls into view
+    if not os.path.exists(PAGE_INDEX_PATH):
+        return "No page specs found. Please run `python build.py --pages` first."
+
+    with open(PAGE_INDEX_PATH) as f:
+        index = json.load(f)
+    if section not in index['pages']:
+        abort(404)
+
+    return render_template('dashboard.html', section=section, charts=index['pages'][section],
+                           plotly_js_version=index['plotly_js_version'],
+                           vega_versions=index.get('vega_versions', DEFAULT_VEGA_VERSIONS))
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,209 @@
+import argparse
+import json
+import os
+import time
+
+import duckdb
+
+from data_loader import ARCHIVE_DIR, CACHE_DIR, file_hash
+from franchises import alias_table, franchise_table, team_codes
+
+# The archive/ scorecard tables in one embedded DuckDB file (no server),
+# with season copied onto every match-keyed table at ingest, team names
+# replaced by franchise ids, and indexes on match_id, the player id columns
+# and season, so scorecard joins are indexed queries instead of pandas
+# merges of whole CSVs.
+DB_PATH = f"{CACHE_DIR}/archive.duckdb"
+
+# Bump when the ingest SQL or indexes change, so the database is rebuilt
+DB_VERSION = 2
+
+# Table name -> source CSV
+ARCHIVE_TABLES = {
+    'historical': f"{ARCHIVE_DIR}/ipl_historical.csv",
+    'players_info': f"{ARCHIVE_DIR}/ipl_players_info.csv",
+    'batting_card': f"{ARCHIVE_DIR}/ipl_batting_card.csv",
+    'bowling_card': f"{ARCHIVE_DIR}/ipl_bowling_card.csv",
+    'fow_card': f"{ARCHIVE_DIR}/ipl_fow_card.csv",
+    'partnership_card': f"{ARCHIVE_DIR}/ipl_partnership_card.csv",
+}
+
+# Columns indexed per table (season is added to every match-keyed table)
+INDEXES = {
+    'historical': ['match_id', 'season'],
+    'players_info': ['player_id'],
+    'batting_card': ['match_id', 'season', 'batsman_id', 'bowler_id'],
+    'bowling_card': ['match_id', 'season', 'bowler_id'],
+    'fow_card': ['match_id', 'season', 'player_id'],
+    'partnership_card': ['match_id', 'season', 'player1_id', 'player2_id'],
+}
+
+# Player id columns are floats in the CSVs because of blanks
+PLAYER_ID_COLUMNS = {'batsman_id', 'bowler_id', 'player_id', 'player1_id', 'player2_id'}
+
+# Team name/abbreviation columns, stored as franchise ids (franchises.py)
+# under the name on the right; the franchises table holds the names
+TEAM_CODE_COLUMNS = {
+    'team': 'team_code',
+    'opposition': 'opposition_code',
+    'team1_name': 'team1_code',
+    'team2_name': 'team2_code',
+    'toss_winner': 'toss_winner_code',
+    'match_winner': 'match_winner_code',
+}
+
+# Open database connections of this process, by path
+_connections = {}
+
+
+def _source_hashes():
+    return {table: file_hash(path) for table, path in ARCHIVE_TABLES.items()}
+
+
+def _column_sql(con, path, name):
+    if name in PLAYER_ID_COLUMNS:
+        return f"CAST(c.{name} AS BIGINT) AS {name}"
+    if name in TEAM_CODE_COLUMNS:
+        # Fails on names the franchise dimension doesn't know yet
+        team_codes(con.execute(f"SELECT DISTINCT {name} FROM read_csv_auto('{path}')").df()[name])
+        return (f"CAST((SELECT franchise_id FROM team_aliases WHERE alias = c.{name}) AS SMALLINT) "
+                f"AS {TEAM_CODE_COLUMNS[name]}")
+    return f"c.{name}"
+
+
+def _ingest_sql(con, table, path):
+    columns = con.execute(f"DESCRIBE SELECT * FROM read_csv_auto('{path}')").fetchall()
+    select = ', '.join(_column_sql(con, path, name) for name, *_ in columns)
+    if table in ('historical', 'players_info'):
+        return f"CREATE TABLE {table} AS SELECT {select} FROM read_csv_auto('{path}') c"
+    return (f"CREATE TABLE {table} AS SELECT {select}, h.season FROM read_csv_auto('{path}') c "
+            f"LEFT JOIN historical h USING (match_id)")
+
+
+def build_db(path=DB_PATH):
+    # Write the database from scratch into a temp file of this process, then swap it in
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    with duckdb.connect(tmp_path) as con:
+        con.register('franchise_df', franchise_table())
+        con.register('alias_df', alias_table())
+        con.execute("CREATE TABLE franchises AS SELECT * FROM franchise_df")
+        con.execute("CREATE TABLE team_aliases AS SELECT * FROM alias_df")
+        for table, source in ARCHIVE_TABLES.items():
+            con.execute(_ingest_sql(con, table, source))
+            for column in INDEXES[table]:
+                con.execute(f"CREATE INDEX {table}_{column}_idx ON {table} ({column})")
+        meta = json.dumps({'sources': _source_hashes(), 'version': DB_VERSION})
+        con.execute("CREATE TABLE ingest_meta (meta VARCHAR)")
+        con.execute("INSERT INTO ingest_meta VALUES (?)", [meta])
+    os.replace(tmp_path, path)
+    return path
+
+
+def _is_current(path):
+    if not os.path.exists(path):
+        return False
+    with duckdb.connect(path, read_only=True) as con:
+        try:
+            meta = json.loads(con.execute("SELECT meta FROM ingest_meta").fetchone()[0])
+        except duckdb.CatalogException:
+            return False
+    return meta['version'] == DB_VERSION and meta['sources'] == _source_hashes()
+
+
+def ensure_db(path=DB_PATH):
+    # Re-ingest when any archive CSV changed
+    if not _is_current(path):
+        build_db(path)
+    return path
+
+
+def connect(path=DB_PATH):
+    # One read-only connection per process, checked against the CSVs when
+    # first opened; each caller gets its own cursor (safe across threads)
+    if path not in _connections:
+        _connections[path] = duckdb.connect(ensure_db(path), read_only=True)
+    return _connections[path].cursor()
+
+
+def query(sql, params=None, path=DB_PATH):
+    # Run one query against the archive database and return a DataFrame
+    with connect(path) as con:
+        return con.execute(sql, params or []).df()
+
+
+def match_scorecard(match_id):
+    # Batting card of one match with player names, through the match_id and player_id indexes
+    return query("""
+        SELECT b.innings, f.name AS team, b.batsman_position, p.player_name AS batsman, b.runs, b.balls,
+               b.fours, b.sixes, b.strikerate, b.isout, b.wickettype, bw.player_name AS bowler
+        FROM batting_card b
+        LEFT JOIN franchises f ON f.id = b.team_code
+        LEFT JOIN players_info p ON p.player_id = b.batsman_id
+        LEFT JOIN players_info bw ON bw.player_id = b.bowler_id
+        WHERE b.match_id = ?
+        ORDER BY b.innings, b.batsman_position
+    """, [match_id])
+
+
+def player_batting_seasons(player_id):
+    # Season totals for one player from the batting card
+    return query("""
+        SELECT season, count(*) AS innings, sum(runs) AS runs, sum(balls) AS balls,
+               sum(fours) AS fours, sum(sixes) AS sixes
+        FROM batting_card
+        WHERE batsman_id = ?
+        GROUP BY season
+        ORDER BY season
+    """, [player_id])
+
+
+def benchmark():
+    # Per-match scorecard: pandas merge of the CSVs (as read today, and with
+    # the frames already in memory) against the indexed query
+    import pandas as pd
+
+    match_ids = query("SELECT match_id FROM historical USING SAMPLE 20 ROWS")['match_id'].tolist()
+
+    def merged(batting, players, match_id):
+        card = batting.merge(players, left_on='batsman_id', right_on='player_id', how='left')
+        return card[card['match_id'] == match_id]
+
+    start = time.perf_counter()
+    for match_id in match_ids:
+        merged(pd.read_csv(ARCHIVE_TABLES['batting_card']), pd.read_csv(ARCHIVE_TABLES['players_info']), match_id)
+    csv_time = (time.perf_counter() - start) / len(match_ids)
+
+    batting, players = pd.read_csv(ARCHIVE_TABLES['batting_card']), pd.read_csv(ARCHIVE_TABLES['players_info'])
+    start = time.perf_counter()
+    for match_id in match_ids:
+        merged(batting, players, match_id)
+    merge_time = (time.perf_counter() - start) / len(match_ids)
+
+    start = time.perf_counter()
+    for match_id in match_ids:
+        match_scorecard(match_id)
+    db_time = (time.perf_counter() - start) / len(match_ids)
+
+    print(f"read CSVs + pandas merge   {csv_time * 1000:8.2f}ms per match")
+    print(f"pandas merge (in memory)   {merge_time * 1000:8.2f}ms per match")
+    print(f"indexed query              {db_time * 1000:8.2f}ms per match")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the archive scorecard database")
+    parser.add_argument('--force', action='store_true', help="rebuild even if the CSVs are unchanged")
+    parser.add_argument('--benchmark', action='store_true', help="time scorecard lookups against pandas merges")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+    else:
+        start = time.perf_counter()
+        path = build_db() if args.force else ensure_db()
+        print(f"{path} ready in {time.perf_counter() - start:.2f}s")
+        for table in ARCHIVE_TABLES:
+            print(f"  {table:18} {query(f'SELECT count(*) AS n FROM {table}')['n'][0]:>7} rows")
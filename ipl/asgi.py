@@ -0,0 +1,193 @@
+import asyncio
+import contextlib
+import os
+
+from a2wsgi import WSGIMiddleware
+from flask import render_template
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, HTMLResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+from werkzeug.http import parse_accept_header
+from werkzeug.utils import safe_join
+
+import app as dashboard
+from app import (AGGREGATE_DIR, EVENT_HEARTBEAT, EVENT_POLL_INTERVAL, EVENT_RETRY_MS, PLOT_CACHE_CONTROL,
+                 PLOT_DIR, aggregate_table, api_response, check_charts, event_resume, events_after, file_etag,
+                 pick_encoding, plot_files, sse_message)
+
+# Production serving mode: an ASGI app (uvicorn) that answers the hot
+# routes itself, asynchronously:
+#   /, /plots/<file>, /static/..., /api/<name> and /events
+# Everything else goes to the Flask app (app.py) through a thread-pool WSGI
+# bridge. Run one worker process per core:
+#   python cli.py serve --asgi [-w N]
+#   gunicorn -k uvicorn.workers.UvicornWorker -w $(nproc) asgi:app
+# Plots are streamed from disk without holding a worker, and aggregate
+# tables are memory-mapped feather files. Every worker maps the same files,
+# so the OS page cache holds one copy of the data however many workers
+# there are. Each worker keeps only its small cache of encoded payloads.
+
+# Threads for the Flask routes (partnerships, player profiles, pages)
+WSGI_THREADS = 8
+
+# Rendered index page of this worker, keyed on the plot listing it shows
+_index_page = {'files': None, 'html': None}
+
+# Woken (and replaced) by the chart watcher whenever new events are logged
+_watch = {'changed': None}
+
+
+def worker_count():
+    # WEB_CONCURRENCY (as gunicorn and most hosts set it), else one per core
+    return int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+
+
+def accepted_encodings(request):
+    # Parsed the way Flask parses it, so pick_encoding reads q-values alike
+    return parse_accept_header(request.headers.get('accept-encoding'))
+
+
+def etag_matches(request, etag):
+    tags = set()
+    for tag in request.headers.get('if-none-match', '').split(','):
+        tag = tag.strip()
+        tags.add((tag[2:] if tag.startswith('W/') else tag).strip('"'))
+    return '*' in tags or etag in tags
+
+
+async def index(request):
+    files = await run_in_threadpool(plot_files)
+    if not files:
+        return HTMLResponse("No plots found. Please generate them first.")
+    if files != _index_page['files']:
+        # Rendered by Flask's Jinja environment, once per listing
+        with dashboard.app.test_request_context('/'):
+            _index_page['html'] = render_template('index.html', plot_files=files)
+        _index_page['files'] = files
+    return HTMLResponse(_index_page['html'])
+
+
+def locate_plot(filename, accepted):
+    # (body path, encoding, ETag) for a plot, (path, None, None) for any
+    # other file in PLOT_DIR, None when there's nothing to serve. Stats and
+    # (when the plot changed) hashes files, so it runs off the event loop.
+    path = safe_join(PLOT_DIR, filename)
+    if path is None:
+        return None
+    if filename not in plot_files():
+        return (path, None, None) if os.path.isfile(path) else None
+    encoding, body_path = pick_encoding(path, accepted)
+    # Each encoding is a different byte stream, so it gets its own strong ETag
+    return body_path, encoding, file_etag(path) + (f"-{encoding}" if encoding else "")
+
+
+async def plot(request):
+    # Same contract as app.plot: precompressed copies and strong ETags, with
+    # the body streamed from disk by the server
+    found = await run_in_threadpool(locate_plot, request.path_params['filename'], accepted_encodings(request))
+    if found is None:
+        return Response(status_code=404)
+    body_path, encoding, etag = found
+    if etag is None:
+        return FileResponse(body_path)
+
+    headers = {'etag': f'"{etag}"', 'cache-control': PLOT_CACHE_CONTROL, 'vary': 'Accept-Encoding'}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers['content-encoding'] = encoding
+    return FileResponse(body_path, media_type='text/html', headers=headers)
+
+
+async def api(request):
+    # Filtering and encoding a slice (on a cache miss) and the stat of its
+    # table both block, so the whole lookup runs off the event loop
+    result = await run_in_threadpool(api_response, request.path_params['name'], dict(request.query_params))
+    if result is None:
+        return Response(status_code=404)
+    status, body, mimetype = result
+    return Response(body, status_code=status, media_type=mimetype)
+
+
+async def chart_event_stream(last_seq):
+    # app.chart_event_stream without a thread: streams await the watcher
+    yield f"retry: {EVENT_RETRY_MS}\n\n"
+    seq, resync = event_resume(last_seq)
+    if resync:
+        yield sse_message(seq, 'resync', {})
+    else:
+        # As in app.chart_event_stream
+        yield f"id: {seq}\n\n"
+
+    while True:
+        changed = _watch['changed']
+        pending = events_after(seq)
+        if not pending:
+            try:
+                await asyncio.wait_for(changed.wait(), EVENT_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+            continue
+        for seq, data in pending:
+            yield sse_message(seq, 'chart', data)
+
+
+async def events(request):
+    last_seq = request.headers.get('last-event-id')
+    last_seq = int(last_seq) if last_seq and last_seq.isdigit() else None
+    headers = {'cache-control': 'no-cache', 'x-accel-buffering': 'no', 'access-control-allow-origin': '*'}
+    return StreamingResponse(chart_event_stream(last_seq), media_type='text/event-stream', headers=headers)
+
+
+async def watch_charts():
+    # One watcher per worker; stat/hash work runs off the event loop
+    while True:
+        seq = dashboard._chart_events['seq']
+        try:
+            await run_in_threadpool(check_charts)
+        except OSError:
+            pass
+        if dashboard._chart_events['seq'] != seq:
+            changed, _watch['changed'] = _watch['changed'], asyncio.Event()
+            changed.set()
+        await asyncio.sleep(EVENT_POLL_INTERVAL)
+
+
+def map_aggregates():
+    # Map every aggregate table up front, so no request waits on the first open
+    if not os.path.isdir(AGGREGATE_DIR):
+        return
+    for filename in os.listdir(AGGREGATE_DIR):
+        if filename.endswith('.feather'):
+            name = filename[:-len('.feather')]
+            aggregate_table(name, os.stat(f"{AGGREGATE_DIR}/{filename}").st_mtime_ns)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_app):
+    map_aggregates()
+    _watch['changed'] = asyncio.Event()
+    await run_in_threadpool(check_charts)
+    watcher = asyncio.create_task(watch_charts())
+    yield
+    watcher.cancel()
+
+
+app = Starlette(routes=[
+    Route('/', index),
+    Route('/plots/{filename}', plot),
+    Route('/api/{name}', api),
+    Route('/events', events),
+    Mount('/static', StaticFiles(directory='static'), name='static'),
+    Mount('/', WSGIMiddleware(dashboard.app, workers=WSGI_THREADS)),
+], lifespan=lifespan)
+
+
+def serve(host='127.0.0.1', port=8000, workers=None):
+    import uvicorn
+
+    workers = workers or worker_count()
+    print(f"serving on http://{host}:{port} ({workers} uvicorn worker{'s' if workers != 1 else ''})")
+    uvicorn.run('asgi:app', host=host, port=port, workers=workers, log_level='warning')
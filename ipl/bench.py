@@ -0,0 +1,307 @@
+import argparse
+import importlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+import data_loader
+from data_loader import CACHE_DIR, SOURCES, clean_season, file_hash
+
+# Chart pipeline benchmark. The datasets are synthesised at several times
+# their size (seasons appended after the last one, same schemas), then every
+# script is run cold, in its own process and working directory, and timed
+# stage by stage:
+#   import     importing the script (registers its charts)
+#   load       parsing the source CSVs its charts read
+#   clean      the loader's clean step on those frames
+#   aggregate  the chart functions: data work and figure construction
+#   render     serialising each figure to its HTML page
+#   write      writing the pages to disk
+# Results are written as JSON so runs can be compared between commits.
+BENCH_DIR = f"{CACHE_DIR}/bench"
+RESULTS_DIR = "benchmarks"
+
+SCRIPTS = ['Matches', 'match_del', 'Data_Viz_Project', 'trail']
+STAGES = ['import', 'load', 'clean', 'aggregate', 'render', 'write']
+SCALES = [1, 10, 100]
+
+# Synthesised datasets (the archive is used as is)
+SCALED_DATASETS = ['matches', 'deliveries', 'auction']
+
+# Bump when synthesis changes, so stale scaled copies are rewritten
+SYNTH_VERSION = 2
+
+# (read_csv options, clean function) per dataset, as data_loader uses them
+LOADERS = {
+    'matches': (None, data_loader._clean_matches),
+    'deliveries': (data_loader.deliveries_read_options(), data_loader._clean_deliveries),
+    'auction': (None, data_loader._clean_auction),
+    'fow': (None, data_loader._clean_fow),
+    'historical': (None, data_loader._clean_historical),
+}
+
+
+def scale_dir(scale):
+    return os.path.abspath(f"{BENCH_DIR}/{scale}x")
+
+
+def _write_copies(df, path, scale, shift):
+    # Append `scale` shifted copies of df to one CSV, a copy at a time
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for i in range(scale):
+            shift(df, i).to_csv(f, header=i == 0, index=False)
+
+
+def synthesize(scale):
+    # ../datasets for a scale, relative to its working directory. Copy i of
+    # the data is played i * span seasons later with fresh match ids, so
+    # seasons, matches and auctions grow the way they do as years accumulate.
+    root = scale_dir(scale)
+    data_dir = f"{root}/datasets"
+    meta_path = f"{root}/synth.json"
+    sources = {name: file_hash(SOURCES[name]) for name in SCALED_DATASETS}
+    meta = {'scale': scale, 'sources': sources, 'version': SYNTH_VERSION}
+
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f) == meta:
+                return root
+
+    os.makedirs(data_dir, exist_ok=True)
+    matches = pd.read_csv(SOURCES['matches'])
+    seasons = matches['season'].apply(clean_season)
+    span = int(seasons.max() - seasons.min() + 1)
+    offset = int(matches['id'].max()) + 1
+
+    def shift_matches(df, i):
+        if i == 0:
+            return df
+        dates = pd.to_datetime(df['date']) + pd.DateOffset(years=i * span)
+        return df.assign(id=df['id'] + i * offset, season=seasons + i * span, date=dates.dt.strftime('%Y-%m-%d'))
+
+    def shift_deliveries(df, i):
+        return df.assign(match_id=df['match_id'] + i * offset)
+
+    def shift_auction(df, i):
+        return df.assign(Year=df['Year'] + i * span)
+
+    _write_copies(matches, f"{data_dir}/matches.csv", scale, shift_matches)
+    _write_copies(pd.read_csv(SOURCES['deliveries']), f"{data_dir}/deliveries.csv", scale, shift_deliveries)
+    _write_copies(pd.read_csv(SOURCES['auction'], encoding='utf-8-sig', dtype={'Year': 'Int64'}),
+                  f"{data_dir}/{os.path.basename(SOURCES['auction'])}", scale, shift_auction)
+
+    archive = f"{root}/{os.path.basename(data_loader.ARCHIVE_DIR)}"
+    if not os.path.lexists(archive):
+        os.symlink(os.path.abspath(data_loader.ARCHIVE_DIR), archive)
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    return root
+
+
+def dataset_rows(root):
+    rows = {}
+    for name in SCALED_DATASETS:
+        with open(f"{root}/datasets/{os.path.basename(SOURCES[name])}", 'rb') as f:
+            rows[name] = sum(1 for _ in f) - 1
+    return rows
+
+
+def run_script(module_name):
+    # Stage timings for one script, run in the current working directory
+    from chart_registry import charts_in, figure_html, output_path
+
+    timings = dict.fromkeys(STAGES, 0.0)
+    start = time.perf_counter()
+    importlib.import_module(module_name)
+    timings['import'] = time.perf_counter() - start
+
+    entries = charts_in(module_name)
+    for name in sorted({name for entry in entries for name in entry.inputs}):
+        read_options, clean = LOADERS[name]
+        start = time.perf_counter()
+        df = pd.read_csv(SOURCES[name], **(read_options or {}))
+        timings['load'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        # Handed to the loader, so the charts reuse the frame
+        data_loader._loaded[name] = clean(df).reset_index(drop=True)
+        timings['clean'] += time.perf_counter() - start
+
+    charts = {}
+    for entry in entries:
+        chart = {}
+        try:
+            start = time.perf_counter()
+            fig = entry.func()
+            chart['aggregate'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            html = figure_html(fig)
+            chart['render'] = time.perf_counter() - start
+        except Exception as e:
+            # A chart that breaks at this size is recorded, not fatal
+            charts[entry.name] = {'error': f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"}
+            continue
+
+        start = time.perf_counter()
+        output = output_path(entry)
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(html)
+        chart['write'] = time.perf_counter() - start
+        chart['bytes'] = os.path.getsize(output)
+
+        for stage in ('aggregate', 'render', 'write'):
+            timings[stage] += chart[stage]
+        charts[entry.name] = chart
+    return {'stages': timings, 'charts': charts}
+
+
+def _exception_line(stderr):
+    # 'ValueError: ...' from the end of a traceback, skipping warnings printed before it
+    lines = stderr.rsplit('Traceback (most recent call last):', 1)[-1].splitlines()
+    return next((line for line in reversed(lines) if line and not line[0].isspace()), None)
+
+
+def _run_cold(root, module_name):
+    # One script in a fresh process and an empty working directory, so no
+    # cache (frames, feather files, layouts, indexes) carries over
+    work_dir = f"{root}/ipl"
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+    result_path = f"{work_dir}/result.json"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)),
+                                                                      os.environ.get('PYTHONPATH')])))
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', module_name, result_path],
+                          cwd=work_dir, env=env, capture_output=True, text=True)
+    if proc.returncode < 0:
+        # SIGKILL here is almost always the kernel's OOM killer
+        return {'error': f"killed by signal {-proc.returncode}" + (' (out of memory?)' if proc.returncode == -9 else '')}
+    if proc.returncode != 0:
+        return {'error': _exception_line(proc.stderr) or f"exit status {proc.returncode}"}
+    with open(result_path) as f:
+        return json.load(f)
+
+
+def _best(runs):
+    # Best of several runs per stage and per chart, the least noisy estimate
+    if any('error' in run for run in runs):
+        return next(run for run in runs if 'error' in run)
+    best = {'stages': {stage: min(run['stages'][stage] for run in runs) for stage in STAGES}, 'charts': {}}
+    for name, chart in runs[0]['charts'].items():
+        best['charts'][name] = chart if 'error' in chart else {
+            key: min(run['charts'][name][key] for run in runs) for key in chart}
+    return best
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    dirty = subprocess.run(['git', 'diff', '--quiet', 'HEAD', '--', '.'], capture_output=True).returncode
+    return f"{commit}-dirty" if dirty else commit
+
+
+def benchmark(scales=SCALES, scripts=SCRIPTS, repeat=1):
+    results = {
+        'commit': git_commit(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.platform(),
+        'cpus': os.cpu_count(),
+        'repeat': repeat,
+        'scales': {},
+    }
+    for scale in scales:
+        start = time.perf_counter()
+        root = synthesize(scale)
+        rows = dataset_rows(root)
+        print(f"{scale}x data: {rows['matches']} matches, {rows['deliveries']} deliveries, "
+              f"{rows['auction']} auction rows ({time.perf_counter() - start:.1f}s to prepare)")
+
+        scripts_results = {}
+        for module_name in scripts:
+            scripts_results[module_name] = _best([_run_cold(root, module_name) for _ in range(repeat)])
+            print_stages(module_name, scripts_results[module_name])
+        shutil.rmtree(f"{root}/ipl", ignore_errors=True)
+        results['scales'][str(scale)] = {'rows': rows, 'scripts': scripts_results}
+    return results
+
+
+def print_stages(module_name, result, width=18):
+    if 'error' in result:
+        print(f"  {module_name:{width}} failed: {result['error']}")
+        return
+    stages = result['stages']
+    cells = '  '.join(f"{stage} {stages[stage]:7.2f}s" for stage in STAGES)
+    print(f"  {module_name:{width}} {cells}  total {sum(stages.values()):7.2f}s")
+    for name, chart in result['charts'].items():
+        if 'error' in chart:
+            print(f"  {'':{width}} {name} failed: {chart['error']}")
+
+
+def save_results(results, path=None):
+    path = path or f"{RESULTS_DIR}/{results['commit']}.json"
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def compare(base_path, head_path, tolerance=0.1):
+    # Stage-by-stage ratio of two result files; returns the regressions,
+    # stages more than `tolerance` slower (ignoring ones under 10ms)
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(head_path) as f:
+        head = json.load(f)
+
+    print(f"{base['commit']} -> {head['commit']}")
+    regressions = []
+    for scale in sorted(set(base['scales']) & set(head['scales']), key=int):
+        for module_name, result in head['scales'][scale]['scripts'].items():
+            before = base['scales'][scale]['scripts'].get(module_name, {})
+            if 'stages' not in result or 'stages' not in before:
+                continue
+            for stage in STAGES:
+                old, new = before['stages'][stage], result['stages'][stage]
+                ratio = new / old if old else float('inf')
+                flag = ''
+                if ratio > 1 + tolerance and new - old > 0.01:
+                    flag = '  slower'
+                    regressions.append((scale, module_name, stage, ratio))
+                print(f"{scale:>4}x  {module_name:18} {stage:10} {old:8.2f}s -> {new:8.2f}s  {ratio:5.2f}x{flag}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time the chart scripts stage by stage on synthetic scaled-up data")
+    parser.add_argument('--scales', type=int, nargs='+', default=SCALES, help="dataset size multiples to run")
+    parser.add_argument('--scripts', nargs='+', default=SCRIPTS, choices=SCRIPTS, help="scripts to time")
+    parser.add_argument('--repeat', type=int, default=1, help="cold runs per script, the best is kept")
+    parser.add_argument('-o', '--output', help=f"results file (default {RESULTS_DIR}/<commit>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'HEAD'),
+                        help="compare two results files and exit non-zero on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="slowdown allowed by --compare (0.1: 10%%)")
+    parser.add_argument('--child', nargs=2, metavar=('SCRIPT', 'RESULT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        module_name, result_path = args.child
+        result = run_script(module_name)
+        with open(result_path, 'w') as f:
+            json.dump(result, f)
+    elif args.compare:
+        sys.exit(1 if compare(*args.compare, tolerance=args.tolerance) else 0)
+    else:
+        path = save_results(benchmark(args.scales, args.scripts, args.repeat), args.output)
+        print(f"results written to {path}")
@@ -0,0 +1,305 @@
+import argparse
+import ast
+import functools
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import time
+
+from chart_registry import (CHARTS, PAGE_INDEX_PATH, PLOTLY_RUNTIME_PATH, PLOTLY_RUNTIME_URL, output_path, render,
+                            spec_kind, write_plotly_runtime)
+from data_loader import CACHE_DIR, SOURCES, file_hash
+import profiling
+from profiling import print_summary, stage, write_trace
+from render_pool import print_timings, render_parallel
+
+# Scripts whose charts make up the dashboard
+CHART_MODULES = ['Data_Viz_Project', 'Matches', 'match_del', 'player_stats', 'trail']
+
+MANIFEST_PATH = "static/build_manifest.json"
+
+# Where the chart scripts and the project modules they import live
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Module-level values whose repr goes into a chart's code hash
+CONSTANT_TYPES = (str, int, float, bool, tuple, list, dict, set, frozenset)
+
+# Stores derived from the datasets that charts build on first use, by the
+# module that owns them and the function that builds (or loads) them, in
+# dependency order: the crosswalk reads the archive database
+DERIVED_STORES = {
+    'archive_db': 'ensure_db',
+    'player_ids': 'load_crosswalk',
+    'cube': 'load_cube',
+    'partnerships': 'global_layout',
+    'player_profiles': 'ensure_index',
+}
+
+# Chrome trace written by --profile (open in chrome://tracing or ui.perfetto.dev)
+PROFILE_TRACE_PATH = f"{CACHE_DIR}/build_trace.json"
+
+
+def load_chart_modules():
+    # Importing a script registers its charts without rendering them
+    for module_name in CHART_MODULES:
+        importlib.import_module(module_name)
+    return CHARTS
+
+
+def _code_names(code):
+    # Global names a function uses, including in its lambdas and comprehensions
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= _code_names(const)
+    return names
+
+
+def code_hash(func, seen=None):
+    # Hash a chart function together with the module-level helpers it calls
+    # and the module-level constants it reads, so editing a shared helper or
+    # a lookup table also marks the charts using it as stale
+    seen = set() if seen is None else seen
+    func = inspect.unwrap(func)
+    seen.add(func)
+
+    digest = hashlib.sha256(inspect.getsource(func).encode())
+    module_globals = func.__globals__
+    for name in sorted(_code_names(func.__code__)):
+        value = module_globals.get(name)
+        helper = inspect.unwrap(value) if callable(value) else None
+        if inspect.isfunction(helper):
+            if helper.__module__ == func.__module__ and helper not in seen:
+                digest.update(code_hash(helper, seen).encode())
+        elif isinstance(value, CONSTANT_TYPES):
+            digest.update(f"{name}={value!r}".encode())
+    return digest.hexdigest()
+
+
+def project_imports(module_name, seen=None):
+    # Project modules a module imports (at the top or inside functions) and,
+    # in turn, the ones they import
+    seen = set() if seen is None else seen
+    with open(os.path.join(PROJECT_DIR, f"{module_name}.py"), encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            name = name.split('.')[0]
+            if name not in seen and os.path.exists(os.path.join(PROJECT_DIR, f"{name}.py")):
+                seen.add(name)
+                project_imports(name, seen)
+    return seen
+
+
+@functools.lru_cache(maxsize=None)
+def module_hashes(module_name):
+    # {module: file hash} of every project module a chart script depends on;
+    # its own functions are hashed one by one by code_hash instead
+    modules = project_imports(module_name) - {module_name}
+    return {name: file_hash(os.path.join(PROJECT_DIR, f"{name}.py")) for name in sorted(modules)}
+
+
+def fingerprint(entry, input_hashes, options):
+    parts = {
+        'inputs': {name: input_hashes[name] for name in entry.inputs},
+        'code': code_hash(entry.func),
+        'modules': module_hashes(entry.func.__module__),
+        'options': options,
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def prepare_stores(entries):
+    # Build the derived stores the charts use once, here, before any chart
+    # renders; pool workers would otherwise all find one missing and build
+    # it at the same time. Forked workers inherit what's loaded.
+    modules = set()
+    for module_name in {entry.func.__module__ for entry in entries}:
+        modules |= project_imports(module_name)
+    for module_name, builder in DERIVED_STORES.items():
+        if module_name in modules:
+            with stage(f"prepare:{module_name}"):
+                getattr(importlib.import_module(module_name), builder)()
+
+
+def load_manifest():
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    with open(MANIFEST_PATH) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest):
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    with open(MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def manifest_key(entry, options):
+    # HTML files and page specs are separate outputs of the same chart
+    return f"{entry.name}#spec" if options.get('as_spec') else entry.name
+
+
+def stale_charts(charts, manifest, input_hashes, options):
+    # A chart is stale when its inputs or code changed, or its output is missing
+    stale = []
+    for entry in charts:
+        recorded = manifest.get(manifest_key(entry, options), {})
+        if recorded.get('fingerprint') != fingerprint(entry, input_hashes, options) \
+                or not os.path.exists(recorded.get('output', '')):
+            stale.append(entry)
+    return stale
+
+
+def print_sizes(outputs, runtime=None):
+    # Size of every written file, to check slim plots shrink to their data
+    width = max(len(output) for output in outputs)
+    total = 0
+    for output in sorted(set(outputs)):
+        size = os.path.getsize(output)
+        total += size
+        print(f"{output:{width}}  {size / 1024:9.1f} KB")
+    print(f"{'total':{width}}  {total / 1024:9.1f} KB")
+    if runtime:
+        print(f"{runtime:{width}}  {os.path.getsize(runtime) / 1024:9.1f} KB (shared, loaded once)")
+
+
+def page_section(entry):
+    # static/game_plots/x.html -> 'game'
+    return os.path.basename(os.path.dirname(output_path(entry))).replace('_plots', '')
+
+
+def spec_height(path):
+    # Height to reserve for a chart before it hydrates
+    with open(path, encoding='utf-8') as f:
+        spec = json.load(f)
+    height = spec.get('layout', {}).get('height') or spec.get('height')
+    return int(height or 450) + 50
+
+
+def write_page_index(charts, manifest):
+    # Which charts each dashboard page shows and where their specs live
+    pages = {}
+    for entry in charts.values():
+        recorded = manifest.get(f"{entry.name}#spec")
+        if not recorded:
+            continue
+        output, kind = recorded['output'], recorded['kind']
+        height = spec_height(output) if kind != 'html' else 550
+        item = {'name': entry.name, 'kind': kind, 'src': output, 'height': height}
+        pages.setdefault(page_section(entry), []).append(item)
+
+    # Pages load plotly.js and vega matching the versions the specs were written with
+    import altair as alt
+    from plotly.offline import get_plotlyjs_version
+
+    vega_versions = {'vega': alt.VEGA_VERSION, 'vega_lite': alt.SCHEMA_VERSION.lstrip('v'),
+                     'vega_embed': alt.VEGAEMBED_VERSION}
+    index = {'plotly_js_version': get_plotlyjs_version(), 'vega_versions': vega_versions, 'pages': pages}
+    os.makedirs(os.path.dirname(PAGE_INDEX_PATH), exist_ok=True)
+    with open(PAGE_INDEX_PATH, 'w') as f:
+        json.dump(index, f, indent=2)
+    return index
+
+
+def build(names=None, force=False, jobs=1, plotly_js=True, as_spec=False, full_data=False):
+    with stage('import charts'):
+        charts = load_chart_modules()
+    selected = [charts[name] for name in names] if names else list(charts.values())
+
+    needed = {name for entry in selected for name in entry.inputs}
+    with stage('hash inputs'):
+        input_hashes = {name: file_hash(SOURCES[name]) for name in needed}
+
+    manifest = load_manifest()
+    options = {'plotly_js': plotly_js, 'as_spec': as_spec}
+    if full_data:
+        # Only recorded when set, so reduced builds keep their fingerprints
+        options['full_data'] = True
+    todo = selected if force else stale_charts(selected, manifest, input_hashes, options)
+
+    # Slim plots need the shared runtime next to the dashboard
+    runtime = write_plotly_runtime() if isinstance(plotly_js, str) else None
+
+    def record(entry, output, seconds):
+        manifest[manifest_key(entry, options)] = {
+            'output': output,
+            'inputs': list(entry.inputs),
+            'fingerprint': fingerprint(entry, input_hashes, options),
+            'bytes': os.path.getsize(output),
+            'kind': spec_kind(output),
+        }
+        print(f"built {entry.name} -> {output} ({seconds:.2f}s)")
+        # Written after every chart so an interrupted build keeps its progress
+        save_manifest(manifest)
+
+    start = time.perf_counter()
+    prepare_stores(todo)
+    if jobs == 1:
+        timings = {}
+        for entry in todo:
+            chart_start = time.perf_counter()
+            output = render(entry, compress=True, **options)
+            timings[entry.name] = time.perf_counter() - chart_start
+            record(entry, output, timings[entry.name])
+    else:
+        timings = render_parallel(todo, jobs, on_done=record, compress=True, **options)
+
+    print(f"{len(todo)} of {len(selected)} charts rebuilt, {len(selected) - len(todo)} up to date")
+    if timings:
+        print_timings(timings, time.perf_counter() - start)
+        print_sizes([manifest[manifest_key(charts[name], options)]['output'] for name in timings], runtime)
+    if as_spec:
+        write_page_index(charts, manifest)
+    return todo
+
+
+def add_arguments(parser):
+    # Shared by `python build.py` and `python cli.py build`
+    parser.add_argument('charts', nargs='*', help="chart names to consider (default: all)")
+    parser.add_argument('--force', action='store_true', help="rebuild even if up to date")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="render charts across this many processes (0: one per core)")
+    parser.add_argument('--external-plotlyjs', nargs='?', const=PLOTLY_RUNTIME_URL, metavar='URL',
+                        help="reference a shared plotly.js instead of inlining it in every plot "
+                             f"(written to {PLOTLY_RUNTIME_PATH}, default URL {PLOTLY_RUNTIME_URL})")
+    parser.add_argument('--pages', action='store_true',
+                        help="write figure JSON specs and the page index for the single-page dashboard "
+                             "(served by app.py at /page/<section>) instead of standalone HTML files")
+    parser.add_argument('--full-data', action='store_true',
+                        help="ship Altair charts' complete data frames instead of the reduced data "
+                             "(unused columns dropped, floats rounded, dense point clouds thinned)")
+    parser.add_argument('--list', action='store_true', help="list registered charts and exit")
+    parser.add_argument('--profile', nargs='?', const=PROFILE_TRACE_PATH, metavar='TRACE',
+                        help="record wall time, peak RSS and output size per stage and chart, print a summary "
+                             f"and write a Chrome trace (default {PROFILE_TRACE_PATH})")
+
+
+def main(args):
+    if args.list:
+        for entry in load_chart_modules().values():
+            print(f"{entry.name:35} {', '.join(entry.inputs):25} {output_path(entry)}")
+        return
+
+    if args.profile:
+        profiling.enable()
+    build(args.charts, force=args.force, jobs=args.jobs or os.cpu_count(),
+          plotly_js=args.external_plotlyjs or True, as_spec=args.pages, full_data=args.full_data)
+    if args.profile:
+        print()
+        print_summary()
+        print(f"trace written to {write_trace(args.profile)}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rebuild the dashboard charts whose inputs or code changed")
+    add_arguments(parser)
+    main(parser.parse_args())
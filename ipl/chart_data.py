@@ -0,0 +1,116 @@
+import json
+import sys
+
+# Server-side data reduction for Altair charts. Altair inlines a chart's
+# whole DataFrame in the page as JSON: every row and every column, whether
+# the chart draws it or not. In reduced mode (the default) a chart ships
+# only what it shows:
+#   - columns no encoding, tooltip or transform refers to are dropped
+#   - floats are rounded to what a tooltip shows
+#   - dense point clouds are thinned in pandas first (thin_points), one
+#     point per screen cell, carrying the count of rows it stands for
+# and every Altair chart's inline data is checked against its payload
+# budget, with a warning when it goes over. `build.py --full-data` ships
+# the raw frames instead (still checked against the budget).
+
+# Inline data an Altair chart may ship before the build warns; charts with
+# a good reason to ship more set @chart(..., payload_budget=...)
+PAYLOAD_BUDGET = 48 * 1024
+
+# Decimal places floats keep in the shipped data
+FLOAT_DIGITS = 2
+
+# Cells per quantitative axis thin_points bins a point cloud into
+THIN_BINS = 100
+
+# Set by chart_registry.render before a chart's figure is built
+_mode = {'full_data': False}
+
+
+def set_full_data(full_data):
+    _mode['full_data'] = bool(full_data)
+
+
+def reducing():
+    return not _mode['full_data']
+
+
+def thin_points(df, x, y, bins=(THIN_BINS, THIN_BINS), by=(), keep=None, count='points', max_points=0):
+    # One row per (by..., x cell, y cell): the row with the largest `keep`
+    # (the first row without it), plus a `count` column of the rows it
+    # stands for. An axis with bins None is discrete and used as is. Frames
+    # of max_points rows or fewer, and full-data builds, pass through (with
+    # a count of 1) so charts can encode the count either way.
+    if not reducing() or len(df) <= max_points:
+        return df.assign(**{count: 1})
+
+    cells = list(by)
+    keys = df[cells].copy()
+    for axis, n in zip((x, y), bins):
+        if n is None:
+            keys[axis] = df[axis]
+        else:
+            values = df[axis].astype(float)
+            low, span = values.min(), values.max() - values.min()
+            keys[f"{axis} cell"] = ((values - low) / span * (n - 1)).round() if span else 0
+        cells.append(axis if n is None else f"{axis} cell")
+
+    rows = df.sort_values(keep, ascending=False, kind='stable') if keep else df
+    group = keys.loc[rows.index].groupby(cells, sort=False, observed=True, dropna=False).ngroup()
+    first = ~group.duplicated()
+    thinned = rows[first.to_numpy()].assign(**{count: group[first].map(group.value_counts()).to_numpy()})
+    return thinned.sort_index()
+
+
+def _referenced(spec_text, name):
+    # A column is used if the spec (without its data) names it as a field
+    # or reads it in an expression; keeping one by mistake is harmless
+    return (json.dumps(name) in spec_text or f"datum.{name}" in spec_text
+            or f"datum[{json.dumps(name)}]" in spec_text or f"datum['{name}']" in spec_text)
+
+
+def _frames(chart):
+    # The chart and any layered / concatenated sub-charts that carry a DataFrame
+    found = [chart] if hasattr(getattr(chart, 'data', None), 'columns') else []
+    for attr in ('layer', 'hconcat', 'vconcat', 'concat'):
+        for sub in getattr(chart, attr, None) or []:
+            found.extend(_frames(sub))
+    return found
+
+
+def reduce_chart(chart):
+    # Prune unused columns and round floats in every frame the chart inlines
+    with_data = _frames(chart)
+    if not with_data:
+        return chart
+    frames = [sub.data for sub in with_data]
+    for sub in with_data:
+        sub.data = sub.data.iloc[:0]
+    try:
+        spec_text = chart.to_json(validate=False)
+    finally:
+        for sub, frame in zip(with_data, frames):
+            sub.data = frame
+
+    for sub in with_data:
+        df = sub.data
+        df = df[[name for name in df.columns if _referenced(spec_text, str(name))]]
+        floats = df.select_dtypes('float').columns
+        sub.data = df.assign(**{name: df[name].round(FLOAT_DIGITS) for name in floats}) if len(floats) else df
+    return chart
+
+
+def payload_bytes(chart):
+    # Size of the inline data the chart's page will carry
+    return len(json.dumps(chart.to_dict().get('datasets', {}), separators=(',', ':')))
+
+
+def check_payload(name, chart, budget=None):
+    # Warn when the chart ships more inline data than its budget allows
+    budget = budget or PAYLOAD_BUDGET
+    size = payload_bytes(chart)
+    if size > budget:
+        hint = "" if reducing() else " (full-data build)"
+        print(f"warning: {name} ships {size / 1024:.1f} KB of inline data, over its {budget / 1024:.0f} KB "
+              f"budget{hint}; aggregate or thin it before charting", file=sys.stderr)
+    return size
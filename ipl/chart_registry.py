@@ -0,0 +1,144 @@
+import os
+from collections import namedtuple
+
+from chart_data import check_payload, reduce_chart, reducing, set_full_data
+from precompress import precompress, replace_file
+from profiling import stage
+
+# Every chart the scripts produce: a name, the file it is written to, the
+# datasets (data_loader names) it reads and the function that builds it.
+# `output` may be a callable when the file name depends on the data, and
+# `payload_budget` overrides chart_data.PAYLOAD_BUDGET for an Altair chart.
+Chart = namedtuple('Chart', ['name', 'output', 'inputs', 'func', 'payload_budget'], defaults=(None,))
+
+CHARTS = {}
+
+# Shared plotly.js runtime for slim figure files. The URL is relative to the
+# dashboard's assets/plots/<section>/ folders the plots get copied into.
+PLOTLY_RUNTIME_PATH = "../dataviz-ipl/src/assets/libs/plotly/plotly.min.js"
+PLOTLY_RUNTIME_URL = "../../libs/plotly/plotly.min.js"
+
+# Figure JSON specs for the single-page dashboard, and the index of which
+# charts each page shows
+SPEC_DIR = "static/specs"
+PAGE_INDEX_PATH = f"{SPEC_DIR}/pages.json"
+
+
+def chart(output, inputs, payload_budget=None):
+    # Decorator used by the scripts to register a figure-building function.
+    # Two charts writing one file would overwrite each other, so that's refused.
+    def register(func):
+        for other in CHARTS.values():
+            if other.name != func.__name__ and isinstance(output, str) and other.output == output:
+                raise ValueError(f"{func.__name__} and {other.name} both write {output}")
+        CHARTS[func.__name__] = Chart(func.__name__, output, tuple(inputs), func, payload_budget)
+        return func
+    return register
+
+
+def output_path(entry):
+    return entry.output() if callable(entry.output) else entry.output
+
+
+def write_plotly_runtime(path=PLOTLY_RUNTIME_PATH):
+    # Write the plotly.js bundle once, for figures saved with an external runtime
+    from plotly.offline import get_plotlyjs
+
+    runtime = get_plotlyjs()
+    if not os.path.exists(path) or os.path.getsize(path) != len(runtime.encode()):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(runtime)
+    return path
+
+
+def figure_html(fig, plotly_js=True):
+    # The standalone HTML page of a plotly figure, Altair chart or PyVis network.
+    # plotly_js=True inlines plotly.js, a '.js' URL references a shared copy.
+    if hasattr(fig, 'save'):
+        return fig.to_html()
+    if hasattr(fig, 'to_plotly_json'):
+        return fig.to_html(include_plotlyjs=plotly_js)
+    return fig.generate_html()
+
+
+def save_figure(fig, output, plotly_js=True):
+    # Rendered and written as separate stages, so profiles tell HTML
+    # generation from disk writes. PyVis writes its own page (and its lib/
+    # assets when they're local). Either way the file is swapped in whole,
+    # as the app may be serving the previous version.
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    if not (hasattr(fig, 'save') or hasattr(fig, 'to_plotly_json')):
+        # PyVis only writes names ending in .html
+        tmp_path = f"{output[:-len('.html')]}.{os.getpid()}.tmp.html"
+        with stage('write', output=output):
+            fig.write_html(tmp_path)
+            os.replace(tmp_path, output)
+        return
+
+    with stage('render html'):
+        html = figure_html(fig, plotly_js)
+    with stage('write', output=output):
+        replace_file(output, html)
+
+
+def figure_spec(fig):
+    # (kind, JSON) a page can hydrate client-side; PyVis networks only render to HTML
+    if hasattr(fig, 'to_plotly_json'):
+        return 'plotly', fig.to_json()
+    if hasattr(fig, 'save'):
+        return 'vega-lite', fig.to_json()
+    return None
+
+
+def spec_path(entry, kind):
+    return f"{SPEC_DIR}/{entry.name}.{kind}.json"
+
+
+def spec_kind(output):
+    # static/specs/<name>.<kind>.json -> kind, standalone HTML files -> 'html'
+    return output.rsplit('.', 2)[-2] if output.endswith('.json') else 'html'
+
+
+def render(entry, plotly_js=True, as_spec=False, full_data=False, compress=False):
+    # Write the chart's HTML file, or with as_spec its JSON spec when it has
+    # one. Altair charts ship reduced data unless full_data (see chart_data.py).
+    # compress also writes the .gz/.br copies app.py serves, in the same process.
+    set_full_data(full_data)
+    with stage('chart', chart=entry.name) as record:
+        with stage('figure'):
+            fig = entry.func()
+        if hasattr(fig, 'save'):
+            with stage('reduce data') as reduced:
+                if reducing():
+                    fig = reduce_chart(fig)
+                # Inline data size goes into the profile trace's args
+                reduced.get('args', {})['payload'] = check_payload(entry.name, fig, entry.payload_budget)
+        spec = None
+        if as_spec:
+            with stage('render spec'):
+                spec = figure_spec(fig)
+        if spec is None:
+            output = output_path(entry)
+            save_figure(fig, output, plotly_js)
+        else:
+            kind, spec_json = spec
+            output = spec_path(entry, kind)
+            os.makedirs(SPEC_DIR, exist_ok=True)
+            with stage('write', output=output):
+                replace_file(output, spec_json)
+        if compress:
+            with stage('precompress'):
+                precompress(output)
+        record['output'] = output
+    return output
+
+
+def charts_in(module_name):
+    return [entry for entry in CHARTS.values() if entry.func.__module__ == module_name]
+
+
+def render_module(module_name):
+    # What running one of the chart scripts directly does
+    for entry in charts_in(module_name):
+        render(entry)
@@ -0,0 +1,183 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# One entry point for the chart pipeline and the server:
+#   python cli.py build [charts] [--pages] [-j N] ...   (same options as build.py)
+#   python cli.py list
+#   python cli.py serve [--host H] [--port P] [--async | --asgi [-w N]]
+#   python cli.py export [charts] [--format png svg]     (same options as export_images.py)
+#   python cli.py live [--socket [PORT]] [--no-render]   (same options as live.py)
+# Nothing heavy is imported up front: each command imports what it runs,
+# and the chart scripts import plotly / altair / pyvis inside the charts
+# that use them, so building one Altair chart never loads Selenium or
+# IPython. --import-time reruns the command with Python's import profiler
+# and reports what was imported and what it cost.
+
+# Libraries worth knowing about when they load (or don't)
+HEAVY_LIBRARIES = ['pandas', 'pyarrow', 'duckdb', 'plotly', 'altair', 'networkx', 'pyvis', 'selenium',
+                   'ipywidgets', 'IPython', 'bar_chart_race', 'flask']
+
+# Packages shown in the import-time report
+REPORT_TOP = 12
+
+
+def _build_args(argv):
+    # build.py's own options, parsed only once the build command is chosen
+    import build
+
+    parser = argparse.ArgumentParser(prog='cli.py build',
+                                     description="Rebuild the dashboard charts whose inputs or code changed")
+    build.add_arguments(parser)
+    return build, parser.parse_args(argv)
+
+
+def build_command(args):
+    build, build_args = _build_args(args.extra)
+    build.main(build_args)
+
+
+def list_command(args):
+    build, build_args = _build_args(['--list'])
+    build.main(build_args)
+
+
+def export_command(args):
+    import export_images
+
+    parser = argparse.ArgumentParser(prog='cli.py export',
+                                     description="Export charts as PNG/SVG through a pool of warm renderers")
+    export_images.add_arguments(parser)
+    export_images.main(parser.parse_args(args.extra))
+
+
+def live_command(args):
+    import live
+
+    parser = argparse.ArgumentParser(prog='cli.py live',
+                                     description="Ingest live deliveries and keep the charts up to date")
+    live.add_arguments(parser)
+    live.main(parser.parse_args(args.extra))
+
+
+def serve_command(args):
+    if args.asgi:
+        import asgi
+
+        asgi.serve(args.host, args.port, args.workers)
+        return
+
+    if args.async_worker:
+        # gevent makes sockets, sleeps and thread locks cooperative, so each
+        # open /events stream is a greenlet rather than a pinned thread. It has
+        # to patch before Flask (and the threading it uses) is imported.
+        from gevent import monkey
+        monkey.patch_all()
+        from gevent.pywsgi import WSGIServer
+
+        from app import app
+
+        print(f"serving on http://{args.host}:{args.port} (gevent)")
+        WSGIServer((args.host, args.port), app).serve_forever()
+        return
+
+    from app import app
+
+    app.run(host=args.host, port=args.port, debug=args.debug, threaded=True)
+
+
+def parse_import_times(lines):
+    # {top-level package: microseconds} from `python -X importtime` output,
+    # summing each module's own (self) time into its package, so pandas'
+    # cost is pandas' even when build.py is what imported it
+    totals = {}
+    for line in lines:
+        own, _, name = line[len('import time:'):].split('|')
+        if not own.strip().isdigit():
+            continue
+        package = name.strip().split('.')[0]
+        totals[package] = totals.get(package, 0) + int(own)
+    return totals
+
+
+def print_import_report(totals, wall_time):
+    print(f"\nimport time (wall time {wall_time:.2f}s)", file=sys.stderr)
+    for package, us in sorted(totals.items(), key=lambda item: item[1], reverse=True)[:REPORT_TOP]:
+        print(f"  {package:24} {us / 1e6:7.3f}s", file=sys.stderr)
+    print(f"  {'all imports':24} {sum(totals.values()) / 1e6:7.3f}s", file=sys.stderr)
+    skipped = [name for name in HEAVY_LIBRARIES if name not in totals]
+    if skipped:
+        print(f"  not imported: {', '.join(skipped)}", file=sys.stderr)
+
+
+def run_with_import_report(argv):
+    # Rerun this command with the import profiler on, passing its output
+    # through and keeping the profiler's lines for the report
+    argv = [arg for arg in argv if arg != '--import-time']
+    env = dict(os.environ, PYTHONPROFILEIMPORTTIME='1')
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), *argv], env=env,
+                            stderr=subprocess.PIPE, text=True)
+    import_lines = []
+    try:
+        for line in proc.stderr:
+            if line.startswith('import time:'):
+                import_lines.append(line.rstrip('\n'))
+            else:
+                sys.stderr.write(line)
+        proc.wait()
+    except KeyboardInterrupt:
+        proc.wait()
+    print_import_report(parse_import_times(import_lines), time.perf_counter() - start)
+    return proc.returncode
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(description="Build the IPL charts or serve the dashboard")
+    parser.add_argument('--import-time', action='store_true',
+                        help="report which libraries the command imported and how long they took")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    # Its options are build.py's, parsed by build_command
+    build_parser = commands.add_parser('build', add_help=False, help="rebuild charts whose inputs or code changed "
+                                                                      "(see `cli.py build --help`)")
+    build_parser.set_defaults(run=build_command)
+
+    # Its options are export_images.py's, parsed by export_command
+    export_parser = commands.add_parser('export', add_help=False, help="write PNG/SVG copies of charts "
+                                                                        "(see `cli.py export --help`)")
+    export_parser.set_defaults(run=export_command)
+
+    # Its options are live.py's, parsed by live_command
+    live_parser = commands.add_parser('live', add_help=False, help="ingest live deliveries and re-render what "
+                                                                    "they change (see `cli.py live --help`)")
+    live_parser.set_defaults(run=live_command)
+
+    list_parser = commands.add_parser('list', help="list registered charts")
+    list_parser.set_defaults(run=list_command)
+
+    serve_parser = commands.add_parser('serve', help="run the Flask dashboard server")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=5000)
+    serve_parser.add_argument('--debug', action='store_true', help="Flask debug mode with the reloader")
+    servers = serve_parser.add_mutually_exclusive_group()
+    servers.add_argument('--async', dest='async_worker', action='store_true',
+                         help="serve with a gevent worker, so open /events streams don't each hold a thread")
+    servers.add_argument('--asgi', action='store_true',
+                         help="production mode: asgi.py on uvicorn, one worker process per core")
+    serve_parser.add_argument('-w', '--workers', type=int,
+                              help="worker processes for --asgi (default: WEB_CONCURRENCY or the core count)")
+    serve_parser.set_defaults(run=serve_command)
+    return parser
+
+
+if __name__ == '__main__':
+    if '--import-time' in sys.argv[1:]:
+        sys.exit(run_with_import_report(sys.argv[1:]))
+    parser = make_parser()
+    args, args.extra = parser.parse_known_args()
+    if args.extra and args.command not in ('build', 'export', 'live'):
+        parser.error(f"unrecognized arguments: {' '.join(args.extra)}")
+    args.run(args)
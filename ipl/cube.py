@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+from data_loader import SOURCES, cached_frame, file_hash, load_deliveries, load_matches
+from profiling import stage
+
+# Player-season-team cube: one row per (player, season, team, venue, phase, won)
+# with additive batting and bowling measures, so charts roll it up instead of
+# scanning every delivery. `team` is the side the player played for and `won`
+# whether that side won the match.
+CUBE_KEYS = ['player', 'season', 'team', 'venue', 'phase', 'won']
+BATTING_MEASURES = ['bat_runs', 'bat_balls', 'bat_dots', 'bat_fours', 'bat_sixes', 'bat_outs']
+BOWLING_MEASURES = ['bowl_balls', 'bowl_runs', 'bowl_dots', 'bowl_wickets']
+
+# Over numbers are 0-based in deliveries.csv
+PHASES = ['powerplay', 'middle', 'death']
+PHASE_BINS = [-1, 5, 14, 19]
+
+# Cells of the balls streamed in since the cube was built (live.py), kept
+# apart from the cube and added into each rollup's result while set
+_live = {'cells': None}
+
+def _with_match_context(deliveries, matches):
+    # season, venue, winner and phase for every ball, looked up at match grain
+    by_match = matches.set_index('id')
+    context = pd.DataFrame({
+        'season': deliveries['match_id'].map(by_match['season']),
+        'venue': deliveries['match_id'].map(by_match['venue']).astype('category'),
+        'winner': deliveries['match_id'].map(by_match['winner']),
+        'phase': pd.cut(deliveries['over'], PHASE_BINS, labels=PHASES),
+    }, index=deliveries.index)
+    return pd.concat([deliveries, context], axis=1)
+
+
+def build_cube():
+    deliveries, matches = load_deliveries(), load_matches()
+    with stage('cube: match context'):
+        balls = _with_match_context(deliveries, matches)
+    runs, total = balls['batsman_runs'], balls['total_runs']
+
+    batting = pd.DataFrame({
+        'player': balls['batter'],
+        'team': balls['batting_team'],
+        'won': (balls['batting_team'] == balls['winner']).to_numpy(),
+        'bat_runs': runs,
+        'bat_balls': 1,
+        'bat_dots': (runs == 0).astype('int8'),
+        'bat_fours': (runs == 4).astype('int8'),
+        'bat_sixes': (runs == 6).astype('int8'),
+        'bat_outs': (balls['player_dismissed'] == balls['batter']).astype('int8'),
+    })
+    bowling = pd.DataFrame({
+        'player': balls['bowler'],
+        'team': balls['bowling_team'],
+        'won': (balls['bowling_team'] == balls['winner']).to_numpy(),
+        'bowl_balls': 1,
+        'bowl_runs': total,
+        'bowl_dots': (total == 0).astype('int8'),
+        'bowl_wickets': balls['is_wicket'],
+    })
+    for side in (batting, bowling):
+        side[['season', 'venue', 'phase']] = balls[['season', 'venue', 'phase']]
+
+    with stage('cube: groupby'):
+        batting = batting.groupby(CUBE_KEYS, observed=True).sum()
+        bowling = bowling.groupby(CUBE_KEYS, observed=True).sum()
+
+    # A player's batting and bowling in the same cell share one row
+    with stage('cube: join'):
+        cube = batting.join(bowling, how='outer').fillna(0)
+    measures = BATTING_MEASURES + BOWLING_MEASURES
+    cube[measures] = cube[measures].astype(np.int32)
+    return cube.reset_index()
+
+
+def load_cube():
+    # Materialised next to the dataset caches, rebuilt when either source changes
+    digest = file_hash(SOURCES['deliveries']) + file_hash(SOURCES['matches'])
+    return cached_frame('cube', digest, build_cube)
+
+
+def set_live_cells(cells):
+    # Publish live cells (cube rows, any keys repeated) to the rollups that
+    # follow, or drop them with None. Only the cells are kept, so publishing
+    # costs O(live cells) however big the cube is.
+    if cells is None or cells.empty:
+        _live['cells'] = None
+        return
+    _live['cells'] = cells[CUBE_KEYS + BATTING_MEASURES + BOWLING_MEASURES]
+
+
+def _sum(cells, by, measures, where):
+    if where is not None:
+        cells = cells[where(cells)]
+    return cells.groupby(by, observed=True)[measures].sum().reset_index()
+
+
+def rollup(by, measures, where=None):
+    # Sum measures over everything except `by`, optionally on a filtered cube,
+    # with the live cells' sums added in. Player and venue names new to the
+    # cube are added as categories, so the key columns stay categorical.
+    totals = _sum(load_cube(), by, measures, where)
+    if _live['cells'] is None:
+        return totals
+    live = _sum(_live['cells'], by, measures, where)
+    if live.empty:
+        return totals
+
+    keys = [by] if isinstance(by, str) else list(by)
+    for column in keys:
+        dtype = totals[column].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            new = sorted(set(live[column]) - set(dtype.categories))
+            totals[column] = totals[column].cat.add_categories(new)
+            live[column] = pd.Categorical(live[column], dtype=totals[column].dtype)
+    both = pd.concat([totals, live], ignore_index=True)
+    return both.groupby(keys, observed=True)[measures].sum().reset_index()
@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from franchises import team_codes
+from profiling import stage
+
+# Source CSVs live next to the project, the columnar cache next to the scripts
+DATA_DIR = "../datasets"
+ARCHIVE_DIR = "../archive"
+CACHE_DIR = "cache"
+
+# Every dataset the chart scripts read, by the name charts declare as an input
+SOURCES = {
+    'matches': f"{DATA_DIR}/matches.csv",
+    'deliveries': f"{DATA_DIR}/deliveries.csv",
+    'auction': f"{DATA_DIR}/IPLPlayerAuctionData.csv",
+    'fow': f"{ARCHIVE_DIR}/ipl_fow_card.csv",
+    'historical': f"{ARCHIVE_DIR}/ipl_historical.csv",
+    # Archive tables charts read through archive_db and the player crosswalk
+    # rather than a load_<name>() frame
+    'players_info': f"{ARCHIVE_DIR}/ipl_players_info.csv",
+    'batting_card': f"{ARCHIVE_DIR}/ipl_batting_card.csv",
+    'bowling_card': f"{ARCHIVE_DIR}/ipl_bowling_card.csv",
+}
+
+# Bump when a clean function or schema changes, so old caches are rebuilt
+CACHE_VERSION = 4
+
+# Compact schema for ball-by-ball data: small ints for counters and one
+# shared set of categories for every player column and for both team columns
+DELIVERIES_DTYPES = {
+    'match_id': 'int32',
+    'inning': 'int8',
+    'over': 'int8',
+    'ball': 'int8',
+    'batsman_runs': 'int8',
+    'extra_runs': 'int8',
+    'total_runs': 'int8',
+    'is_wicket': 'int8',
+    'extras_type': 'category',
+    'dismissal_kind': 'category',
+}
+PLAYER_COLUMNS = ['batter', 'bowler', 'non_striker', 'player_dismissed', 'fielder']
+TEAM_COLUMNS = ['batting_team', 'bowling_team']
+
+# Team columns of matches.csv and the archive; every team column is stored as a franchise
+# categorical (franchises.TEAM_DTYPE), its codes being franchise ids
+MATCH_TEAM_COLUMNS = ['team1', 'team2', 'toss_winner', 'winner']
+HISTORICAL_TEAM_COLUMNS = ['team1_name', 'team2_name', 'toss_winner', 'match_winner']
+
+# Name columns the loaders can join archive player ids onto (player_ids.py
+# crosswalk), by dataset, with the id column each one gets
+PLAYER_ID_COLUMNS = {
+    'auction': {'Player': 'player_id'},
+    'deliveries': {column: f"{column}_id" for column in PLAYER_COLUMNS},
+}
+
+# Frames already loaded by this process, keyed by dataset name
+_loaded = {}
+
+
+def file_hash(path):
+    # sha256 of a source file, read in chunks so big CSVs don't sit in memory twice
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Seasons matches.csv labels across two years, by the IPL year they were
+# played as (the archive and franchises.py use IPL years). 2020/21 is IPL
+# 2020, played late in the year; a plain 2021 follows it.
+SPLIT_SEASONS = {'2007/08': 2008, '2009/10': 2010, '2020/21': 2020}
+
+
+def clean_season(season):
+    # '2007/08' -> 2008, '2009/10' -> 2010, '2020/21' -> 2020, 2015 -> 2015
+    if isinstance(season, str) and '/' in season:
+        if season in SPLIT_SEASONS:
+            return SPLIT_SEASONS[season]
+        first, second = season.split('/')
+        return int(first[:-len(second)] + second)
+    return int(season)
+
+
+def cached_frame(name, digest, build):
+    # Build a frame once, then reuse its feather copy until `digest` (the hash
+    # of whatever it was built from) changes
+    if name in _loaded:
+        return _loaded[name]
+
+    cache_path = os.path.join(CACHE_DIR, f"{name}.feather")
+    meta_path = os.path.join(CACHE_DIR, f"{name}.json")
+
+    df = None
+    if os.path.exists(cache_path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get('sha256') == digest and meta.get('version') == CACHE_VERSION:
+            # Uncompressed feather files are memory-mapped instead of read
+            with stage(f"read cache:{name}"):
+                df = feather.read_table(cache_path, memory_map=True).to_pandas()
+
+    if df is None:
+        with stage(f"build:{name}"):
+            df = build().reset_index(drop=True)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with stage(f"write cache:{name}", output=cache_path):
+            feather.write_feather(df, cache_path, compression='uncompressed')
+        with open(meta_path, 'w') as f:
+            json.dump({'sha256': digest, 'version': CACHE_VERSION}, f, indent=2)
+
+    _loaded[name] = df
+    return df
+
+
+def forget(name):
+    # Drop a loaded frame, so the next load_<name>() checks its source again
+    _loaded.pop(name, None)
+
+
+def _load_cached(name, clean, read_options=None):
+    # Parse a source CSV once, cached until the CSV's hash changes
+    if name in _loaded:
+        return _loaded[name]
+    path = SOURCES[name]
+
+    def parse():
+        with stage(f"read_csv:{name}"):
+            df = pd.read_csv(path, **(read_options or {}))
+        with stage(f"clean:{name}"):
+            return clean(df)
+
+    return cached_frame(name, file_hash(path), parse)
+
+
+def _clean_matches(df):
+    df['season'] = df['season'].apply(clean_season)
+    for column in MATCH_TEAM_COLUMNS:
+        df[column] = team_codes(df[column])
+    return df
+
+
+def share_categories(df, columns):
+    # Give several categorical columns one common category set, so their codes
+    # are comparable and a name is stored once however many columns it's in
+    columns = [column for column in columns if column in df]
+    categories = pd.Index(sorted(set().union(*(df[column].cat.categories for column in columns))))
+    for column in columns:
+        df[column] = df[column].cat.set_categories(categories)
+    return df
+
+
+def _clean_deliveries(df):
+    # Mapping a categorical only touches its categories, not every row
+    for column in TEAM_COLUMNS:
+        df[column] = team_codes(df[column])
+    share_categories(df, PLAYER_COLUMNS)
+    return df
+
+
+def deliveries_read_options():
+    dtypes = dict(DELIVERIES_DTYPES)
+    dtypes.update({column: 'category' for column in PLAYER_COLUMNS + TEAM_COLUMNS})
+    return {'dtype': dtypes}
+
+
+def _clean_auction(df):
+    df = df.dropna(subset=['Year'])
+    df['Year'] = df['Year'].astype(int)
+    df['Team'] = team_codes(df['Team'])
+    return df
+
+
+def _clean_fow(df):
+    df['team'] = team_codes(df['team'])
+    return df
+
+
+def _clean_historical(df):
+    for column in HISTORICAL_TEAM_COLUMNS:
+        df[column] = team_codes(df[column])
+    return df
+
+
+def with_player_ids(df, name):
+    # A copy of the frame with the archive player_id of every name column
+    # (<NA> where the crosswalk has no match); the cached frame is untouched
+    from player_ids import attach_player_ids
+
+    for column, id_column in PLAYER_ID_COLUMNS[name].items():
+        df = attach_player_ids(df, column, name, id_column)
+    return df
+
+
+def load_matches():
+    return _load_cached('matches', _clean_matches)
+
+
+def load_deliveries(player_ids=False):
+    df = _load_cached('deliveries', _clean_deliveries, deliveries_read_options())
+    return with_player_ids(df, 'deliveries') if player_ids else df
+
+
+def load_auction(player_ids=False):
+    df = _load_cached('auction', _clean_auction)
+    return with_player_ids(df, 'auction') if player_ids else df
+
+
+def load_fow():
+    return _load_cached('fow', _clean_fow)
+
+
+def load_historical():
+    return _load_cached('historical', _clean_historical)
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def schema_report():
+    # Memory and latency of deliveries with default object dtypes vs the compact schema
+    path = SOURCES['deliveries']
+    plain, plain_load = _timed(lambda: pd.read_csv(path))
+    compact, compact_load = _timed(lambda: _clean_deliveries(pd.read_csv(path, **deliveries_read_options())))
+
+    rows = [('load CSV (s)', plain_load, compact_load),
+            ('memory (MB)', plain.memory_usage(deep=True).sum() / 1e6, compact.memory_usage(deep=True).sum() / 1e6)]
+    for label, keys in [('groupby batter (s)', ['batter']),
+                        ('groupby batter, non_striker (s)', ['batter', 'non_striker']),
+                        ('groupby bowler, bowling_team (s)', ['bowler', 'bowling_team'])]:
+        _, plain_time = _timed(lambda: plain.groupby(keys)['batsman_runs'].sum())
+        _, compact_time = _timed(lambda: compact.groupby(keys, observed=True)['batsman_runs'].sum())
+        rows.append((label, plain_time, compact_time))
+
+    print(f"deliveries: {len(plain)} rows")
+    print(f"{'':34}{'object dtypes':>15}{'compact':>12}")
+    for label, before, after in rows:
+        print(f"{label:34}{before:15.3f}{after:12.3f}")
+
+
+if __name__ == '__main__':
+    schema_report()
@@ -0,0 +1,250 @@
+import argparse
+import base64
+import json
+import os
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from urllib.parse import quote
+
+from render_pool import _pool_context
+
+# Static PNG/SVG export for docs and social cards. A small pool of worker
+# processes each keeps its renderers warm between images: kaleido's
+# Chromium for plotly (started once per process, on warm-up), vl-convert
+# for Altair when it's installed, and one headless Chrome (Selenium) for
+# Altair without vl-convert and for PyVis networks. Jobs carry the figure
+# spec (the JSON build.py --pages writes), so figures are never rebuilt
+# in the workers, and any number of batches can go through one pool.
+IMAGE_DIR = "static/images"
+
+FORMATS = ['png', 'svg']
+
+# Two warm renderers are enough to keep a batch busy without each worker's
+# Chromium fighting for memory
+EXPORT_WORKERS = 2
+
+# Social-card size, the default for plotly figures and browser screenshots
+DEFAULT_WIDTH = 1200
+DEFAULT_HEIGHT = 630
+
+# kind: 'plotly' or 'vega-lite' (spec is the JSON text) or 'html' (spec is
+# the path of a page to screenshot, PNG only)
+ExportJob = namedtuple('ExportJob', ['name', 'kind', 'spec', 'fmt', 'output'])
+
+# Renderers of this worker process, created once and reused
+_renderers = {}
+
+# How long a browser page may take to draw its chart
+PAGE_TIMEOUT = 30
+
+# Where the browser fallback loads vega from
+VEGA_CDN = "https://cdn.jsdelivr.net/npm"
+
+
+def _browser():
+    if 'browser' not in _renderers:
+        from multiprocessing.util import Finalize
+
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+
+        options = Options()
+        options.add_argument('--headless=new')
+        options.add_argument(f"--window-size={DEFAULT_WIDTH},{DEFAULT_HEIGHT}")
+        driver = webdriver.Chrome(options=options)
+        driver.set_script_timeout(PAGE_TIMEOUT)
+        # Pool workers leave through os._exit, so atexit wouldn't quit Chrome
+        Finalize(driver, driver.quit, exitpriority=10)
+        _renderers['browser'] = driver
+    return _renderers['browser']
+
+
+def _plotly_image(spec, fmt, width, height, scale):
+    import plotly.io as pio
+
+    fig = pio.from_json(spec)
+    return pio.to_image(fig, format=fmt, width=width, height=height, scale=scale)
+
+
+def _vega_lite_image(spec, fmt, scale):
+    try:
+        import vl_convert as vlc
+    except ImportError:
+        vlc = None
+    if vlc is not None:
+        if fmt == 'svg':
+            return vlc.vegalite_to_svg(spec).encode()
+        return vlc.vegalite_to_png(spec, scale=scale)
+
+    # No vl-convert: draw it with vega-embed on a page kept open in the warm
+    # browser, and ask the view for the image
+    driver = _vega_page(json.loads(spec).get('$schema', ''))
+    image = driver.execute_async_script("""
+        const [spec, fmt, scale, done] = arguments;
+        vegaEmbed('#vis', spec, {actions: false})
+            .then((result) => fmt === 'svg' ? result.view.toSVG(scale) : result.view.toImageURL('png', scale))
+            .then(done, (error) => done('error: ' + error));
+    """, json.loads(spec), fmt, scale)
+    if image.startswith('error: '):
+        raise RuntimeError(image[len('error: '):])
+    if fmt == 'svg':
+        return image.encode()
+    return base64.b64decode(image.split(',', 1)[1])
+
+
+def _vega_page(schema):
+    # Blank page with vega, vega-lite (the spec's version) and vega-embed loaded
+    version = re.search(r'/v([\d.]+)\.json$', schema)
+    vega_lite = f"vega-lite@{version.group(1) if version else 5}"
+    driver = _browser()
+    if _renderers.get('page') != vega_lite:
+        html = (f'<!DOCTYPE html><html><head><script src="{VEGA_CDN}/vega@5"></script>'
+                f'<script src="{VEGA_CDN}/{vega_lite}"></script><script src="{VEGA_CDN}/vega-embed@6"></script>'
+                f'</head><body><div id="vis"></div></body></html>')
+        driver.get("data:text/html;charset=utf-8," + quote(html))
+        _renderers['page'] = vega_lite
+    return driver
+
+
+def _page_screenshot(path, fmt, width, height):
+    if fmt != 'png':
+        raise ValueError(f"HTML pages can only be exported as PNG, not {fmt}")
+    driver = _browser()
+    driver.set_window_size(width, height)
+    driver.get(f"file://{os.path.abspath(path)}")
+    _renderers.pop('page', None)
+    # PyVis pages draw on load; give the canvas a moment to settle
+    time.sleep(1)
+    return driver.get_screenshot_as_png()
+
+
+def _warm_up():
+    # Start kaleido's Chromium now rather than on the first image; the
+    # browser only starts when a job needs it
+    try:
+        import plotly.graph_objects as go
+        import plotly.io as pio
+
+        pio.to_image(go.Figure(), format='png', width=10, height=10)
+    except (ImportError, ValueError, RuntimeError):
+        pass
+
+
+def _export(job, width, height, scale):
+    # (output, seconds, bytes, error) for one image, written inside the worker
+    start = time.perf_counter()
+    try:
+        if job.kind == 'plotly':
+            image = _plotly_image(job.spec, job.fmt, width, height, scale)
+        elif job.kind == 'vega-lite':
+            image = _vega_lite_image(job.spec, job.fmt, scale)
+        elif job.kind == 'html':
+            image = _page_screenshot(job.spec, job.fmt, width, height)
+        else:
+            raise ValueError(f"unknown figure kind {job.kind!r}")
+        os.makedirs(os.path.dirname(job.output) or '.', exist_ok=True)
+        with open(job.output, 'wb') as f:
+            f.write(image)
+    except Exception as e:
+        # One bad figure (or a missing renderer) shouldn't sink the batch
+        message = str(e).strip().splitlines()[0] if str(e).strip() else ''
+        return job.output, time.perf_counter() - start, None, f"{type(e).__name__}: {message}"
+    return job.output, time.perf_counter() - start, len(image), None
+
+
+def start_pool(workers=EXPORT_WORKERS):
+    # Warm workers; use as a context manager and send it any number of batches
+    return ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context(), initializer=_warm_up)
+
+
+def export_batch(pool, jobs, width=DEFAULT_WIDTH, height=DEFAULT_HEIGHT, scale=1, on_done=None):
+    # Export every job across the pool; returns {output: (seconds, bytes, error)}
+    # and calls on_done(job, seconds, size, error) as each image lands
+    jobs = {job.output: job for job in jobs}
+    results = {}
+    futures = [pool.submit(_export, job, width, height, scale) for job in jobs.values()]
+    for future in as_completed(futures):
+        output, seconds, size, error = future.result()
+        results[output] = (seconds, size, error)
+        if on_done:
+            on_done(jobs[output], seconds, size, error)
+    return results
+
+
+def image_path(name, fmt, image_dir=IMAGE_DIR):
+    return f"{image_dir}/{name}.{fmt}"
+
+
+def page_jobs(names=None, formats=('png',), image_dir=IMAGE_DIR):
+    # Jobs for charts from the page specs of the last `build.py --pages`
+    # (built first if missing or stale), so no figure is recomputed here
+    from build import MANIFEST_PATH, build
+
+    build(names, as_spec=True)
+    with open(MANIFEST_PATH) as f:
+        manifest = json.load(f)
+
+    jobs = []
+    for key, recorded in sorted(manifest.items()):
+        name = key[:-len('#spec')] if key.endswith('#spec') else None
+        if name is None or (names and name not in names):
+            continue
+        kind = recorded['kind']
+        if kind == 'html':
+            spec = recorded['output']
+        else:
+            with open(recorded['output'], encoding='utf-8') as f:
+                spec = f.read()
+        for fmt in formats:
+            if kind == 'html' and fmt != 'png':
+                continue
+            jobs.append(ExportJob(name, kind, spec, fmt, image_path(name, fmt, image_dir)))
+    return jobs
+
+
+def print_export_timings(results, wall_time):
+    # Per-image time and size, slowest first
+    width = max(len(output) for output in results)
+    for output, (seconds, size, error) in sorted(results.items(), key=lambda item: item[1][0], reverse=True):
+        detail = f"{size / 1024:9.1f} KB" if error is None else f"failed: {error}"
+        print(f"{output:{width}}  {seconds:7.2f}s  {detail}")
+    total = sum(seconds for seconds, _, _ in results.values())
+    failed = sum(error is not None for _, _, error in results.values())
+    print(f"{'sum of images':{width}}  {total:7.2f}s")
+    print(f"{'wall time':{width}}  {wall_time:7.2f}s  ({len(results) - failed} written, {failed} failed)")
+
+
+def export_charts(names=None, formats=('png',), workers=EXPORT_WORKERS, width=DEFAULT_WIDTH, height=DEFAULT_HEIGHT,
+                  scale=1, image_dir=IMAGE_DIR):
+    jobs = page_jobs(names, formats, image_dir)
+    if not jobs:
+        print("no charts to export")
+        return {}
+    start = time.perf_counter()
+    with start_pool(min(workers, len(jobs))) as pool:
+        results = export_batch(pool, jobs, width, height, scale)
+    print_export_timings(results, time.perf_counter() - start)
+    return results
+
+
+def add_arguments(parser):
+    parser.add_argument('charts', nargs='*', help="chart names to export (default: all)")
+    parser.add_argument('--format', nargs='+', default=['png'], choices=FORMATS, dest='formats',
+                        help="image formats to write")
+    parser.add_argument('-j', '--jobs', type=int, default=EXPORT_WORKERS, help="warm renderer processes")
+    parser.add_argument('--width', type=int, default=DEFAULT_WIDTH, help="image width in px (plotly, pages)")
+    parser.add_argument('--height', type=int, default=DEFAULT_HEIGHT, help="image height in px (plotly, pages)")
+    parser.add_argument('--scale', type=float, default=1, help="pixel ratio, e.g. 2 for retina images")
+    parser.add_argument('-o', '--output-dir', default=IMAGE_DIR, help=f"where images go (default {IMAGE_DIR})")
+
+
+def main(args):
+    export_charts(args.charts or None, args.formats, args.jobs, args.width, args.height, args.scale, args.output_dir)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export charts as PNG/SVG through a pool of warm renderers")
+    add_arguments(parser)
+    main(parser.parse_args())
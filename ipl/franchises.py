@@ -0,0 +1,72 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Franchise dimension: one row per franchise with every name and
+# abbreviation the sources use for it. Loaders turn team columns into
+# categoricals over TEAM_DTYPE at ingest, so a team is stored and grouped
+# as its small-int franchise id (the category code) and the name is only
+# looked up when a chart or API response is rendered.
+#
+# Seasons are IPL years. Deccan Chargers are folded into Sunrisers
+# Hyderabad, as the charts have always done.
+Franchise = namedtuple('Franchise', ['id', 'name', 'former_names', 'abbreviations', 'first_season', 'last_season'])
+
+FRANCHISES = [
+    Franchise(0, 'Chennai Super Kings', [], ['CSK', 'Super Kings'], 2008, 2024),
+    Franchise(1, 'Delhi Capitals', ['Delhi Daredevils'], ['DC', 'DD', 'Capitals', 'Daredevils'], 2008, 2024),
+    Franchise(2, 'Gujarat Lions', [], ['GL', 'Guj Lions'], 2016, 2017),
+    Franchise(3, 'Gujarat Titans', [], ['GT', 'Titans'], 2022, 2024),
+    Franchise(4, 'Kochi Tuskers Kerala', [], ['KTK', 'Kochi'], 2011, 2011),
+    Franchise(5, 'Kolkata Knight Riders', [], ['KKR'], 2008, 2024),
+    Franchise(6, 'Lucknow Super Giants', [], ['LSG', 'Super Giants'], 2022, 2024),
+    Franchise(7, 'Mumbai Indians', [], ['MI', 'Mumbai'], 2008, 2024),
+    Franchise(8, 'Pune Warriors', ['Pune Warriors India'], ['PWI', 'Warriors'], 2011, 2013),
+    Franchise(9, 'Punjab Kings', ['Kings XI Punjab'], ['PBKS', 'KXIP', 'Kings XI'], 2008, 2024),
+    Franchise(10, 'Rajasthan Royals', [], ['RR', 'Royals'], 2008, 2024),
+    Franchise(11, 'Rising Pune Supergiants', ['Rising Pune Supergiant'], ['RPS', 'Supergiants', 'Supergiant'],
+              2016, 2017),
+    Franchise(12, 'Royal Challengers Bangalore', ['Royal Challengers Bengaluru'], ['RCB'], 2008, 2024),
+    Franchise(13, 'Sunrisers Hyderabad', ['Deccan Chargers'], ['SRH', 'DCH', 'Sunrisers', 'Chargers'], 2008, 2024),
+]
+
+# Category order is id order, so a team column's codes are franchise ids
+TEAM_DTYPE = pd.CategoricalDtype([franchise.name for franchise in FRANCHISES])
+
+# Every name or abbreviation -> franchise id
+ALIASES = {alias: franchise.id for franchise in FRANCHISES
+           for alias in (franchise.name, *franchise.former_names, *franchise.abbreviations)}
+
+
+def franchise_table():
+    return pd.DataFrame({
+        'id': [franchise.id for franchise in FRANCHISES],
+        'name': [franchise.name for franchise in FRANCHISES],
+        'former_names': ['; '.join(franchise.former_names) for franchise in FRANCHISES],
+        'abbreviations': ['; '.join(franchise.abbreviations) for franchise in FRANCHISES],
+        'first_season': [franchise.first_season for franchise in FRANCHISES],
+        'last_season': [franchise.last_season for franchise in FRANCHISES],
+    })
+
+
+def alias_table():
+    # (alias, franchise id) rows, for joins outside pandas (archive_db)
+    return pd.DataFrame(list(ALIASES.items()), columns=['alias', 'franchise_id'])
+
+
+def team_codes(values):
+    # Any team name or abbreviation -> categorical over TEAM_DTYPE.
+    # Categorical input is mapped per category, not per row.
+    values = pd.Series(values)
+    codes = values.map(ALIASES).astype('float64')
+    unknown = sorted(set(values[codes.isna() & values.notna()]))
+    if unknown:
+        raise ValueError(f"unknown team name(s), add them to franchises.FRANCHISES: {', '.join(unknown)}")
+    codes = codes.fillna(-1).to_numpy(dtype=np.int8)
+    return pd.Series(pd.Categorical.from_codes(codes, dtype=TEAM_DTYPE), index=values.index, name=values.name)
+
+
+def team_names(codes):
+    # Franchise ids -> names, at render time; missing codes stay missing
+    return pd.Series(codes).map(dict(enumerate(TEAM_DTYPE.categories)))
@@ -0,0 +1,408 @@
+import argparse
+import csv
+import importlib
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+
+import pandas as pd
+
+import cube
+from aggregates import AGGREGATES, write_aggregates
+from chart_registry import CHARTS, render
+from cube import BATTING_MEASURES, BOWLING_MEASURES, CUBE_KEYS, PHASE_BINS, PHASES
+from data_loader import DATA_DIR, SOURCES, forget, load_deliveries, load_matches
+from franchises import ALIASES, TEAM_DTYPE
+from profiling import stage
+
+# Live-season ingestion. New deliveries arrive as an append-only stream of
+# deliveries.csv rows, from a watched feed file or a local socket (whose
+# lines are journaled to the feed file, so a restart replays them). Each
+# ball adds to two cells, the batter's and the bowler's, keyed by match,
+# so updating the aggregates costs O(new balls) however long the season
+# is; the cells are added into every rollup of the player-season-team
+# cube (cube.py) that match_del.py, Matches.py and aggregates.py read,
+# without copying the cube. When an over finishes, the charts and
+# aggregate tables it changes are flagged in LIVE_FLAGS_PATH and
+# re-rendered.
+#
+# Season, venue and winner of a live match come from matches.csv, reread
+# whenever it changes: balls of a match it has no row for yet are kept and
+# show up once the row is added, and a result flips the match's cells to
+# `won` without touching its balls again. Matches already in
+# deliveries.csv are skipped, so the feed can start over once its balls
+# are merged into the next download.
+LIVE_FEED = f"{DATA_DIR}/live_deliveries.csv"
+
+LIVE_FLAGS_PATH = "static/live_flags.json"
+
+# Local socket for `--socket`, e.g. `nc localhost 5055 < over.csv`
+LIVE_HOST = "127.0.0.1"
+LIVE_PORT = 5055
+
+# Columns of a feed line, in deliveries.csv order
+DELIVERY_COLUMNS = ['match_id', 'inning', 'batting_team', 'bowling_team', 'over', 'ball', 'batter', 'bowler',
+                    'non_striker', 'batsman_runs', 'extra_runs', 'total_runs', 'extras_type', 'is_wicket',
+                    'player_dismissed', 'dismissal_kind', 'fielder']
+INT_COLUMNS = {'match_id', 'inning', 'over', 'ball', 'batsman_runs', 'extra_runs', 'total_runs', 'is_wicket'}
+
+# Deliveries that don't count towards the six of an over
+ILLEGAL_EXTRAS = {'wides', 'noballs'}
+
+# How often the feed file and matches.csv are checked, and how long an
+# unfinished over may wait (innings ending mid-over, a stalled feed)
+# before it's flushed anyway
+POLL_INTERVAL = 0.5
+FLUSH_AFTER = 5
+
+# Live charts by what changes them: new balls (cube rollups) or new and
+# decided matches (matches.csv rows, which also bring in held-back balls)
+BALL_CHARTS = ['batsman_bubble_chart', 'bowler_bubble_chart', 'top_batsmen_performance', 'best_bowler_economy',
+               'stadiums_map']
+RESULT_CHARTS = BALL_CHARTS + ['team_wins_race_chart', 'win_ratio_by_season', 'legacy_dashboard',
+                               'toss_to_match_conversion']
+BALL_AGGREGATES = ['venue_stats', 'bowler_economy']
+RESULT_AGGREGATES = list(AGGREGATES)
+
+# Scripts the live charts are registered in
+LIVE_MODULES = ['match_del', 'Matches']
+
+MEASURES = BATTING_MEASURES + BOWLING_MEASURES
+
+# Feed markers: everything already in the feed has been queued, or the
+# feed file was truncated and is being read again from the start
+CAUGHT_UP = 'caught up'
+RESET = 'reset'
+
+# (match_id, player, franchise id, phase) -> [measure, ...] in MEASURES order
+_cells = {}
+
+_state = {
+    'base_matches': frozenset(),  # match ids deliveries.csv already has
+    'matches_mtime': None,
+    'over': None,  # (match_id, inning, over) being bowled
+    'legal_balls': 0,
+    'unflushed': 0,  # balls since the last flush
+    'last_ball': 0.0,
+    'balls': 0,
+    'skipped': 0,
+    'update_seconds': 0.0,  # spent adding unflushed balls to cells
+}
+
+
+def parse_ball(line):
+    # One feed line -> dict of DELIVERY_COLUMNS, None for headers and blanks
+    if not line.strip():
+        return None
+    row = next(csv.reader([line]))
+    if row == DELIVERY_COLUMNS:
+        return None
+    if len(row) != len(DELIVERY_COLUMNS):
+        raise ValueError(f"expected {len(DELIVERY_COLUMNS)} columns, got {len(row)}")
+    ball = dict(zip(DELIVERY_COLUMNS, row))
+    for column in INT_COLUMNS:
+        ball[column] = int(ball[column])
+    for column in ('batting_team', 'bowling_team'):
+        if ball[column] not in ALIASES:
+            raise ValueError(f"unknown team name, add it to franchises.FRANCHISES: {ball[column]}")
+    return ball
+
+
+def phase_of(over):
+    # Same bins as the cube's pd.cut
+    return next(phase for phase, upper in zip(PHASES, PHASE_BINS[1:]) if over <= upper)
+
+
+def _cell(match_id, player, team, phase):
+    key = (match_id, player, ALIASES[team], phase)
+    if key not in _cells:
+        _cells[key] = [0] * len(MEASURES)
+    return _cells[key]
+
+
+def add_ball(ball):
+    # Add one delivery to its batter's and bowler's cells (see cube.build_cube)
+    runs, total = ball['batsman_runs'], ball['total_runs']
+    phase = phase_of(ball['over'])
+
+    batting = _cell(ball['match_id'], ball['batter'], ball['batting_team'], phase)
+    batting[0] += runs
+    batting[1] += 1
+    batting[2] += runs == 0
+    batting[3] += runs == 4
+    batting[4] += runs == 6
+    batting[5] += ball['player_dismissed'] == ball['batter']
+
+    bowling = _cell(ball['match_id'], ball['bowler'], ball['bowling_team'], phase)
+    bowling[6] += 1
+    bowling[7] += total
+    bowling[8] += total == 0
+    bowling[9] += ball['is_wicket']
+
+
+def live_cells():
+    # The cells as cube rows, for the matches matches.csv has a row for
+    if not _cells:
+        return None
+    keys = pd.DataFrame(list(_cells), columns=['match_id', 'player', 'team', 'phase'])
+    cells = pd.concat([keys, pd.DataFrame(list(_cells.values()), columns=MEASURES, dtype='int32')], axis=1)
+
+    by_match = load_matches().set_index('id')
+    cells = cells[cells['match_id'].isin(by_match.index)]
+    match_id = cells['match_id']
+    cells = cells.assign(
+        season=match_id.map(by_match['season']),
+        venue=match_id.map(by_match['venue']),
+        won=cells['team'] == match_id.map(by_match['winner'].cat.codes),
+        team=pd.Categorical.from_codes(cells['team'], dtype=TEAM_DTYPE),
+        phase=pd.Categorical(cells['phase'], categories=PHASES, ordered=True),
+    )
+    return cells.groupby(CUBE_KEYS, observed=True)[MEASURES].sum().reset_index()
+
+
+def _matches_changed():
+    # matches.csv rewritten since it was last read; the next load rereads it
+    mtime = os.stat(SOURCES['matches']).st_mtime_ns
+    if mtime == _state['matches_mtime']:
+        return False
+    _state['matches_mtime'] = mtime
+    forget('matches')
+    return True
+
+
+def load_flags():
+    if not os.path.exists(LIVE_FLAGS_PATH):
+        return {'version': 0, 'charts': {}, 'aggregates': {}}
+    with open(LIVE_FLAGS_PATH) as f:
+        return json.load(f)
+
+
+def save_flags(flags):
+    # Replaced in one rename, so readers never see half a file
+    os.makedirs(os.path.dirname(LIVE_FLAGS_PATH), exist_ok=True)
+    tmp_path = f"{LIVE_FLAGS_PATH}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(flags, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, LIVE_FLAGS_PATH)
+
+
+def flag(charts, aggregates, reason):
+    # Mark charts and aggregate tables for re-render; each flag carries the
+    # flush version, so readers can tell a new change from one they've seen
+    flags = load_flags()
+    flags['version'] += 1
+    flags['updated'] = time.time()
+    for kind, names in (('charts', charts), ('aggregates', aggregates)):
+        for name in names:
+            flags[kind][name] = {'version': flags['version'], 'reason': reason,
+                                                'flagged': flags['updated'], 'rendered': None}
+    save_flags(flags)
+    return flags
+
+
+def render_flagged(flags, as_spec=False):
+    # Re-render everything flagged and not rendered since, in this process
+    # (it holds the live cells); returns (name, seconds) per output
+    timings = []
+    for name, entry in sorted(flags['aggregates'].items()):
+        if entry['rendered'] is None:
+            start = time.perf_counter()
+            with stage('live: aggregate', chart=name):
+                entry['output'] = write_aggregates([name])[0]
+            entry['rendered'] = time.time()
+            timings.append((name, time.perf_counter() - start))
+    for name, entry in sorted(flags['charts'].items()):
+        if entry['rendered'] is None:
+            start = time.perf_counter()
+            entry['output'] = render(CHARTS[name], as_spec=as_spec)
+            entry['rendered'] = time.time()
+            timings.append((name, time.perf_counter() - start))
+            # Saved per chart, so the dashboard can pick each one up as it lands
+            save_flags(flags)
+    return timings
+
+
+def flush(reason, results=False, render_charts=True, as_spec=False):
+    # Publish the cells to rollups, flag what they change and re-render it
+    start = time.perf_counter()
+    with stage('live: cells'):
+        cube.set_live_cells(live_cells())
+    cells_seconds = time.perf_counter() - start
+
+    charts = RESULT_CHARTS if results else BALL_CHARTS
+    flags = flag(charts, RESULT_AGGREGATES if results else BALL_AGGREGATES, reason)
+    balls, update = _state['unflushed'], _state['update_seconds']
+    _state['unflushed'], _state['update_seconds'] = 0, 0.0
+    timings = render_flagged(flags, as_spec) if render_charts else []
+
+    per_ball = f"{update / balls * 1e6:.0f}us/ball" if balls else "no new balls"
+    rendered = f", {len(timings)} re-rendered in {sum(seconds for _, seconds in timings):.2f}s" if timings else ""
+    print(f"{reason}: {balls} balls ({per_ball}), cells published in {cells_seconds * 1000:.1f}ms, "
+          f"{len(charts)} charts flagged{rendered} [{time.perf_counter() - start:.2f}s]", flush=True)
+
+
+def ingest(line):
+    # Add one feed line; returns the (match_id, inning, over) it finished, if any
+    ball = parse_ball(line)
+    if ball is None:
+        return None
+    if ball['match_id'] in _state['base_matches']:
+        _state['skipped'] += 1
+        return None
+
+    start = time.perf_counter()
+    finished = None
+    over = (ball['match_id'], ball['inning'], ball['over'])
+    if over != _state['over']:
+        # A new over started before the last one reached six legal balls
+        finished = _state['over'] if _state['unflushed'] else None
+        _state['over'], _state['legal_balls'] = over, 0
+    add_ball(ball)
+    if ball['extras_type'] not in ILLEGAL_EXTRAS:
+        _state['legal_balls'] += 1
+    _state['balls'] += 1
+    _state['unflushed'] += 1
+    _state['last_ball'] = time.monotonic()
+    _state['update_seconds'] += time.perf_counter() - start
+    if finished is None and _state['legal_balls'] == 6:
+        finished = over
+    return finished
+
+
+def over_label(over):
+    match_id, inning, number = over
+    return f"match {match_id} innings {inning} over {number + 1}"
+
+
+def follow_file(path, lines, stop):
+    # Queue every line of the feed file, then CAUGHT_UP, then lines as
+    # they're appended; a half-written last line waits for its newline
+    offset, partial, caught_up = 0, b'', False
+    while not stop.is_set():
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size < offset:
+            offset, partial = 0, b''
+            lines.put(RESET)
+        if size > offset:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                data = partial + f.read(size - offset)
+            offset = size
+            *complete, partial = data.split(b'\n')
+            for line in complete:
+                lines.put(line.decode('utf-8'))
+        if not caught_up:
+            lines.put(CAUGHT_UP)
+            caught_up = True
+        stop.wait(POLL_INTERVAL)
+
+
+def serve_socket(feed, lines, host=LIVE_HOST, port=LIVE_PORT):
+    # Queue what's in the feed (the journal), then serve the socket: each
+    # connection sends feed lines, answered with 'error: ...' for bad ones.
+    # Good lines are journaled before they're queued.
+    if os.path.exists(feed):
+        with open(feed, encoding='utf-8') as f:
+            for line in f:
+                lines.put(line.rstrip('\n'))
+    lines.put(CAUGHT_UP)
+    journal_lock = threading.Lock()
+
+    class FeedHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw in self.rfile:
+                line = raw.decode('utf-8').rstrip('\r\n')
+                try:
+                    if parse_ball(line) is None:
+                        continue
+                except ValueError as e:
+                    self.wfile.write(f"error: {e}\n".encode())
+                    continue
+                with journal_lock:
+                    with open(feed, 'a', encoding='utf-8') as f:
+                        f.write(line + '\n')
+                    lines.put(line)
+
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    server = socketserver.ThreadingTCPServer((host, port), FeedHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(feed=LIVE_FEED, port=None, render_charts=True, as_spec=False):
+    # Replay the feed, then ingest new balls until interrupted
+    for module_name in LIVE_MODULES:
+        importlib.import_module(module_name)
+    _state['base_matches'] = frozenset(load_deliveries()['match_id'].unique().tolist())
+    cube.load_cube()
+    _matches_changed()
+
+    lines, stop, server = queue.Queue(), threading.Event(), None
+    if port is None:
+        threading.Thread(target=follow_file, args=(feed, lines, stop), daemon=True).start()
+        print(f"watching {feed}", flush=True)
+    else:
+        server = serve_socket(feed, lines, port=port)
+        print(f"listening on {LIVE_HOST}:{port}, journaling to {feed}", flush=True)
+
+    caught_up = False
+    try:
+        while True:
+            try:
+                item = lines.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                item = None
+
+            if item == CAUGHT_UP:
+                caught_up = True
+                flush(f"replayed {_state['balls']} balls ({_state['skipped']} already in deliveries.csv)",
+                      results=True, render_charts=render_charts, as_spec=as_spec)
+            elif item == RESET:
+                print(f"{feed} was truncated, reading it again", flush=True)
+                _cells.clear()
+                _state.update(over=None, legal_balls=0, unflushed=0, balls=0, skipped=0)
+            elif item is not None:
+                try:
+                    finished = ingest(item)
+                except ValueError as e:
+                    print(f"skipped bad line ({e}): {item!r}", flush=True)
+                    continue
+                if finished and caught_up:
+                    flush(over_label(finished), render_charts=render_charts, as_spec=as_spec)
+
+            if not caught_up:
+                continue
+            if _matches_changed():
+                flush("matches.csv changed", results=True, render_charts=render_charts, as_spec=as_spec)
+            elif _state['unflushed'] and lines.empty() and time.monotonic() - _state['last_ball'] > FLUSH_AFTER:
+                flush(f"{over_label(_state['over'])} (so far)", render_charts=render_charts, as_spec=as_spec)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        if server is not None:
+            server.shutdown()
+
+
+def add_arguments(parser):
+    parser.add_argument('--feed', default=LIVE_FEED, help=f"append-only deliveries feed (default {LIVE_FEED})")
+    parser.add_argument('--socket', nargs='?', type=int, const=LIVE_PORT, metavar='PORT',
+                        help=f"take lines on a local socket (default port {LIVE_PORT}) instead of watching the "
+                             "feed, journaling them to it")
+    parser.add_argument('--no-render', action='store_true',
+                        help=f"only flag changed charts in {LIVE_FLAGS_PATH}, don't re-render them")
+    parser.add_argument('--pages', action='store_true', help="re-render page specs instead of HTML files")
+
+
+def main(args):
+    run(args.feed, args.socket, render_charts=not args.no_render, as_spec=args.pages)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ingest live deliveries and keep the charts up to date")
+    add_arguments(parser)
+    main(parser.parse_args())
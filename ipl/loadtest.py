@@ -0,0 +1,411 @@
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlencode, urlsplit
+
+from app import AGGREGATE_DIR, PLOT_DIR
+
+# Load test for a dashboard server in any of its modes (`cli.py serve`,
+# `--async` or `--asgi`), either one you started (--url, --pid) or one it
+# starts itself (--serve). Two kinds of run:
+#   endpoints  each endpoint gets `requests` GETs from N clients, each
+#              client on its own keep-alive connection
+#   sessions   N virtual users replay dashboard visits for `duration`
+#              seconds each. A visit is the index page, then 4-6 of its plot
+#              iframes fetched in parallel over the user's own connections
+#              (as a browser would), then 1-3 aggregate API calls.
+# Either kind can sweep several concurrency levels. Each level reports
+# throughput, latency percentiles, the error rate, and the server's CPU
+# and RSS, summed over its worker processes and sampled from /proc (so
+# Linux only; elsewhere those columns are blank).
+DEFAULT_URL = "http://127.0.0.1:5000"
+
+PERCENTILES = [50, 90, 99]
+
+# Browsers ask for compressed plots, so precompressed copies get served
+DEFAULT_HEADERS = {'Accept-Encoding': 'br, gzip'}
+
+# Seconds before a request counts as failed
+TIMEOUT = 30
+
+# A visit: plots opened and data calls made, and the connections a browser
+# opens to one host
+SESSION_PLOTS = (4, 6)
+SESSION_API_CALLS = (1, 3)
+BROWSER_CONNECTIONS = 6
+
+# Seconds between server CPU/RSS samples
+SAMPLE_INTERVAL = 0.5
+
+# Request kinds in the session report, in page order
+SESSION_KINDS = ['index', 'plot', 'api', 'session']
+
+IFRAME_SRC = re.compile(r'<iframe[^>]*\ssrc="(/plots/[^"]+)"')
+
+
+def default_paths():
+    paths = ['/']
+    if os.path.isdir(PLOT_DIR):
+        plots = sorted(f for f in os.listdir(PLOT_DIR) if f.endswith('.html'))
+        paths += [f"/plots/{quote(plot)}" for plot in plots[:1]]
+    for name in aggregate_names():
+        paths += [f"/api/{name}", f"/api/{name}?format=arrow"]
+    return paths
+
+
+def aggregate_names():
+    if not os.path.isdir(AGGREGATE_DIR):
+        return []
+    return sorted(f[:-len('.feather')] for f in os.listdir(AGGREGATE_DIR) if f.endswith('.feather'))
+
+
+def api_calls():
+    # Data calls a dashboard makes: each aggregate whole, and filtered on
+    # every team and season it has, as JSON and as Arrow
+    import pyarrow.feather as feather
+
+    calls = []
+    for name in aggregate_names():
+        table = feather.read_table(f"{AGGREGATE_DIR}/{name}.feather", memory_map=True)
+        calls += [f"/api/{name}", f"/api/{name}?format=arrow"]
+        for column in ('team', 'season'):
+            if column in table.column_names:
+                for value in sorted(set(table[column].to_pylist()) - {None}):
+                    calls.append(f"/api/{name}?{urlencode({column: value})}")
+    return calls
+
+
+def percentile(values, p):
+    # Nearest-rank percentile of sorted values
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def _connect(url):
+    parts = urlsplit(url)
+    return http.client.HTTPConnection(parts.hostname, parts.port, timeout=TIMEOUT)
+
+
+def fetch(conn, path, headers=DEFAULT_HEADERS):
+    # (seconds, body or None on failure, connection to use next)
+    start = time.perf_counter()
+    try:
+        conn.request('GET', path, headers=headers)
+        response = conn.getresponse()
+        body = response.read()
+        if response.status >= 400:
+            body = None
+    except (OSError, http.client.HTTPException):
+        body = None
+        conn.close()
+        conn = _connect(f"http://{conn.host}:{conn.port}")
+    return time.perf_counter() - start, body, conn
+
+
+def _client(url, path, count, headers, latencies, errors):
+    conn = _connect(url)
+    for _ in range(count):
+        seconds, body, conn = fetch(conn, path, headers)
+        if body is None:
+            errors.append(path)
+        else:
+            latencies.append(seconds)
+    conn.close()
+
+
+def latency_summary(latencies):
+    latencies = sorted(latencies)
+    summary = {f"p{p}": percentile(latencies, p) if latencies else None for p in PERCENTILES}
+    summary['max'] = latencies[-1] if latencies else None
+    return summary
+
+
+def run_endpoint(url, path, requests, concurrency, headers=DEFAULT_HEADERS):
+    # {'path', 'requests', 'errors', 'rps', 'p50', ...} for one endpoint
+    latencies, errors = [], []
+    counts = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    clients = [threading.Thread(target=_client, args=(url, path, count, headers, latencies, errors))
+               for count in counts if count]
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    wall = time.perf_counter() - start
+
+    result = {'path': path, 'requests': requests, 'errors': len(errors), 'rps': len(latencies) / wall}
+    result.update(latency_summary(latencies))
+    return result
+
+
+def _server_processes(pid):
+    # The server and every process under it (uvicorn and gunicorn workers)
+    parents = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    parents[int(entry)] = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+    tree, frontier = {pid}, [pid]
+    while frontier:
+        parent = frontier.pop()
+        children = [child for child, ppid in parents.items() if ppid == parent and child not in tree]
+        tree.update(children)
+        frontier += children
+    return tree
+
+
+def server_usage(pid):
+    # (CPU seconds, RSS bytes) summed over the server's processes, or None
+    # where /proc isn't available. Memory-mapped pages shared by workers are
+    # counted once per worker, so RSS overstates multi-worker servers.
+    if pid is None or not os.path.isdir('/proc'):
+        return None
+    cpu, rss = 0.0, 0
+    for process in _server_processes(pid):
+        try:
+            with open(f"/proc/{process}/stat") as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            with open(f"/proc/{process}/statm") as f:
+                resident_pages = int(f.read().split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        cpu += (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+        rss += resident_pages * os.sysconf('SC_PAGE_SIZE')
+    return cpu, rss
+
+
+def _sample_server(pid, samples, stop):
+    while not stop.is_set():
+        usage = server_usage(pid)
+        if usage is not None:
+            samples.append(usage)
+        stop.wait(SAMPLE_INTERVAL)
+
+
+def measure_server(pid, run):
+    # Run `run()` while sampling the server; returns (run's result, {'cpu_percent', 'rss_peak', 'rss_end'})
+    samples, stop = [], threading.Event()
+    before = server_usage(pid)
+    sampler = threading.Thread(target=_sample_server, args=(pid, samples, stop), daemon=True)
+    start = time.perf_counter()
+    sampler.start()
+    try:
+        result = run()
+    finally:
+        stop.set()
+        sampler.join()
+    wall = time.perf_counter() - start
+    after = server_usage(pid)
+    if before is None or after is None:
+        return result, {'cpu_percent': None, 'rss_peak': None, 'rss_end': None}
+    samples.append(after)
+    return result, {'cpu_percent': (after[0] - before[0]) / wall * 100,
+                    'rss_peak': max(rss for _, rss in samples), 'rss_end': after[1]}
+
+
+def _visit(url, rng, plots, calls, browser, record):
+    # One dashboard visit: index, its plots in parallel, then data calls
+    local = browser['local']
+
+    def get(kind, path):
+        if not hasattr(local, 'conn'):
+            local.conn = _connect(url)
+        seconds, body, local.conn = fetch(local.conn, path)
+        record(kind, seconds, body is not None)
+        return body
+
+    start = time.perf_counter()
+    index = get('index', '/')
+    shown = IFRAME_SRC.findall(index.decode('utf-8', 'replace')) if index else []
+    shown = shown or plots
+    opened = rng.sample(shown, min(len(shown), rng.randint(*SESSION_PLOTS)))
+    list(browser['pool'].map(lambda path: get('plot', path), opened))
+    for path in rng.sample(calls, min(len(calls), rng.randint(*SESSION_API_CALLS))):
+        get('api', path)
+    record('session', time.perf_counter() - start, True)
+
+
+def _user(url, seed, plots, calls, deadline, record):
+    # A virtual user with its own connections, visiting until the deadline
+    rng = random.Random(seed)
+    with ThreadPoolExecutor(max_workers=BROWSER_CONNECTIONS) as pool:
+        browser = {'pool': pool, 'local': threading.local()}
+        while time.perf_counter() < deadline:
+            _visit(url, rng, plots, calls, browser, record)
+
+
+def session_targets():
+    # (plot paths, API calls) that visits pick from
+    plots = [f"/plots/{quote(plot)}" for plot in sorted(os.listdir(PLOT_DIR)) if plot.endswith('.html')] \
+        if os.path.isdir(PLOT_DIR) else []
+    return plots, api_calls()
+
+
+def warm_up_visit(url, seed=0):
+    # One untimed visit, so the first level doesn't measure cold caches
+    plots, calls = session_targets()
+    with ThreadPoolExecutor(max_workers=BROWSER_CONNECTIONS) as pool:
+        browser = {'pool': pool, 'local': threading.local()}
+        _visit(url, random.Random(seed), plots, calls, browser, lambda kind, seconds, ok: None)
+
+
+def run_sessions(url, users, duration, seed=0):
+    # Sessions summary for `users` concurrent virtual users over `duration` seconds
+    plots, calls = session_targets()
+    records = []
+
+    def record(kind, seconds, ok):
+        records.append((kind, seconds, ok))
+
+    start = time.perf_counter()
+    deadline = start + duration
+    threads = [threading.Thread(target=_user, args=(url, seed * 10007 + user, plots, calls, deadline, record))
+               for user in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    requests = [(kind, seconds, ok) for kind, seconds, ok in records if kind != 'session']
+    errors = sum(not ok for _, _, ok in requests)
+    result = {
+        'users': users,
+        'seconds': wall,
+        'sessions': sum(kind == 'session' for kind, _, _ in records),
+        'requests': len(requests),
+        'errors': errors,
+        'error_rate': errors / len(requests) if requests else 0.0,
+        'rps': (len(requests) - errors) / wall,
+    }
+    result['sessions_per_second'] = result['sessions'] / wall
+    result['latency'] = {kind: latency_summary([seconds for k, seconds, ok in records if k == kind and ok])
+                         for kind in SESSION_KINDS}
+    return result
+
+
+def _ms(value):
+    return f"{value * 1000:8.1f}" if value is not None else f"{'-':>8}"
+
+
+def print_results(results):
+    width = max(len('endpoint'), *(len(result['path']) for result in results))
+    columns = [f"p{p}" for p in PERCENTILES] + ['max']
+    print(f"{'endpoint':{width}}  {'users':>5}  {'req/s':>8}  " + '  '.join(f"{column + ' ms':>8}" for column in columns)
+          + f"  {'errors':>6}  {'CPU %':>6}  {'RSS MB':>7}")
+    for result in results:
+        server = result['server']
+        cpu = f"{server['cpu_percent']:6.0f}" if server['cpu_percent'] is not None else f"{'-':>6}"
+        rss = f"{server['rss_peak'] / 2 ** 20:7.0f}" if server['rss_peak'] is not None else f"{'-':>7}"
+        print(f"{result['path']:{width}}  {result['concurrency']:5}  {result['rps']:8.1f}  "
+              + '  '.join(_ms(result[column]) for column in columns) + f"  {result['errors']:6}  {cpu}  {rss}")
+
+
+def print_session_results(results):
+    # One row per concurrency level; p50 / p99 per request kind
+    kinds = '  '.join(f"{kind + ' p50/p99 ms':>21}" for kind in SESSION_KINDS)
+    print(f"{'users':>5}  {'visits/s':>8}  {'req/s':>8}  {'errors':>7}  {kinds}  {'CPU %':>6}  {'RSS MB':>7}")
+    for result in results:
+        server = result['server']
+        cpu = f"{server['cpu_percent']:6.0f}" if server['cpu_percent'] is not None else f"{'-':>6}"
+        rss = f"{server['rss_peak'] / 2 ** 20:7.0f}" if server['rss_peak'] is not None else f"{'-':>7}"
+        latency = '  '.join(f"{_ms(result['latency'][kind]['p50'])} / {_ms(result['latency'][kind]['p99'])}"
+                            for kind in SESSION_KINDS)
+        print(f"{result['users']:5}  {result['sessions_per_second']:8.1f}  {result['rps']:8.1f}  "
+              f"{result['error_rate'] * 100:6.1f}%  {latency}  {cpu}  {rss}")
+
+
+def load_test(url=DEFAULT_URL, paths=None, requests=500, concurrency=(16,), pid=None):
+    results = []
+    for path in paths or default_paths():
+        # One untimed request first, so cold caches aren't what gets measured
+        run_endpoint(url, path, 1, 1)
+        for level in concurrency:
+            result, server = measure_server(pid, lambda: run_endpoint(url, path, requests, level))
+            results.append(dict(result, concurrency=level, server=server))
+    print(f"{url}: {requests} requests per endpoint")
+    print_results(results)
+    return results
+
+
+def session_sweep(url=DEFAULT_URL, concurrency=(1, 4, 16, 64), duration=10, pid=None, seed=0):
+    warm_up_visit(url, seed)
+    results = []
+    for users in concurrency:
+        result, server = measure_server(pid, lambda: run_sessions(url, users, duration, seed))
+        results.append(dict(result, server=server))
+        print(f"{users} users: {result['sessions']} visits, {result['requests']} requests", file=sys.stderr)
+    print(f"{url}: dashboard visits, {duration}s per concurrency level")
+    print_session_results(results)
+    return results
+
+
+def start_server(mode, port, workers=None):
+    # `cli.py serve` in the given mode, once it answers; returns the process
+    command = [sys.executable, 'cli.py', 'serve', '--port', str(port)]
+    if mode == 'async':
+        command.append('--async')
+    elif mode == 'asgi':
+        command += ['--asgi'] + (['--workers', str(workers)] if workers else [])
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"`{' '.join(command)}` exited with {server.returncode}")
+        _, body, conn = fetch(_connect(url), '/')
+        conn.close()
+        if body is not None:
+            return server, url
+        time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError(f"`{' '.join(command)}` didn't answer within 60s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test the dashboard server: per-endpoint runs or replayed "
+                                                 "dashboard visits, across concurrency levels")
+    parser.add_argument('--url', default=DEFAULT_URL, help=f"server to test (default {DEFAULT_URL})")
+    parser.add_argument('--pid', type=int, help="server process to sample CPU/RSS from (with --url)")
+    parser.add_argument('--serve', choices=['flask', 'async', 'asgi'],
+                        help="start `cli.py serve` in this mode on --port and test it")
+    parser.add_argument('--port', type=int, default=5099, help="port for --serve")
+    parser.add_argument('--workers', type=int, help="worker processes for --serve asgi")
+    parser.add_argument('--sessions', action='store_true', help="replay dashboard visits instead of per-endpoint runs")
+    parser.add_argument('-c', '--concurrency', type=int, nargs='+',
+                        help="concurrency levels (default: 16 for endpoints, 1 4 16 64 users for sessions)")
+    parser.add_argument('-d', '--duration', type=float, default=10, help="seconds per level for --sessions")
+    parser.add_argument('-n', '--requests', type=int, default=500, help="requests per endpoint and level")
+    parser.add_argument('--path', action='append', dest='paths',
+                        help="endpoint to test, repeatable (default: index, first plot, every aggregate)")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the visits' plot and data-call choices")
+    parser.add_argument('-o', '--output', help="also write the results as JSON, to compare serving modes")
+    args = parser.parse_args()
+
+    server, url, pid = None, args.url, args.pid
+    if args.serve:
+        server, url = start_server(args.serve, args.port, args.workers)
+        pid = server.pid
+    try:
+        if args.sessions:
+            results = session_sweep(url, args.concurrency or (1, 4, 16, 64), args.duration, pid, args.seed)
+        else:
+            results = load_test(url, args.paths, args.requests, args.concurrency or (16,), pid)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'url': url, 'mode': args.serve, 'results': results}, f, indent=2)
@@ -1,222 +1,234 @@
 import os
+import json
 import pandas as pd
-import altair as alt
-import plotly.express as px
-import networkx as nx
-from pyvis.network import Network
+from data_loader import load_matches, load_deliveries
+from chart_data import thin_points
+from chart_registry import chart, render_module
+from match_derivations import match_outcomes
+from cube import rollup
+from partnerships import DEFAULT_THRESHOLD, add_graph, global_layout, partnership_edges, partnership_graph
 
 # Ensure plots are saved to the 'static/plots' directory
 PLOT_DIR = "static/plots"
 if not os.path.exists(PLOT_DIR):
     os.makedirs(PLOT_DIR)
 
-# Load matches data
-# matches = pd.read_csv('D:\DataViz\project\Data_Viz\datasets\matches.csv')
-matches = pd.read_csv('../datasets/matches.csv')
-
-# Clean and convert season to integer
-# matches['season'] = matches['season'].str.extract('(\d+)')
-matches['season'] = matches['season'].str.extract(r'(\d+)')
-
-matches['season'] = matches['season'].astype(int)
-
-# Prepare wins per team per season
-team_wins = matches.groupby(['season', 'winner']).size().reset_index(name='wins')
-team_wins = team_wins.dropna(subset=['winner'])
-
-# Create slider
-season_slider = alt.binding_range(min=team_wins['season'].min(), max=team_wins['season'].max(), step=1)
-season_select = alt.param('Season', bind=season_slider, value=team_wins['season'].min())
-
-# Race bar chart
-race_chart = alt.Chart(team_wins).transform_filter(
-    alt.datum.season == season_select
-).mark_bar().encode(
-    x=alt.X('wins:Q', title='Number of Wins'),
-    y=alt.Y('winner:N', sort='-x', title='Teams'),
-    color='winner:N',
-    tooltip=['winner:N', 'wins:Q']
-).add_params(
-    season_select
-).properties(
-    title='🏆 IPL Team Wins Over Seasons (Race Chart)',
-    width=1000,
-    height=700
-)
-
-# Save the race chart as HTML
-race_chart.save(f"{PLOT_DIR}/race_chart.html")
-
-# Load deliveries data
-# deliveries = pd.read_csv('D:\DataViz\project\Data_Viz\datasets\deliveries.csv')
-deliveries = pd.read_csv('../datasets/deliveries.csv')
-
-# Prepare partnership data
-partnerships = deliveries.groupby(['batter', 'non_striker'])['batsman_runs'].sum().reset_index()
-
-# Filter: Only strong partnerships (> 400 runs together)
-strong_partnerships = partnerships[partnerships['batsman_runs'] > 400]
-
-# Build Graph
-G = nx.Graph()
-
-for index, row in strong_partnerships.iterrows():
-    # G.add_edge(row['batter'], row['non_striker'])
-    G.add_edge(row['batter'], row['non_striker'], weight=row['batsman_runs']*0.01)
-
-# Create PyVis Network
-# net = Network(height="700px", width="100%", bgcolor="transparent", font_color="white")
-net = Network(height="500px", width="100%", bgcolor="#1A1A1A", font_color="white")
-
-import json
-# Set node background color to transparent or the desired color
-options = {
-    "nodes": {
-        "color": {
-            "background": "#1A1A1A",
+# Players a bubble chart ships in full before overlapping bubbles are thinned
+BUBBLE_POINTS = 1000
+
+
+@chart(f"{PLOT_DIR}/race_chart.html", inputs=['matches'])
+def team_wins_race_chart():
+    import altair as alt
+
+    # Load matches data (season already converted to integer by the loader)
+    matches = load_matches()
+
+    # Prepare wins per team per season
+    team_wins = matches.groupby(['season', 'winner'], observed=True).size().reset_index(name='wins')
+    team_wins = team_wins.dropna(subset=['winner'])
+
+    # Create slider
+    season_slider = alt.binding_range(min=team_wins['season'].min(), max=team_wins['season'].max(), step=1)
+    season_select = alt.param('Season', bind=season_slider, value=team_wins['season'].min())
+
+    # Race bar chart
+    return alt.Chart(team_wins).transform_filter(
+        alt.datum.season == season_select
+    ).mark_bar().encode(
+        x=alt.X('wins:Q', title='Number of Wins'),
+        y=alt.Y('winner:N', sort='-x', title='Teams'),
+        color='winner:N',
+        tooltip=['winner:N', 'wins:Q']
+    ).add_params(
+        season_select
+    ).properties(
+        title='🏆 IPL Team Wins Over Seasons (Race Chart)',
+        width=1000,
+        height=700
+    )
+
+
+@chart(f"{PLOT_DIR}/batsman_partnerships.html", inputs=['matches', 'deliveries'])
+def batsman_partnerships(threshold=DEFAULT_THRESHOLD):
+    from pyvis.network import Network
+
+    # Only strong partnerships (more than `threshold` runs together, all seasons),
+    # read from the precomputed edge index; /partnerships filters it interactively
+    strong_partnerships = partnership_edges(threshold)
+
+    # Build Graph
+    G = partnership_graph(strong_partnerships)
+
+    # Create PyVis Network
+    # net = Network(height="700px", width="100%", bgcolor="transparent", font_color="white")
+    net = Network(height="500px", width="100%", bgcolor="#1A1A1A", font_color="white")
+
+    # Set node background color to transparent or the desired color.
+    # Positions come from the cached server-side layout, so no physics in the browser
+    options = {
+        "nodes": {
+            "color": {
+                "background": "#1A1A1A",
+            }
+        },
+        "physics": {
+            "enabled": False
         }
     }
-}
-options_json = json.dumps(options)
-net.set_options(options_json)
-
-net.from_nx(G)
-
-# Save PyVis Network graph as HTML
-net.write_html(f"{PLOT_DIR}/batsman_partnerships.html")
-
-# Bubble chart for batsman stats
-batsman_stats = deliveries.groupby('batter').agg(
-    runs=('batsman_runs', 'sum'),
-    balls=('ball', 'count')
-).reset_index()
-
-batsman_stats['strike_rate'] = (batsman_stats['runs'] / batsman_stats['balls']) * 100
-batsman_stats = batsman_stats[batsman_stats['balls'] >= 200]  # Only serious players
-
-bubble_chart = alt.Chart(batsman_stats).mark_circle().encode(
-    x=alt.X('balls:Q', title='Balls Faced'),
-    y=alt.Y('strike_rate:Q', title='Strike Rate'),
-    size=alt.Size('runs:Q', scale=alt.Scale(range=[20, 1000])),
-    color=alt.Color('batter:N', legend=None),
-    tooltip=['batter:N', 'runs:Q', 'balls:Q', 'strike_rate:Q']
-).properties(
-    title="💥 Batsman Strike Rate vs Balls Faced (Bubble Chart)",
-    width=1000,
-    height=700
-).interactive()
-
-# Save the bubble chart as HTML
-bubble_chart.save(f"{PLOT_DIR}/batsman_bubble_chart.html")
-
-# Dismissal types pie chart
-dismissals = deliveries['dismissal_kind'].value_counts().reset_index()
-dismissals.columns = ['Dismissal Type', 'Count']
-
-dismissal_pie = px.pie(
-    dismissals,
-    names='Dismissal Type',
-    values='Count',
-    title='Wicket Dismissal Types in IPL',
-    hole=0.4
-)
-
-# Save the dismissal pie chart as HTML
-dismissal_pie.write_html(f"{PLOT_DIR}/dismissal_pie_chart.html")
-
-# Bowler stats bubble chart
-bowler_stats = deliveries.groupby('bowler').agg(
-    runs_conceded=('total_runs', 'sum'),
-    balls_bowled=('ball', 'count'),
-    wickets=('player_dismissed', 'count')
-).reset_index()
-
-bowler_stats['overs'] = bowler_stats['balls_bowled'] / 6
-bowler_stats['economy'] = bowler_stats['runs_conceded'] / bowler_stats['overs']
-
-# Filter serious bowlers
-bowler_stats = bowler_stats[bowler_stats['overs'] >= 100]
-
-bowler_bubble = alt.Chart(bowler_stats).mark_circle().encode(
-    x=alt.X('economy:Q', title='Economy Rate'),
-    y=alt.Y('wickets:Q', title='Wickets Taken'),
-    size=alt.Size('overs:Q', scale=alt.Scale(range=[20, 800])),
-    color=alt.Color('bowler:N', legend=None),
-    tooltip=['bowler:N', 'economy:Q', 'wickets:Q', 'overs:Q']
-).properties(
-    title="🎯 Bowler Economy Rate vs Wickets Taken (Bubble Chart)",
-    width=1000,
-    height=700
-).interactive()
-
-# Save the bowler bubble chart as HTML
-bowler_bubble.save(f"{PLOT_DIR}/bowler_bubble_chart.html")
-
-# Combine both datasets (matches and deliveries)
-combined_df = deliveries.merge(matches, how='left', left_on='match_id', right_on='id')
-
-# Batsman performance in winning matches
-batsman_wins = combined_df[combined_df['winner'] == combined_df['batting_team']]
-batsman_performance = batsman_wins.groupby('batter')['batsman_runs'].sum().reset_index()
-
-# Top 10 batsmen
-top_batsmen = batsman_performance.sort_values(by='batsman_runs', ascending=False).head(10)
-
-# Plot batsman performance
-top_batsman_chart = alt.Chart(top_batsmen).mark_bar().encode(
-    x=alt.X('batsman_runs:Q', title='Total Runs in Winning Matches'),
-    y=alt.Y('batter:N', sort='-x', title='Batsman'),
-    color='batter:N',
-    tooltip=['batter:N', 'batsman_runs:Q']
-).properties(
-    title="🏆 Top 10 Batsmen by Runs in Winning Matches",
-    width=1000,
-    height=700
-)
-
-# Save the batsman performance chart as HTML
-top_batsman_chart.save(f"{PLOT_DIR}/top_batsmen_performance.html")
-
-# Bowler economy in winning matches
-bowler_wins = combined_df[combined_df['winner'] == combined_df['bowling_team']]
-bowler_stats = bowler_wins.groupby('bowler').agg(
-    total_runs=('total_runs', 'sum'),
-    balls_bowled=('ball', 'count')
-).reset_index()
-
-bowler_stats['overs'] = bowler_stats['balls_bowled'] / 6
-bowler_stats['economy'] = bowler_stats['total_runs'] / bowler_stats['overs']
-
-# Filter for serious bowlers
-bowler_stats = bowler_stats[bowler_stats['overs'] >= 30]
-
-# Top 10 best economy
-best_economy = bowler_stats.sort_values('economy').head(10)
-
-# Plot best economy bowlers
-best_bowler_chart = alt.Chart(best_economy).mark_bar().encode(
-    x=alt.X('economy:Q', title='Economy Rate in Wins'),
-    y=alt.Y('bowler:N', sort='x', title='Bowler'),
-    color='bowler:N',
-    tooltip=['bowler:N', 'economy:Q', 'overs:Q']
-).properties(
-    title="🎯 Top 10 Best Economy Bowlers in Winning Matches",
-    width=1000,
-    height=700
-)
-
-# Save the best bowler economy chart as HTML
-best_bowler_chart.save(f"{PLOT_DIR}/best_bowler_economy.html")
-
-# Toss winner decision vs match winner pie chart
-combined_df['toss_match_result'] = combined_df.apply(lambda row: 'Won Toss and Match' if row['toss_winner'] == row['winner'] else 'Lost After Toss', axis=1)
-
-toss_outcomes = combined_df[['match_id', 'toss_match_result']].drop_duplicates()
-
-fig = px.pie(toss_outcomes, names='toss_match_result', title='🧠 Toss Impact on Winning Matches')
-
-# Save the toss outcome pie chart as HTML
-# fig.write_html(f"{PLOT_DIR}/toss_outcome_pie_chart.html")
+    options_json = json.dumps(options)
+    net.set_options(options_json)
+
+    return add_graph(net, G, global_layout())
+
+
+@chart(f"{PLOT_DIR}/batsman_bubble_chart.html", inputs=['matches', 'deliveries'])
+def batsman_bubble_chart():
+    import altair as alt
+
+    # Bubble chart for batsman stats
+    batsman_stats = rollup('player', ['bat_runs', 'bat_balls']).rename(
+        columns={'player': 'batter', 'bat_runs': 'runs', 'bat_balls': 'balls'})
+
+    batsman_stats['strike_rate'] = (batsman_stats['runs'] / batsman_stats['balls']) * 100
+    batsman_stats = batsman_stats[batsman_stats['balls'] >= 200]  # Only serious players
+    # Past BUBBLE_POINTS players, bubbles sharing a 5px cell ship as the biggest one
+    batsman_stats = thin_points(batsman_stats, x='balls', y='strike_rate', bins=(200, 140), keep='runs',
+                                count='players', max_points=BUBBLE_POINTS)
+
+    return alt.Chart(batsman_stats).mark_circle().encode(
+        x=alt.X('balls:Q', title='Balls Faced'),
+        y=alt.Y('strike_rate:Q', title='Strike Rate'),
+        size=alt.Size('runs:Q', scale=alt.Scale(range=[20, 1000])),
+        color=alt.Color('batter:N', legend=None),
+        tooltip=['batter:N', 'runs:Q', 'balls:Q', 'strike_rate:Q',
+                 alt.Tooltip('players:Q', title='Players in bubble')]
+    ).properties(
+        title="💥 Batsman Strike Rate vs Balls Faced (Bubble Chart)",
+        width=1000,
+        height=700
+    ).interactive()
+
+
+@chart(f"{PLOT_DIR}/dismissal_pie_chart.html", inputs=['deliveries'])
+def dismissal_pie_chart():
+    import plotly.express as px
+
+    deliveries = load_deliveries()
+
+    # Dismissal types pie chart
+    dismissals = deliveries['dismissal_kind'].value_counts().reset_index()
+    dismissals.columns = ['Dismissal Type', 'Count']
+
+    return px.pie(
+        dismissals,
+        names='Dismissal Type',
+        values='Count',
+        title='Wicket Dismissal Types in IPL',
+        hole=0.4
+    )
+
+
+@chart(f"{PLOT_DIR}/bowler_bubble_chart.html", inputs=['matches', 'deliveries'])
+def bowler_bubble_chart():
+    import altair as alt
+
+    # Bowler stats bubble chart
+    bowler_stats = rollup('player', ['bowl_runs', 'bowl_balls', 'bowl_wickets']).rename(
+        columns={'player': 'bowler', 'bowl_runs': 'runs_conceded', 'bowl_balls': 'balls_bowled',
+                 'bowl_wickets': 'wickets'})
+
+    bowler_stats['overs'] = bowler_stats['balls_bowled'] / 6
+    bowler_stats['economy'] = bowler_stats['runs_conceded'] / bowler_stats['overs']
+
+    # Filter serious bowlers
+    bowler_stats = bowler_stats[bowler_stats['overs'] >= 100]
+    bowler_stats = thin_points(bowler_stats, x='economy', y='wickets', bins=(200, 140), keep='overs',
+                               count='players', max_points=BUBBLE_POINTS)
+
+    return alt.Chart(bowler_stats).mark_circle().encode(
+        x=alt.X('economy:Q', title='Economy Rate'),
+        y=alt.Y('wickets:Q', title='Wickets Taken'),
+        size=alt.Size('overs:Q', scale=alt.Scale(range=[20, 800])),
+        color=alt.Color('bowler:N', legend=None),
+        tooltip=['bowler:N', 'economy:Q', 'wickets:Q', 'overs:Q',
+                 alt.Tooltip('players:Q', title='Players in bubble')]
+    ).properties(
+        title="🎯 Bowler Economy Rate vs Wickets Taken (Bubble Chart)",
+        width=1000,
+        height=700
+    ).interactive()
+
+
+@chart(f"{PLOT_DIR}/top_batsmen_performance.html", inputs=['matches', 'deliveries'])
+def top_batsmen_performance():
+    import altair as alt
+
+    # Batsman performance in winning matches
+    batsman_performance = rollup('player', ['bat_runs'], where=lambda cube: cube['won']).rename(
+        columns={'player': 'batter', 'bat_runs': 'batsman_runs'})
+
+    # Top 10 batsmen
+    top_batsmen = batsman_performance.sort_values(by='batsman_runs', ascending=False).head(10)
+
+    # Plot batsman performance
+    return alt.Chart(top_batsmen).mark_bar().encode(
+        x=alt.X('batsman_runs:Q', title='Total Runs in Winning Matches'),
+        y=alt.Y('batter:N', sort='-x', title='Batsman'),
+        color='batter:N',
+        tooltip=['batter:N', 'batsman_runs:Q']
+    ).properties(
+        title="🏆 Top 10 Batsmen by Runs in Winning Matches",
+        width=1000,
+        height=700
+    )
+
+
+@chart(f"{PLOT_DIR}/best_bowler_economy.html", inputs=['matches', 'deliveries'])
+def best_bowler_economy():
+    import altair as alt
+
+    # Bowler economy in winning matches
+    bowler_stats = rollup('player', ['bowl_runs', 'bowl_balls'], where=lambda cube: cube['won']).rename(
+        columns={'player': 'bowler', 'bowl_runs': 'total_runs', 'bowl_balls': 'balls_bowled'})
+
+    bowler_stats['overs'] = bowler_stats['balls_bowled'] / 6
+    bowler_stats['economy'] = bowler_stats['total_runs'] / bowler_stats['overs']
+
+    # Filter for serious bowlers
+    bowler_stats = bowler_stats[bowler_stats['overs'] >= 30]
+
+    # Top 10 best economy
+    best_economy = bowler_stats.sort_values('economy').head(10)
+
+    # Plot best economy bowlers
+    return alt.Chart(best_economy).mark_bar().encode(
+        x=alt.X('economy:Q', title='Economy Rate in Wins'),
+        y=alt.Y('bowler:N', sort='x', title='Bowler'),
+        color='bowler:N',
+        tooltip=['bowler:N', 'economy:Q', 'overs:Q']
+    ).properties(
+        title="🎯 Top 10 Best Economy Bowlers in Winning Matches",
+        width=1000,
+        height=700
+    )
+
+
+# Toss winner decision vs match winner pie chart (not registered, the dashboard doesn't use it)
+# @chart(f"{PLOT_DIR}/toss_outcome_pie_chart.html", inputs=['matches', 'deliveries'])
+def toss_outcome_pie_chart():
+    import plotly.express as px
+
+    # Toss result is a per-match fact: derive it on matches, no deliveries join needed
+    outcomes = match_outcomes(load_matches())
+    played = load_deliveries()['match_id'].unique()
+    toss_outcomes = outcomes[outcomes['match_id'].isin(played)][['match_id', 'toss_match_result']]
+
+    return px.pie(toss_outcomes, names='toss_match_result', title='🧠 Toss Impact on Winning Matches')
+
+
+if __name__ == '__main__':
+    render_module(__name__)
 
 # End of script
 
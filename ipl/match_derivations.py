@@ -0,0 +1,84 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+# Per-match derived columns (batting first, chase/defend, toss result), computed
+# with column operations on one row per match instead of DataFrame.apply(axis=1).
+# Column names default to matches.csv; pass the ipl_historical.csv ones for the archive
+# CSV, or ARCHIVE_COLUMNS for archive_db's historical table (franchise ids).
+MATCHES_COLUMNS = dict(match_id='id', team1='team1', team2='team2', toss_winner='toss_winner',
+                       toss_decision='toss_decision', winner='winner')
+HISTORICAL_COLUMNS = dict(match_id='match_id', team1='team1_name', team2='team2_name', toss_winner='toss_winner',
+                          toss_decision='toss_winner_choice', winner='match_winner')
+ARCHIVE_COLUMNS = dict(match_id='match_id', team1='team1_code', team2='team2_code', toss_winner='toss_winner_code',
+                       toss_decision='toss_winner_choice', winner='match_winner_code')
+
+
+def batting_first(matches, columns=MATCHES_COLUMNS):
+    # The toss winner bats first if they chose to, otherwise the other team does
+    toss_winner = matches[columns['toss_winner']]
+    other_team = matches[columns['team2']].where(toss_winner == matches[columns['team1']], matches[columns['team1']])
+    return toss_winner.where(matches[columns['toss_decision']] == 'bat', other_team)
+
+
+def match_outcomes(matches, columns=MATCHES_COLUMNS):
+    # One row per match: match_id, batting_first, win_type and toss_match_result
+    winner = matches[columns['winner']]
+    first = batting_first(matches, columns)
+    return pd.DataFrame({
+        'match_id': matches[columns['match_id']].to_numpy(),
+        'batting_first': first.to_numpy(),
+        'win_type': np.where(winner == first, 'Defended', 'Chased'),
+        'toss_match_result': np.where(matches[columns['toss_winner']] == winner,
+                                      'Won Toss and Match', 'Lost After Toss'),
+    }, index=matches.index)
+
+
+def join_outcomes(deliveries, outcomes, names=('batting_first', 'win_type', 'toss_match_result')):
+    # Attach only the requested per-match columns to ball-level rows
+    lookup = outcomes.set_index('match_id')[list(names)]
+    return deliveries.join(lookup, on='match_id')
+
+
+def _scaled(matches, deliveries, scale):
+    # Repeat the data `scale` times with fresh match ids
+    offset = int(matches['id'].max()) + 1
+    matches = pd.concat([matches.assign(id=matches['id'] + i * offset) for i in range(scale)], ignore_index=True)
+    deliveries = pd.concat([deliveries.assign(match_id=deliveries['match_id'] + i * offset) for i in range(scale)],
+                           ignore_index=True)
+    return matches, deliveries
+
+
+def benchmark(scale=10):
+    # Row-wise toss_match_result over the deliveries x matches join (as match_del.py
+    # used to do) against the match-grain vectorised version
+    from data_loader import load_deliveries, load_matches
+
+    matches, deliveries = _scaled(load_matches(), load_deliveries(), scale)
+
+    start = time.perf_counter()
+    combined_df = deliveries.merge(matches, how='left', left_on='match_id', right_on='id')
+    combined_df['toss_match_result'] = combined_df.apply(
+        lambda row: 'Won Toss and Match' if row['toss_winner'] == row['winner'] else 'Lost After Toss', axis=1)
+    rowwise = combined_df[['match_id', 'toss_match_result']].drop_duplicates()
+    rowwise_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    outcomes = match_outcomes(matches)
+    vectorised = outcomes[outcomes['match_id'].isin(deliveries['match_id'].unique())]
+    vectorised_time = time.perf_counter() - start
+
+    assert (rowwise.set_index('match_id')['toss_match_result'].sort_index()
+            == vectorised.set_index('match_id')['toss_match_result'].sort_index()).all()
+
+    print(f"{scale}x data: {len(matches)} matches, {len(deliveries)} deliveries")
+    print(f"row-wise apply over join   {rowwise_time:8.3f}s")
+    print(f"vectorised at match grain  {vectorised_time:8.3f}s  ({rowwise_time / vectorised_time:.0f}x faster)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark vectorised match derivations against row-wise apply")
+    parser.add_argument('--scale', type=int, default=10, help="how many times to repeat the datasets")
+    benchmark(parser.parse_args().scale)
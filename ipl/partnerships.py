@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from data_loader import CACHE_DIR, SOURCES, cached_frame, file_hash, load_deliveries, load_matches
+
+# Batting partnerships as an undirected graph. The edge index holds runs,
+# balls and matches per unordered pair of batters for every (season, team)
+# slice, each slice sorted by runs, so a threshold is a binary search and
+# the network can be re-filtered without touching deliveries again. Node
+# positions are computed once server-side so pages open already laid out.
+LAYOUT_PATH = f"{CACHE_DIR}/partnership_layout.json"
+
+# spring_layout returns positions in [-1, 1]; vis.js works in pixels
+LAYOUT_SCALE = 600
+
+# Runs a pair must have put on together to appear in the network by default
+# (the notebook used 200)
+DEFAULT_THRESHOLD = 400
+
+# Slice keys standing for every season / every team
+ALL_SEASONS = 0
+ALL_TEAMS = 'All'
+
+EDGE_KEYS = ['season', 'team', 'first', 'second']
+EDGE_MEASURES = ['runs', 'balls', 'matches']
+
+
+def _pair_codes(deliveries):
+    # batter and non_striker share one set of categories (data_loader), so
+    # their codes can be ordered to make (A, B) and (B, A) the same pair
+    batter = deliveries['batter'].cat.codes.to_numpy()
+    non_striker = deliveries['non_striker'].cat.codes.to_numpy()
+    return np.minimum(batter, non_striker), np.maximum(batter, non_striker)
+
+
+def build_edge_index():
+    deliveries = load_deliveries()
+    first, second = _pair_codes(deliveries)
+    balls = pd.DataFrame({
+        'season': deliveries['match_id'].map(load_matches().set_index('id')['season']).to_numpy(dtype=np.int16),
+        'team': deliveries['batting_team'].cat.codes.to_numpy(),
+        'first': first,
+        'second': second,
+        'match_id': deliveries['match_id'].to_numpy(),
+        'runs': deliveries['batsman_runs'].to_numpy(dtype=np.int32),
+        'balls': np.ones(len(deliveries), dtype=np.int32),
+    })
+
+    # A pair bats for one team in one season per match, so match counts
+    # stay additive when the slices below are rolled up
+    per_match = balls.groupby(EDGE_KEYS + ['match_id'], sort=False)[['runs', 'balls']].sum()
+    edges = per_match.assign(matches=1).groupby(EDGE_KEYS, sort=False).sum().reset_index()
+
+    slices = [edges]
+    for rolled, fill in (('team', -1), ('season', ALL_SEASONS)):
+        keys = [key for key in EDGE_KEYS if key != rolled]
+        slices.append(edges.groupby(keys, sort=False)[EDGE_MEASURES].sum().reset_index().assign(**{rolled: fill}))
+    slices.append(edges.groupby(['first', 'second'], sort=False)[EDGE_MEASURES].sum().reset_index()
+                  .assign(season=ALL_SEASONS, team=-1))
+    index = pd.concat(slices, ignore_index=True)[EDGE_KEYS + EDGE_MEASURES]
+
+    players = deliveries['batter'].cat.categories
+    teams = deliveries['batting_team'].cat.categories
+    index['team'] = pd.Categorical(np.where(index['team'] < 0, ALL_TEAMS, teams[index['team'].clip(lower=0)]))
+    index['first'] = pd.Categorical(players[index['first']])
+    index['second'] = pd.Categorical(players[index['second']])
+    index['season'] = index['season'].astype(np.int16)
+    index[EDGE_MEASURES] = index[EDGE_MEASURES].astype(np.int32)
+    return index.sort_values(['season', 'team', 'runs'], kind='stable', ignore_index=True)
+
+
+def load_edge_index():
+    # Cached next to the dataset caches, rebuilt when either source changes
+    digest = file_hash(SOURCES['deliveries']) + file_hash(SOURCES['matches'])
+    return cached_frame('partnership_edges', digest, build_edge_index)
+
+
+@lru_cache(maxsize=None)
+def _slice_bounds():
+    # {(season, team): (start, stop)}; every slice is one contiguous run of rows
+    positions = load_edge_index().groupby(['season', 'team'], observed=True, sort=False).indices
+    return {(int(season), team): (int(rows[0]), int(rows[-1]) + 1) for (season, team), rows in positions.items()}
+
+
+def partnership_edges(threshold=0, season=ALL_SEASONS, team=ALL_TEAMS):
+    # Pairs with more than `threshold` runs together in one slice, strongest last
+    edges = load_edge_index()
+    start, stop = _slice_bounds().get((season, team), (0, 0))
+    start += int(np.searchsorted(edges['runs'].to_numpy()[start:stop], threshold, side='right'))
+    return edges.iloc[start:stop][['first', 'second'] + EDGE_MEASURES]
+
+
+def edge_index_options():
+    # Seasons, teams and the largest all-time partnership, for filter controls
+    bounds = _slice_bounds()
+    seasons = sorted({season for season, _ in bounds if season != ALL_SEASONS})
+    teams = sorted({team for _, team in bounds if team != ALL_TEAMS})
+    max_runs = int(partnership_edges()['runs'].max()) if bounds else 0
+    return {'seasons': seasons, 'teams': teams, 'max_runs': max_runs}
+
+
+def partnership_graph(pairs, weight_scale=0.01):
+    import networkx as nx
+
+    G = nx.Graph()
+    G.add_weighted_edges_from(zip(pairs['first'], pairs['second'], pairs['runs'] * weight_scale))
+    return G
+
+
+def _graph_digest(G):
+    edges = sorted(tuple(sorted(edge)) for edge in G.edges())
+    return hashlib.sha256(json.dumps(edges).encode()).hexdigest()
+
+
+def graph_layout(G, path=LAYOUT_PATH):
+    # {node: (x, y)} in pixels, cached on disk until the set of edges changes
+    digest = _graph_digest(G)
+    if os.path.exists(path):
+        with open(path) as f:
+            cached = json.load(f)
+        if cached['sha256'] == digest:
+            return {node: tuple(xy) for node, xy in cached['positions'].items()}
+
+    import networkx as nx
+
+    positions = nx.spring_layout(G, seed=42)
+    positions = {node: (float(x) * LAYOUT_SCALE, float(y) * LAYOUT_SCALE) for node, (x, y) in positions.items()}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'sha256': digest, 'positions': positions}, f)
+    return positions
+
+
+def add_graph(net, G, positions, node_size=10):
+    # Fixed-position nodes, and edges appended in one go: the pairs are
+    # already unique, so PyVis's per-edge duplicate scan (O(edges^2)) is skipped
+    nodes = list(G.nodes())
+    net.add_nodes(nodes, x=[positions[node][0] for node in nodes], y=[positions[node][1] for node in nodes],
+                  size=[node_size] * len(nodes))
+    net.edges.extend({'from': a, 'to': b, 'width': weight} for a, b, weight in G.edges(data='weight'))
+    return net
+
+
+@lru_cache(maxsize=None)
+def global_layout():
+    # One layout over every all-time partnership, shared by all filtered
+    # views so nodes stay put as the threshold, season or team changes
+    return graph_layout(partnership_graph(partnership_edges()))
+
+
+def network_view(threshold=0, season=ALL_SEASONS, team=ALL_TEAMS):
+    # vis.js nodes and edges for one filtered view of the network
+    edges = partnership_edges(threshold, season, team)
+    positions = global_layout()
+    players = pd.unique(edges[['first', 'second']].to_numpy().ravel()) if len(edges) else []
+    return {
+        'nodes': [{'id': player, 'label': player, 'x': positions[player][0], 'y': positions[player][1]}
+                  for player in players],
+        'edges': [{'from': first, 'to': second, 'runs': int(runs), 'balls': int(balls), 'matches': int(matches),
+                   'width': runs * 0.01}
+                  for first, second, runs, balls, matches in edges.itertuples(index=False)],
+    }
@@ -0,0 +1,208 @@
+import argparse
+import json
+import os
+import re
+import time
+import unicodedata
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+import pandas as pd
+import pyarrow.feather as feather
+
+import archive_db
+from data_loader import CACHE_DIR, PLAYER_COLUMNS, file_hash, load_auction, load_deliveries
+
+# Player-ID crosswalk: every player name used by a source (auction "Pat
+# Cummins", deliveries "PJ Cummins", archive "Pat Cummins") mapped to the
+# archive's numeric player_id. Candidates are blocked on shared name tokens
+# and scored with difflib; names already in the table are never re-matched,
+# so new auction rows only cost a lookup per new name.
+CROSSWALK_PATH = f"{CACHE_DIR}/player_crosswalk.feather"
+CROSSWALK_META_PATH = f"{CACHE_DIR}/player_crosswalk.json"
+
+# Bump when normalisation or scoring changes, so every name is re-matched
+CROSSWALK_VERSION = 2
+
+# Lowest score accepted as a match, and how close a runner-up may get
+# before the name is left unresolved as ambiguous
+MATCH_THRESHOLD = 0.85
+AMBIGUITY_MARGIN = 0.02
+
+# Score given to a rule match on the same surname: initials ("PJ Cummins" /
+# "Pat Cummins"), a shortened first name ("Ben Stokes" / "Benjamin
+# Stokes") or a dropped middle name ("Axar Patel" / "Axar Rajesh Patel")
+RULE_SCORE = 0.9
+
+# Any other match needs the same surname or a spelling variant of it
+# ("Senanayaka" / "Senanayake"); a close full-name ratio alone isn't enough
+# ("Shubham Garhwal" / "Shubham Agarwal" scores 0.93 overall, 0.86 on surnames)
+SURNAME_RATIO = 0.88
+
+CROSSWALK_COLUMNS = ['source', 'name', 'player_id', 'player_name', 'score', 'method']
+
+_crosswalk = {}
+
+
+def normalize(name):
+    # 'M.S. Dhoni ' -> 'm s dhoni', accents dropped
+    name = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode()
+    return ' '.join(re.sub(r"[^a-z ]", ' ', name.lower()).split())
+
+
+def _rule(tokens, other):
+    # Which same-surname rule links two tokenised names, if any
+    if len(tokens) < 2 or len(other) < 2 or tokens[-1] != other[-1]:
+        return None
+    for given, full in ((tokens[:-1], other[:-1]), (other[:-1], tokens[:-1])):
+        if all(len(token) <= 2 for token in given) and given[0][0] == full[0][0]:
+            return 'initials'
+    first, other_first = sorted((tokens[0], other[0]), key=len)
+    if len(first) >= 3 and other_first.startswith(first):
+        return 'alias'
+    if tokens[0] == other[0] and (set(tokens) <= set(other) or set(other) <= set(tokens)):
+        return 'alias'
+    return None
+
+
+def archive_players():
+    return archive_db.query("SELECT player_id, player_name FROM players_info ORDER BY player_id")
+
+
+def build_blocks(players):
+    # Candidate lookup: every name token -> archive rows containing it
+    normalized = [normalize(name) for name in players['player_name']]
+    blocks = defaultdict(set)
+    for row, name in enumerate(normalized):
+        for token in name.split():
+            blocks[token].add(row)
+    return {'players': players, 'normalized': normalized, 'blocks': blocks,
+            'exact': {name: row for row, name in enumerate(normalized)}}
+
+
+def _score(tokens, name, candidate):
+    other = candidate.split()
+    if _rule(tokens, other):
+        return max(RULE_SCORE, SequenceMatcher(None, name, candidate).ratio())
+    if tokens[-1] != other[-1] and SequenceMatcher(None, tokens[-1], other[-1]).ratio() < SURNAME_RATIO:
+        return 0.0
+    return SequenceMatcher(None, name, candidate).ratio()
+
+
+def match_name(name, index):
+    # (player_id, player_name, score, method) for one source name
+    players, normalized = index['players'], index['normalized']
+    key = normalize(name)
+    if not key:
+        return None, None, 0.0, 'unmatched'
+    if key in index['exact']:
+        row = index['exact'][key]
+        return int(players['player_id'].iat[row]), players['player_name'].iat[row], 1.0, 'exact'
+
+    tokens = key.split()
+    candidates = set().union(*(index['blocks'].get(token, set()) for token in tokens))
+    scored = sorted(((_score(tokens, key, normalized[row]), row) for row in candidates), reverse=True)
+    if not scored or scored[0][0] < MATCH_THRESHOLD:
+        return None, None, scored[0][0] if scored else 0.0, 'unmatched'
+    if len(scored) > 1 and scored[0][0] - scored[1][0] < AMBIGUITY_MARGIN:
+        return None, None, scored[0][0], 'ambiguous'
+
+    score, row = scored[0]
+    method = _rule(tokens, normalized[row].split()) or 'fuzzy'
+    return int(players['player_id'].iat[row]), players['player_name'].iat[row], round(score, 3), method
+
+
+def source_names():
+    # Distinct player names per source
+    deliveries = load_deliveries()
+    delivery_names = set().union(*(deliveries[column].cat.categories for column in PLAYER_COLUMNS))
+    return {
+        'auction': sorted(load_auction()['Player'].dropna().unique()),
+        'deliveries': sorted(delivery_names),
+        'archive': archive_players()['player_name'].tolist(),
+    }
+
+
+def _read_crosswalk(archive_digest):
+    # The stored table, unless the archive's player list or the matcher changed
+    if not (os.path.exists(CROSSWALK_PATH) and os.path.exists(CROSSWALK_META_PATH)):
+        return pd.DataFrame(columns=CROSSWALK_COLUMNS)
+    with open(CROSSWALK_META_PATH) as f:
+        meta = json.load(f)
+    if meta['archive_sha256'] != archive_digest or meta['version'] != CROSSWALK_VERSION:
+        return pd.DataFrame(columns=CROSSWALK_COLUMNS)
+    return feather.read_feather(CROSSWALK_PATH)
+
+
+def update_crosswalk(names=None):
+    # Match only names not yet in the table, then persist it.
+    # names: {source: [name, ...]}, defaults to every name in every source
+    archive_digest = file_hash(archive_db.ARCHIVE_TABLES['players_info'])
+    crosswalk = _read_crosswalk(archive_digest)
+    names = names or source_names()
+
+    known = set(zip(crosswalk['source'], crosswalk['name']))
+    new = [(source, name) for source, source_list in names.items() for name in source_list
+           if (source, name) not in known]
+    if new:
+        index = build_blocks(archive_players())
+        rows = pd.DataFrame([(source, name, *match_name(name, index)) for source, name in new],
+                            columns=CROSSWALK_COLUMNS)
+        crosswalk = pd.concat([crosswalk, rows], ignore_index=True) if len(crosswalk) else rows
+        crosswalk['player_id'] = crosswalk['player_id'].astype('Int64')
+
+        # Written under this process's own temp names and swapped in, so a
+        # concurrent reader never sees half a table
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_suffix = f".{os.getpid()}.tmp"
+        feather.write_feather(crosswalk, CROSSWALK_PATH + tmp_suffix, compression='uncompressed')
+        with open(CROSSWALK_META_PATH + tmp_suffix, 'w') as f:
+            json.dump({'archive_sha256': archive_digest, 'version': CROSSWALK_VERSION}, f, indent=2)
+        os.replace(CROSSWALK_PATH + tmp_suffix, CROSSWALK_PATH)
+        os.replace(CROSSWALK_META_PATH + tmp_suffix, CROSSWALK_META_PATH)
+
+    _crosswalk.clear()
+    _crosswalk['table'] = crosswalk
+    return crosswalk, len(new)
+
+
+def load_crosswalk():
+    if 'table' not in _crosswalk:
+        update_crosswalk()
+    return _crosswalk['table']
+
+
+def player_id_lookup(source):
+    # {name: player_id} for one source, matched names only
+    crosswalk = load_crosswalk()
+    matched = crosswalk[(crosswalk['source'] == source) & crosswalk['player_id'].notna()]
+    return dict(zip(matched['name'], matched['player_id'].astype(int)))
+
+
+def attach_player_ids(df, column, source, id_column='player_id'):
+    # Add the archive player_id next to a name column; unmatched names get <NA>
+    return df.assign(**{id_column: df[column].map(player_id_lookup(source)).astype('Int64')})
+
+
+def report(crosswalk):
+    summary = crosswalk.groupby(['source', 'method']).size().unstack(fill_value=0)
+    print(summary.to_string())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build or update the player-ID crosswalk")
+    parser.add_argument('names', nargs='*', help="look these names up instead of updating the table")
+    parser.add_argument('--unmatched', action='store_true', help="list names that didn't resolve")
+    args = parser.parse_args()
+
+    if args.names:
+        index = build_blocks(archive_players())
+        for name in args.names:
+            print(name, '->', match_name(name, index))
+    else:
+        start = time.perf_counter()
+        crosswalk, added = update_crosswalk()
+        print(f"{added} new names matched in {time.perf_counter() - start:.2f}s, {len(crosswalk)} in {CROSSWALK_PATH}")
+        report(crosswalk)
+        if args.unmatched:
+            print(crosswalk[crosswalk['player_id'].isna()].to_string(index=False))
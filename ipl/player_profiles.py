@@ -0,0 +1,296 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+from chart_registry import save_figure
+from data_loader import CACHE_DIR, CACHE_VERSION, SOURCES, file_hash, load_deliveries, load_matches
+
+# Per-player profiles served from deliveries sorted by player: one feather
+# file per role plus the [start, stop) row range of every player, so a
+# lookup slices that player's rows out of a memory-mapped table instead of
+# filtering the whole ball-by-ball frame.
+INDEX_DIR = f"{CACHE_DIR}/players"
+
+# Written profile pages, kept apart from player_stats.py's charts in static/player_plots
+PLAYER_PLOT_DIR = "static/player_profiles"
+
+# Role -> the deliveries column naming the player, and what counts as runs
+ROLES = {
+    'batting': ('batter', 'batsman_runs'),
+    'bowling': ('bowler', 'total_runs'),
+}
+
+# Open indexes of this process: {(index_dir, role): (table, offsets)}
+_indexes = {}
+
+
+def _sorted_rows(deliveries, matches, role):
+    # player, season, match_id, runs and wicket for every ball, grouped by player
+    player_column, runs_column = ROLES[role]
+    if role == 'batting':
+        wicket = deliveries['player_dismissed'] == deliveries['batter']
+    else:
+        wicket = deliveries['is_wicket'] == 1
+    rows = pd.DataFrame({
+        'player': deliveries[player_column].astype(str),
+        'season': deliveries['match_id'].map(matches.set_index('id')['season']).astype('int16'),
+        'match_id': deliveries['match_id'],
+        'runs': deliveries[runs_column],
+        'wicket': wicket.astype('int8'),
+    })
+    return rows.sort_values(['player', 'season', 'match_id'], kind='stable').reset_index(drop=True)
+
+
+def _offsets(players):
+    # {player: [start, stop]} over a column that is already sorted by player
+    names, starts = np.unique(players.to_numpy(), return_index=True)
+    stops = np.append(starts[1:], len(players))
+    return {name: [int(start), int(stop)] for name, start, stop in zip(names, starts, stops)}
+
+
+def build_index(deliveries, matches, digest, index_dir=INDEX_DIR):
+    os.makedirs(index_dir, exist_ok=True)
+    for role in ROLES:
+        rows = _sorted_rows(deliveries, matches, role)
+        feather.write_feather(rows, f"{index_dir}/{role}.feather", compression='uncompressed')
+        with open(f"{index_dir}/{role}.json", 'w') as f:
+            json.dump({'sha256': digest, 'version': CACHE_VERSION, 'offsets': _offsets(rows['player'])}, f)
+        _indexes.pop((index_dir, role), None)
+
+
+def _source_digest():
+    return file_hash(SOURCES['deliveries']) + file_hash(SOURCES['matches'])
+
+
+def ensure_index(index_dir=INDEX_DIR):
+    # Rebuild the index when deliveries.csv or matches.csv changed
+    digest = _source_digest()
+    for role in ROLES:
+        meta_path = f"{index_dir}/{role}.json"
+        if not os.path.exists(meta_path):
+            break
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta['sha256'] != digest or meta['version'] != CACHE_VERSION:
+            break
+    else:
+        return
+    build_index(load_deliveries(), load_matches(), digest, index_dir)
+
+
+def _open_index(role, index_dir=INDEX_DIR):
+    key = (index_dir, role)
+    if key not in _indexes:
+        if index_dir == INDEX_DIR:
+            ensure_index()
+        with open(f"{index_dir}/{role}.json") as f:
+            offsets = json.load(f)['offsets']
+        table = feather.read_table(f"{index_dir}/{role}.feather", memory_map=True)
+        _indexes[key] = table, offsets
+    return _indexes[key]
+
+
+def _player_slice(player, role, index_dir=INDEX_DIR):
+    # Only this player's balls; the rest of the memory-mapped file is never read
+    table, offsets = _open_index(role, index_dir)
+    start, stop = offsets.get(player, (0, 0))
+    return table.slice(start, stop - start)
+
+
+def player_rows(player, role, index_dir=INDEX_DIR):
+    return _player_slice(player, role, index_dir).to_pandas()
+
+
+def known_player(player, index_dir=INDEX_DIR):
+    return any(player in _open_index(role, index_dir)[1] for role in ROLES)
+
+
+def players(index_dir=INDEX_DIR):
+    names = set()
+    for role in ROLES:
+        names.update(_open_index(role, index_dir)[1])
+    return sorted(names)
+
+
+def _per_season(rows, **flags):
+    # Rows are sorted by season then match, so each season is one contiguous
+    # run and its totals are a reduceat over the run starts
+    season = rows['season'].to_numpy()
+    match_id = rows['match_id'].to_numpy()
+    starts = np.flatnonzero(np.diff(season, prepend=-1))
+    new_match = np.diff(match_id, prepend=-1) != 0
+
+    stats = {
+        'season': season[starts],
+        'matches': np.add.reduceat(new_match, starts) if len(starts) else new_match[:0],
+        'balls': np.diff(np.append(starts, len(season))),
+    }
+    columns = {'runs': rows['runs'].to_numpy(), 'wicket': rows['wicket'].to_numpy(), **flags}
+    for name, values in columns.items():
+        values = values.astype(np.int64)
+        stats[name] = np.add.reduceat(values, starts) if len(starts) else values[:0]
+    return pd.DataFrame(stats)
+
+
+def batting_profile(player, index_dir=INDEX_DIR):
+    rows = _player_slice(player, 'batting', index_dir)
+    runs = rows['runs'].to_numpy()
+    stats = _per_season(rows, fours=runs == 4, sixes=runs == 6)
+    stats = stats.rename(columns={'wicket': 'outs'})
+    stats['strike_rate'] = (stats['runs'] / stats['balls'] * 100).round(2)
+    return stats[['season', 'matches', 'runs', 'balls', 'fours', 'sixes', 'outs', 'strike_rate']]
+
+
+def bowling_profile(player, index_dir=INDEX_DIR):
+    stats = _per_season(_player_slice(player, 'bowling', index_dir))
+    stats = stats.rename(columns={'balls': 'balls_bowled', 'runs': 'runs_conceded', 'wicket': 'wickets'})
+    stats['overs'] = stats['balls_bowled'] // 6 + (stats['balls_bowled'] % 6) / 10
+    stats['economy_rate'] = (stats['runs_conceded'] / (stats['balls_bowled'] / 6)).round(2)
+    return stats[['season', 'matches', 'balls_bowled', 'runs_conceded', 'wickets', 'overs', 'economy_rate']]
+
+
+def player_profile(player, index_dir=INDEX_DIR):
+    return {'batting': batting_profile(player, index_dir), 'bowling': bowling_profile(player, index_dir)}
+
+
+def bowling_figure(player, bowling_stats=None):
+    import plotly.graph_objects as go
+
+    # Wickets (bars) and economy rate (line) per season
+    if bowling_stats is None:
+        bowling_stats = bowling_profile(player)
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=bowling_stats['season'],
+        y=bowling_stats['wickets'],
+        name="Wickets",
+        marker_color='blue'
+    ))
+    fig.add_trace(go.Scatter(
+        x=bowling_stats['season'],
+        y=bowling_stats['economy_rate'],
+        name="Economy Rate",
+        yaxis="y2",
+        marker_color='red',
+        mode='lines+markers'
+    ))
+    fig.update_layout(
+        height=500,
+        title_text=f"{player}' Bowling Performance Over the Years" if player.endswith('s')
+        else f"{player}'s Bowling Performance Over the Years",
+        yaxis=dict(title='Wickets'),
+        yaxis2=dict(
+            overlaying='y',
+            side='right',
+            title='Economy Rate'
+        ),
+        hovermode='x unified',
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="center",
+            x=0.5
+        )
+    )
+    return fig
+
+
+def profile_figure(player):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    # Batting (runs, strike rate) above bowling (wickets, economy), per season
+    profile = player_profile(player)
+    batting, bowling = profile['batting'], profile['bowling']
+
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.08,
+                        subplot_titles=("Batting", "Bowling"),
+                        specs=[[{'secondary_y': True}], [{'secondary_y': True}]])
+    fig.add_trace(go.Bar(x=batting['season'], y=batting['runs'], name="Runs", marker_color='seagreen'),
+                  row=1, col=1)
+    fig.add_trace(go.Scatter(x=batting['season'], y=batting['strike_rate'], name="Strike Rate",
+                             mode='lines+markers', marker_color='orange'), row=1, col=1, secondary_y=True)
+    fig.add_trace(go.Bar(x=bowling['season'], y=bowling['wickets'], name="Wickets", marker_color='blue'),
+                  row=2, col=1)
+    fig.add_trace(go.Scatter(x=bowling['season'], y=bowling['economy_rate'], name="Economy Rate",
+                             mode='lines+markers', marker_color='red'), row=2, col=1, secondary_y=True)
+    fig.update_layout(height=700, title_text=f"{player}: Season by Season", hovermode='x unified')
+    return fig
+
+
+def profile_path(player):
+    return f"{PLAYER_PLOT_DIR}/{player.replace(' ', '_')}.html"
+
+
+def write_profiles(names, plotly_js=True):
+    for player in names:
+        output = profile_path(player)
+        save_figure(profile_figure(player), output, plotly_js)
+        yield output
+
+
+def benchmark(scale=10, lookups=50):
+    # Cold lookups (fresh process state, player not seen before) against an
+    # index over `scale` copies of the deliveries
+    from match_derivations import _scaled
+
+    matches, deliveries = _scaled(load_matches(), load_deliveries(), scale)
+    index_dir = tempfile.mkdtemp(prefix='player_index_')
+    try:
+        start = time.perf_counter()
+        build_index(deliveries, matches, digest=f"benchmark-{scale}", index_dir=index_dir)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        names = players(index_dir)
+        open_time = time.perf_counter() - start
+
+        timings = []
+        for player in random.Random(0).sample(names, min(lookups, len(names))):
+            start = time.perf_counter()
+            player_profile(player, index_dir)
+            timings.append(time.perf_counter() - start)
+
+        # The same bowling profile by filtering the full frame, for comparison
+        start = time.perf_counter()
+        rows = deliveries[deliveries['bowler'] == names[0]]
+        rows.groupby(rows['match_id'].map(matches.set_index('id')['season']))['total_runs'].agg(['sum', 'count'])
+        scan_time = time.perf_counter() - start
+    finally:
+        for role in ROLES:
+            _indexes.pop((index_dir, role), None)
+        shutil.rmtree(index_dir)
+
+    timings = np.array(timings) * 1000
+    print(f"{scale}x data: {len(deliveries)} deliveries, {len(names)} players")
+    print(f"build index        {build_time:8.2f}s")
+    print(f"open index         {open_time * 1000:8.1f}ms")
+    print(f"profile lookup     median {np.median(timings):.1f}ms  p95 {np.percentile(timings, 95):.1f}ms  "
+          f"max {timings.max():.1f}ms")
+    print(f"full-scan profile  {scan_time * 1000:8.1f}ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write per-player profile pages from the player index")
+    parser.add_argument('players', nargs='*', help="player names as in deliveries.csv, e.g. 'V Kohli'")
+    parser.add_argument('--list', action='store_true', help="list every player in the index")
+    parser.add_argument('--benchmark', type=int, metavar='SCALE', help="time cold lookups at SCALE x data")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+    elif args.list:
+        print('\n'.join(players()))
+    else:
+        for path in write_profiles(args.players):
+            print(f"wrote {path}")
@@ -0,0 +1,56 @@
+import gzip
+import os
+import sys
+
+# Brotli is optional; without it only gzip copies are written
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Encodings app.py can serve, with the suffix of the precompressed copy
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+# Quality 11 is ~20x slower than 9 on plots with inlined plotly.js (17s vs
+# 0.9s for 4.5 MB) for about 10% smaller output
+BROTLI_QUALITY = 9
+
+
+def replace_file(path, data):
+    # Written under this process's own temp name and swapped in, so the
+    # server never sends (or tags with an ETag) half a file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data.encode('utf-8') if isinstance(data, str) else data)
+    os.replace(tmp_path, path)
+
+
+def precompress(path):
+    # Write path.gz (and path.br) next to a built file so the server never
+    # compresses on the fly. mtime=0 keeps the gzip bytes identical between builds.
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    written = []
+    replace_file(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+    written.append(path + '.gz')
+
+    if brotli is not None:
+        replace_file(path + '.br', brotli.compress(data, quality=BROTLI_QUALITY, mode=brotli.MODE_TEXT))
+        written.append(path + '.br')
+    return written
+
+
+def precompress_dir(directory, extensions=('.html', '.json')):
+    written = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith(extensions):
+                written += precompress(os.path.join(root, name))
+    return written
+
+
+if __name__ == '__main__':
+    # python precompress.py [dir ...]  (default: static)
+    for directory in sys.argv[1:] or ['static']:
+        print(f"{len(precompress_dir(directory))} compressed copies written under {directory}")
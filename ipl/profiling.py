@@ -0,0 +1,207 @@
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Opt-in stage profiler. Code wraps named stages in `with stage(...)`; while
+# profiling is off that costs one flag check. When on, every stage records
+# its wall time, the process's peak RSS when it ended (and how much the
+# stage raised it) and, if given, the size of the file it wrote. Stages
+# nest, and the events can be printed as a summary table or written as a
+# Chrome trace (chrome://tracing, ui.perfetto.dev) for flame-style viewing.
+#
+# Switch it on with enable(), build.py --profile, or by running a chart
+# script with IPL_PROFILE=trace.json set.
+PROFILE_ENV = 'IPL_PROFILE'
+
+_state = {'enabled': False}
+_events = []
+_local = threading.local()
+
+
+def enable():
+    _state['enabled'] = True
+
+
+def enabled():
+    return _state['enabled']
+
+
+def peak_rss():
+    # High-water mark of this process's resident memory in bytes (None on Windows)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _now_us():
+    # Monotonic clock shared by every process on the machine, so events from
+    # pool workers line up with the parent's
+    return time.perf_counter_ns() // 1000
+
+
+@contextmanager
+def stage(name, chart=None, output=None, **args):
+    # Record one named stage. `chart` groups stages by chart in the summary,
+    # `output` is a file whose size is recorded when the stage ends (it may
+    # also be set later with record['output'] = path).
+    if not _state['enabled']:
+        yield {}
+        return
+
+    stack = _local.__dict__.setdefault('stack', [])
+    chart = chart or next((parent['chart'] for parent in reversed(stack) if parent['chart']), None)
+    record = {'name': name, 'chart': chart, 'output': output, 'args': args}
+    stack.append(record)
+    rss_before = peak_rss()
+    start = _now_us()
+    try:
+        yield record
+    finally:
+        duration = _now_us() - start
+        stack.pop()
+        rss = peak_rss()
+        output = record['output']
+        _events.append({
+            'name': name,
+            'chart': chart,
+            'depth': len(stack),
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'ts': start,
+            'dur': duration,
+            'peak_rss': rss,
+            'rss_growth': rss - rss_before if rss is not None else None,
+            'bytes': os.path.getsize(output) if output and os.path.exists(output) else None,
+            'args': record['args'],
+        })
+
+
+def profiled(name=None):
+    # Decorator form of stage(), named after the function by default
+    def wrap(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name or func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return wrap
+
+
+def drain():
+    # Take the events recorded so far (pool workers hand theirs to the parent)
+    events = list(_events)
+    _events.clear()
+    return events
+
+
+def extend(events):
+    _events.extend(events)
+
+
+def events():
+    return list(_events)
+
+
+def _mb(value):
+    return f"{value / 2 ** 20:8.1f}" if value is not None else f"{'-':>8}"
+
+
+def _kb(value):
+    return f"{value / 1024:9.1f}" if value is not None else f"{'-':>9}"
+
+
+def summary(events=None):
+    # {'stages': rows per stage name, 'charts': rows per chart}, each row
+    # with calls, total and max wall time, peak RSS and bytes written
+    events = _events if events is None else events
+
+    def rows(key):
+        table = {}
+        for event in events:
+            group = key(event)
+            if group is None:
+                continue
+            row = table.setdefault(group, {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'peak_rss': None,
+                                           'rss_growth': 0, 'bytes': None})
+            row['calls'] += 1
+            row['seconds'] += event['dur'] / 1e6
+            row['max_seconds'] = max(row['max_seconds'], event['dur'] / 1e6)
+            if event['peak_rss'] is not None:
+                row['peak_rss'] = max(row['peak_rss'] or 0, event['peak_rss'])
+                row['rss_growth'] += event['rss_growth']
+            if event['bytes'] is not None:
+                row['bytes'] = (row['bytes'] or 0) + event['bytes']
+        return table
+
+    # Charts are summed over their outermost stages only, so nested stages aren't counted twice
+    top_level = {}
+    for event in events:
+        if event['chart']:
+            key = (event['pid'], event['chart'])
+            top_level[key] = min(top_level.get(key, event['depth']), event['depth'])
+    return {
+        'stages': rows(lambda event: event['name']),
+        'charts': rows(lambda event: event['chart']
+                       if event['chart'] and event['depth'] == top_level[(event['pid'], event['chart'])] else None),
+    }
+
+
+def print_summary(events=None):
+    tables = summary(events)
+    for title, table in (('stage', tables['stages']), ('chart', tables['charts'])):
+        if not table:
+            continue
+        width = max(len(title), *(len(name) for name in table))
+        print(f"{title:{width}}  {'calls':>5}  {'total s':>8}  {'max s':>7}  {'peak MB':>8}  {'+RSS MB':>8}  "
+              f"{'out KB':>9}")
+        for name, row in sorted(table.items(), key=lambda item: item[1]['seconds'], reverse=True):
+            growth = row['rss_growth'] if row['peak_rss'] is not None else None
+            print(f"{name:{width}}  {row['calls']:5}  {row['seconds']:8.2f}  {row['max_seconds']:7.2f}  "
+                  f"{_mb(row['peak_rss'])}  {_mb(growth)}  {_kb(row['bytes'])}")
+        print()
+
+
+def write_trace(path, events=None):
+    # Chrome trace-event JSON: one complete ('X') event per stage and a
+    # peak-RSS counter track per process
+    events = _events if events is None else events
+    trace = []
+    for event in sorted(events, key=lambda event: event['ts']):
+        args = dict(event['args'], peak_rss_mb=round(event['peak_rss'] / 2 ** 20, 1) if event['peak_rss'] else None)
+        if event['chart']:
+            args['chart'] = event['chart']
+        if event['bytes'] is not None:
+            args['bytes'] = event['bytes']
+        trace.append({'name': event['name'], 'cat': 'chart' if event['chart'] else 'build', 'ph': 'X',
+                      'ts': event['ts'], 'dur': event['dur'], 'pid': event['pid'], 'tid': event['tid'],
+                      'args': args})
+        if event['peak_rss'] is not None:
+            trace.append({'name': 'peak RSS (MB)', 'ph': 'C', 'ts': event['ts'] + event['dur'],
+                          'pid': event['pid'], 'args': {'peak': round(event['peak_rss'] / 2 ** 20, 1)}})
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+    return path
+
+
+def _report_at_exit(path):
+    print_summary()
+    print(f"trace written to {write_trace(path)}")
+
+
+# Chart scripts run directly pick the switch up from the environment
+if os.environ.get(PROFILE_ENV):
+    enable()
+    atexit.register(_report_at_exit, os.environ[PROFILE_ENV])
@@ -0,0 +1,83 @@
+import importlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import data_loader
+import profiling
+from chart_registry import CHARTS, render
+
+
+def preload(dataset_names):
+    # Load every dataset the charts need once, before the pool starts, so
+    # forked workers inherit the frames instead of each parsing/unpickling them.
+    # Archive tables have no loader; build.prepare_stores readies the database.
+    for name in dataset_names:
+        loader = getattr(data_loader, f"load_{name}", None)
+        if loader:
+            loader()
+
+
+def _init_worker(module_names, dataset_names, profile):
+    # Forked workers already have everything; spawned ones (Windows/macOS)
+    # re-register the charts and reload the datasets from the feather cache
+    if profile:
+        profiling.enable()
+    # Events inherited from the parent on fork are the parent's to report
+    profiling.drain()
+    for module_name in module_names:
+        importlib.import_module(module_name)
+    preload(dataset_names)
+
+
+def _render_task(name, plotly_js, as_spec, full_data, compress):
+    start = time.perf_counter()
+    output = render(CHARTS[name], plotly_js, as_spec, full_data, compress)
+    # Profile events go back to the parent with the result
+    return name, output, time.perf_counter() - start, profiling.drain()
+
+
+def _pool_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+
+
+def render_parallel(entries, jobs=None, on_done=None, plotly_js=True, as_spec=False, full_data=False,
+                    compress=False):
+    # Render charts across a process pool; only chart names cross the process
+    # boundary, the figures are built and written inside the workers.
+    # Returns {chart name: seconds} and calls on_done(entry, output, seconds)
+    # in the parent as each chart finishes. Precompression (compress) runs in
+    # the workers too, so on_done only does bookkeeping.
+    entries = list(entries)
+    if not entries:
+        return {}
+
+    jobs = jobs or os.cpu_count()
+    module_names = sorted({entry.func.__module__ for entry in entries})
+    dataset_names = sorted({name for entry in entries for name in entry.inputs})
+    preload(dataset_names)
+
+    timings = {}
+    with ProcessPoolExecutor(max_workers=min(jobs, len(entries)), mp_context=_pool_context(),
+                             initializer=_init_worker,
+                             initargs=(module_names, dataset_names, profiling.enabled())) as pool:
+        futures = [pool.submit(_render_task, entry.name, plotly_js, as_spec, full_data, compress) for entry in entries]
+        for future in as_completed(futures):
+            name, output, seconds, events = future.result()
+            profiling.extend(events)
+            timings[name] = seconds
+            if on_done:
+                on_done(CHARTS[name], output, seconds)
+    return timings
+
+
+def print_timings(timings, wall_time):
+    # Per-chart wall time, slowest first, and how much the pool saved
+    width = max(len(name) for name in timings)
+    for name, seconds in sorted(timings.items(), key=lambda item: item[1], reverse=True):
+        print(f"{name:{width}}  {seconds:7.2f}s")
+    total = sum(timings.values())
+    print(f"{'sum of charts':{width}}  {total:7.2f}s")
+    print(f"{'wall time':{width}}  {wall_time:7.2f}s  ({total / wall_time:.1f}x)")
@@ -10,14 +10,9 @@
 # # fig.show()
 
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 import plotly.express as px
-
-# Set up Selenium for headless browser
-options = Options()
-options.headless = True
-driver = webdriver.Chrome(options=options)
+import altair as alt
+import pandas as pd
 
 # # Generate Plotly plot
 # fig = px.scatter(x=[1, 2, 3], y=[4, 5, 6], title="Test Plot")
@@ -26,25 +21,25 @@ driver = webdriver.Chrome(options=options)
 # fig.write_html('plot.html')
 
 
-import altair as alt
-import pandas as pd
+if __name__ == '__main__':
+    # Sample data
+    data = pd.DataFrame({
+        'Fruit': ['Apples', 'Bananas', 'Oranges', 'Grapes'],
+        'Sales': [100, 150, 80, 120]
+    })
+
+    # Create the chart
+    chart = alt.Chart(data).mark_bar().encode(
+        x='Fruit',
+        y='Sales'
+    )
+
+    # chart
+    chart.save('plot.html')
+
+    # Capture an image of the plot through the export pool (no Chrome driver
+    # started at import, no hard-coded path to the HTML file)
+    from export_images import ExportJob, export_batch, start_pool
 
-# Sample data
-data = pd.DataFrame({
-    'Fruit': ['Apples', 'Bananas', 'Oranges', 'Grapes'],
-    'Sales': [100, 150, 80, 120]
-})
-
-# Create the chart
-chart = alt.Chart(data).mark_bar().encode(
-    x='Fruit',
-    y='Sales'
-)
-
-# chart
-chart.save('plot.html')
-
-# Capture a screenshot of the plot using Selenium
-driver.get("file:///D:/DataViz/plot.html")  # Replace with the correct path to plot.html
-driver.save_screenshot("plot_screenshot.png")
-driver.quit()
+    with start_pool(1) as pool:
+        print(export_batch(pool, [ExportJob('plot', 'vega-lite', chart.to_json(), 'png', 'plot_screenshot.png')]))
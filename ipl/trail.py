@@ -1,141 +1,156 @@
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import altair as alt
 import os
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+from data_loader import load_auction
+from chart_data import thin_points
+from chart_registry import chart, charts_in, render_module
 
 # Ensure plots are saved to the 'static/plots' directory
 PLOT_DIR = "static/plots"
 if not os.path.exists(PLOT_DIR):
     os.makedirs(PLOT_DIR)
 
-# Setup Selenium WebDriver for headless browsing
-options = Options()
-options.headless = True
-
-# Initialize the WebDriver with options
-driver = webdriver.Chrome(options=options)
+# ------------------------------
+# 1️⃣ Treemap with Plotly
+@chart(f"{PLOT_DIR}/treemap.html", inputs=['auction'])
+def treemap():
+    import plotly.express as px
 
-# Load auction data
-auction = pd.read_csv('../datasets/IPLPlayerAuctionData.csv')
+    # Load auction data (rows without a year dropped by the loader)
+    auction = load_auction()
 
-# Clean data
-auction = auction.dropna(subset=['Year'])
-auction['Year'] = auction['Year'].astype(int)
+    team_spend = auction.groupby('Team', as_index=False, observed=True)['Amount'].sum()
+    return px.treemap(team_spend, 
+                      path=['Team'], 
+                      values='Amount',
+                      title='Total Auction Spending by Team (2013–2024)',
+                      color='Amount', 
+                      color_continuous_scale='Blues',
+                      hover_data={'Amount': True, 'Team': True})
 
-# ------------------------------
-# 1️⃣ Treemap with Plotly
-team_spend = auction.groupby('Team', as_index=False)['Amount'].sum()
-fig = px.treemap(team_spend, 
-                 path=['Team'], 
-                 values='Amount',
-                 title='Total Auction Spending by Team (2013–2024)',
-                 color='Amount', 
-                 color_continuous_scale='Blues',
-                 hover_data={'Amount': True, 'Team': True})
-
-# Save Plotly figure as HTML
-fig.write_html(f"{PLOT_DIR}/treemap.html")
 
 # ------------------------------
 # 2️⃣ Sankey Diagram with Plotly
-top_auction = auction.sort_values(by='Amount', ascending=False).head(20)
-teams = top_auction['Team'].unique().tolist()
-players = top_auction['Player'].tolist()
-labels = teams + players
-sources = [teams.index(team) for team in top_auction['Team']]
-targets = [len(teams) + players.index(player) for player in top_auction['Player']]
-values = top_auction['Amount'].tolist()
-
-fig = go.Figure(data=[go.Sankey(
-    node=dict(
-        pad=30,
-        thickness=20,
-        line=dict(color="black", width=0.5),
-        label=labels
-    ),
-    link=dict(
-        source=sources,
-        target=targets,
-        value=values
-    )
-)])
+@chart(f"{PLOT_DIR}/sankey_diagram.html", inputs=['auction'])
+def sankey_diagram():
+    import plotly.graph_objects as go
+
+    auction = load_auction()
+
+    top_auction = auction.sort_values(by='Amount', ascending=False).head(20)
+    teams = top_auction['Team'].unique().tolist()
+    players = top_auction['Player'].tolist()
+    labels = teams + players
+    sources = [teams.index(team) for team in top_auction['Team']]
+    targets = [len(teams) + players.index(player) for player in top_auction['Player']]
+    values = top_auction['Amount'].tolist()
+
+    return go.Figure(data=[go.Sankey(
+        node=dict(
+            pad=30,
+            thickness=20,
+            line=dict(color="black", width=0.5),
+            label=labels
+        ),
+        link=dict(
+            source=sources,
+            target=targets,
+            value=values
+        )
+    )])
 
-# Save Sankey figure as HTML
-fig.write_html(f"{PLOT_DIR}/sankey_diagram.html")
 
 # ------------------------------
 # 3️⃣ Bar Chart with Altair (Team Spending)
-highlight = alt.selection_point(on='mouseover', fields=['Team'], nearest=True)
-team_spend = auction.groupby('Team', as_index=False)['Amount'].sum()
-
-chart = alt.Chart(team_spend).mark_bar(size=25).encode(
-    x=alt.X('Amount:Q', title='Total Amount (INR)'),
-    y=alt.Y('Team:N', sort='-x', title='Teams'),
-    color=alt.condition(highlight, 'Team:N', alt.value('lightgray')),
-    tooltip=[alt.Tooltip('Team:N'), alt.Tooltip('Amount:Q')]
-).add_params(
-    highlight
-).properties(
-    title='Auction Spending by Teams (Hover Highlight)',
-    width=1000,
-    height=700
-)
-
-# Save Altair chart as HTML
-chart.save(f"{PLOT_DIR}/bar_chart.html")
+@chart(f"{PLOT_DIR}/bar_chart.html", inputs=['auction'])
+def bar_chart():
+    import altair as alt
+
+    auction = load_auction()
+
+    highlight = alt.selection_point(on='mouseover', fields=['Team'], nearest=True)
+    team_spend = auction.groupby('Team', as_index=False, observed=True)['Amount'].sum()
+
+    return alt.Chart(team_spend).mark_bar(size=25).encode(
+        x=alt.X('Amount:Q', title='Total Amount (INR)'),
+        y=alt.Y('Team:N', sort='-x', title='Teams'),
+        color=alt.condition(highlight, 'Team:N', alt.value('lightgray')),
+        tooltip=[alt.Tooltip('Team:N'), alt.Tooltip('Amount:Q')]
+    ).add_params(
+        highlight
+    ).properties(
+        title='Auction Spending by Teams (Hover Highlight)',
+        width=1000,
+        height=700
+    )
+
 
 # ------------------------------
 # 4️⃣ Scatterplot with Altair (Player Prices Over Years)
-scatter = alt.Chart(auction).mark_circle(size=100).encode(
-    x=alt.X('Year:O', title='Auction Year'),
-    y=alt.Y('Amount:Q', title='Amount (INR)'),
-    color='Team:N',
-    tooltip=['Player:N', 'Role:N', 'Amount:Q', 'Team:N', 'Player Origin:N']
-).properties(
-    width=1000,
-    height=700,
-    title='Auction Player Prices Over Years (Click and Zoom Supported)'
-).interactive()
-
-# Save the scatterplot as HTML
-scatter.save(f"{PLOT_DIR}/scatter_plot.html")
+@chart(f"{PLOT_DIR}/scatter_plot.html", inputs=['auction'])
+def scatter_plot():
+    import altair as alt
+
+    auction = load_auction()
+
+    # Players a few pixels apart in a year draw as one circle, so ship the
+    # highest-paid of them (its team colours the circle) with a count: 140
+    # cells of 5px up the 700px axis, smaller than a circle
+    points = thin_points(auction, x='Year', y='Amount', bins=(None, 140), keep='Amount', count='Players')
+
+    return alt.Chart(points).mark_circle(size=100).encode(
+        x=alt.X('Year:O', title='Auction Year'),
+        y=alt.Y('Amount:Q', title='Amount (INR)'),
+        color='Team:N',
+        tooltip=['Player:N', 'Role:N', 'Amount:Q', 'Team:N', 'Player Origin:N',
+                 alt.Tooltip('Players:Q', title='Players in point')]
+    ).properties(
+        width=1000,
+        height=700,
+        title='Auction Player Prices Over Years (Click and Zoom Supported)'
+    ).interactive()
+
 
 # ------------------------------
 # 5️⃣ Race Chart with Altair (Top Paid Players Per Year)
-race = auction.groupby(['Year', 'Player'], as_index=False)['Amount'].sum()
-race = race.sort_values('Amount', ascending=False).groupby('Year').head(10)
-
-year_slider = alt.binding_range(min=race['Year'].min(), max=race['Year'].max(), step=1)
-year_select = alt.param(name='YearSelector', bind=year_slider, value=race['Year'].min())
-
-race_chart = alt.Chart(race).transform_filter(
-    alt.datum.Year == year_select
-).mark_bar().encode(
-    x=alt.X('Amount:Q', title='Auction Amount (INR)'),
-    y=alt.Y('Player:N', sort='-x', title='Player'),
-    color='Player:N',
-    tooltip=['Player:N', 'Amount:Q', 'Year:O']
-).add_params(
-    year_select
-).properties(
-    width=1000,
-    height=700,
-    title="Top Paid Players per Year (Interactive Slider)"
-)
-
-# Save the race chart as HTML
-race_chart.save(f"{PLOT_DIR}/race_chart.html")
+@chart(f"{PLOT_DIR}/top_paid_race_chart.html", inputs=['auction'])
+def top_paid_race_chart():
+    import altair as alt
+
+    auction = load_auction()
+
+    race = auction.groupby(['Year', 'Player'], as_index=False)['Amount'].sum()
+    race = race.sort_values('Amount', ascending=False).groupby('Year').head(10)
+
+    year_slider = alt.binding_range(min=race['Year'].min(), max=race['Year'].max(), step=1)
+    year_select = alt.param(name='YearSelector', bind=year_slider, value=race['Year'].min())
+
+    return alt.Chart(race).transform_filter(
+        alt.datum.Year == year_select
+    ).mark_bar().encode(
+        x=alt.X('Amount:Q', title='Auction Amount (INR)'),
+        y=alt.Y('Player:N', sort='-x', title='Player'),
+        color='Player:N',
+        tooltip=['Player:N', 'Amount:Q', 'Year:O']
+    ).add_params(
+        year_select
+    ).properties(
+        width=1000,
+        height=700,
+        title="Top Paid Players per Year (Interactive Slider)"
+    )
 
-# ------------------------------
-# End of script
 
-# Quit the WebDriver after capturing the images
-driver.quit()
+if __name__ == '__main__':
+    render_module(__name__)
 
+    # Capture the images through the warm export pool (export_images.py)
+    # instead of starting a Chrome driver for this script
+    from export_images import export_charts
+
+    export_charts([entry.name for entry in charts_in(__name__)])
+
+# ------------------------------
+# End of script
 
 
 # import pandas as pd